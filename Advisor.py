@@ -0,0 +1,288 @@
+"""
+Index advice from the query shapes that the application really sends.
+
+The shapes come from SlowQueries reports (and from the HOT_QUERIES in Indexes, so that there is
+always something to go on).  Each shape that no index declared in the model's meta can answer gets
+a candidate index, laid out equality fields first, then the sort, then the range fields, which is
+the order that lets one index both find and order the documents.  A partial index in the meta only counts
+for the shapes whose filter implies its partialFilterExpression, since the server cannot use it for
+the others.  Candidates that are a prefix of
+another candidate on the same collection are folded into the longer one, and the rest are ranked
+by their estimated benefit: the documents that the shapes examine without returning, times how
+often they ran.
+
+    python Advisor.py --report slow_queries.json            # print the proposed meta index definitions
+    python Advisor.py --report slow_queries.json --apply    # and create them
+
+Applying creates the indexes on the server only.  Copy the printed definitions into the models'
+meta as well, or provision_indexes will not know about them.
+"""
+import argparse
+import json
+import os
+import re
+
+from mongoengine import connect, EmbeddedDocumentField, ListField
+
+from Indexes import MODELS, HOT_QUERIES
+from SlowQueries import field_roles, strip_values
+
+# Shapes from HOT_QUERIES have never been timed, so they count as this many lookups.
+HOT_QUERY_WEIGHT = 1
+# The operators that bound an index scan on a field, and the ones that only match documents that have the field.
+_BOUNDING_OPERATORS = {'$gt', '$gte', '$lt', '$lte'}
+_EXISTING_OPERATORS = _BOUNDING_OPERATORS | {'$eq', '$in', '$all', '$regex', '$elemMatch', '$size'}
+
+
+def _attribute_paths(cls, column_prefix: str = '', attribute_prefix: str = '') -> dict:
+    """
+    :return:    Every dotted column path of a class, down into its embedded documents, mapped to the
+                dotted attribute path that meta['indexes'] would name it by.
+    """
+    paths = {}
+    for attribute, field in cls._fields.items():
+        column = column_prefix + field.db_field
+        paths[column] = attribute_prefix + attribute
+        inner = field.field if isinstance(field, ListField) else field
+        if isinstance(inner, EmbeddedDocumentField):
+            paths.update(_attribute_paths(inner.document_type, column + '.', paths[column] + '.'))
+    return paths
+
+
+def declared_indexes(cls) -> [dict]:
+    """
+    :return:    The indexes in the class's meta, and the _id index, as {'name': ..., 'keys': [(column, direction)],
+                'partial_filter': the partialFilterExpression, or None}.
+    """
+    return [{'name': '_id_', 'keys': [('_id', 1)], 'partial_filter': None}] + [
+        {'name': spec.get('name'), 'keys': [tuple(key) for key in spec['fields']],
+         'partial_filter': spec.get('partialFilterExpression')}
+        for spec in cls._meta.get('index_specs', [])]
+
+
+def _conditions(query: dict, field: str) -> list:
+    """The conditions on a field that every document the query matches meets: its own, and those in an $and."""
+    conditions = [query[field]] if field in query else []
+    for branch in query.get('$and') or []:
+        conditions += _conditions(branch, field)
+    return conditions
+
+
+def _operators(condition) -> set:
+    """The operators of a condition, with a plain value (or embedded document) counting as $eq."""
+    if isinstance(condition, dict) and any(key.startswith('$') for key in condition):
+        return set(condition)
+    return {'$eq'}
+
+
+def implies(query: dict, partial_filter: dict) -> bool:
+    """
+    Whether every document that a query matches is in a partial index, so that the server can use
+    the index for the query.  Only the filters that the models declare are understood: {field:
+    {'$exists': True}}, conditions repeated verbatim in the query, and an $and of those.  Anything
+    else counts as not implied.
+    :param query:           The shape's filter.  Its values may have been stripped to '?'.
+    """
+    for field, condition in partial_filter.items():
+        if field == '$and':
+            if not all(implies(query, branch) for branch in condition):
+                return False
+        elif field.startswith('$'):
+            return False
+        elif condition == {'$exists': True}:
+            if not any(_operators(found) & _EXISTING_OPERATORS for found in _conditions(query, field)):
+                return False
+        elif condition not in _conditions(query, field):
+            return False
+    return True
+
+
+def candidate_keys(shape: dict, equality_order: dict) -> [tuple]:
+    """
+    The index that would answer a shape: its equality fields (the most common ones across the
+    collection first, so that candidates share prefixes), then its sort, then its range fields.
+    """
+    equality = sorted(shape['equality'], key=lambda field: (-equality_order.get(field, 0), field))
+    keys = [(field, 1) for field in equality]
+    keys += [(field, direction) for field, direction in shape['sort'] if field not in shape['equality']]
+    keys += [(field, 1) for field in shape['range'] if field not in dict(keys)]
+    return keys
+
+
+def serves(index_keys: [tuple], shape: dict, partial_filter: dict = None) -> bool:
+    """
+    Whether an index answers a shape without a collection scan or an in-memory sort: its leading
+    fields are the shape's equality fields in any order, followed by the sort (all in the same
+    directions, or all reversed).  A shape with neither is served by an index that starts with one
+    of its range fields, when the filter bounds that field ($ne, $nin and the like scan the whole
+    index).  A partial index serves only the shapes whose filter implies its partial filter.
+    :param partial_filter:  The index's partialFilterExpression, if it has one.
+    """
+    if partial_filter and not implies(shape.get('filter') or {}, partial_filter):
+        return False
+    fields = [field for field, _ in index_keys]
+    equality = set(shape['equality'])
+    if set(fields[:len(equality)]) != equality:
+        return False
+    if shape['sort']:
+        following = [tuple(key) for key in index_keys[len(equality):len(equality) + len(shape['sort'])]]
+        wanted = [(field, direction) for field, direction in shape['sort']]
+        return following == wanted or following == [(field, -direction) for field, direction in wanted]
+    if equality:
+        return True
+    return bool(fields) and fields[0] in shape['range'] and any(
+        _operators(condition) & _BOUNDING_OPERATORS for condition in _conditions(shape.get('filter') or {}, fields[0]))
+
+
+def estimated_benefit(shape: dict, collection_size: int) -> float:
+    """
+    The documents that an index would save the shape from reading: what the explain found it
+    examining beyond what it returned (plus what it sorted in memory), or the whole collection per
+    query when it was never explained.
+    """
+    if shape.get('plan') is None:
+        return shape['count'] * collection_size
+    wasted = max(shape.get('docs_examined', 0) - shape.get('returned', 0), 0)
+    if 'SORT' in shape.get('flags', []):
+        wasted += shape.get('returned', 0)
+    return shape['count'] * wasted
+
+
+def load_report(filename: str) -> [dict]:
+    """The shapes of a SlowQueries report."""
+    with open(filename) as report:
+        return json.load(report)['shapes']
+
+
+def hot_query_shapes() -> [dict]:
+    """The HOT_QUERIES in Indexes, as shapes."""
+    shapes = []
+    for description, model, filters in HOT_QUERIES:
+        query = model.objects(**filters)._query
+        equality, ranges = field_roles(query)
+        shapes.append({'collection': model._get_collection_name(), 'command': 'find', 'description': description,
+                       'filter': strip_values(query), 'equality': equality, 'range': ranges, 'sort': [],
+                       'count': HOT_QUERY_WEIGHT, 'plan': None})
+    return shapes
+
+
+def _index_namer(cls):
+    """Name new indexes after the class's first declared index: section_uk_01 -> section_ix_03, ..."""
+    names = [spec.get('name') or '' for spec in cls._meta.get('index_specs', [])]
+    prefixes = [match.group(1) for match in map(re.compile(r'(.+)_(uk|ix)_\d+$').match, names) if match]
+    prefix = prefixes[0] if prefixes else cls.__name__.lower()
+    used = [int(name.rsplit('_', 1)[1]) for name in names if re.fullmatch(re.escape(prefix) + r'_ix_\d+', name)]
+    number = max(used, default=0)
+    while True:
+        number += 1
+        yield f'{prefix}_ix_{number:02d}'
+
+
+def advise(shapes: [dict], collection_sizes: dict = None, min_benefit: float = 0) -> [dict]:
+    """
+    Propose the indexes that the shapes need and the models do not declare.
+    :param shapes:              Query shapes, as in a SlowQueries report.
+    :param collection_sizes:    Collection name -> number of documents, for the shapes that were
+                                never explained.  Collections that are not in it count as 1000.
+    :param min_benefit:         Leave out the proposals that would save fewer documents than this.
+    :return:                    The proposals, the most beneficial first, each a dictionary of the
+                                model, collection, keys, meta fields, name, benefit and the shapes
+                                that it serves.
+    """
+    collection_sizes = collection_sizes or {}
+    models = {model._get_collection_name(): model for model in MODELS}
+    by_collection = {}
+    for shape in shapes:
+        if shape.get('collection') in models and (shape['equality'] or shape['range'] or shape['sort']):
+            by_collection.setdefault(shape['collection'], []).append(shape)
+
+    proposals = []
+    for collection, collection_shapes in by_collection.items():
+        model = models[collection]
+        existing = declared_indexes(model)
+        equality_order = {}
+        for shape in collection_shapes:
+            for field in shape['equality']:
+                equality_order[field] = equality_order.get(field, 0) + shape['count']
+        candidates = {}
+        for shape in collection_shapes:
+            if any(serves(index['keys'], shape, index['partial_filter']) for index in existing):
+                continue
+            keys = tuple(candidate_keys(shape, equality_order))
+            # A full index that starts with these keys is already there: the shape only scans past it ($ne, $nin).
+            if any(not index['partial_filter'] and tuple(index['keys'][:len(keys)]) == keys for index in existing):
+                continue
+            candidate = candidates.setdefault(keys, {'benefit': 0, 'shapes': []})
+            candidate['benefit'] += estimated_benefit(shape, collection_sizes.get(collection, 1000))
+            candidate['shapes'].append(shape)
+        # The longest candidates first, so that each shorter one folds into a longer one that starts with it.
+        merged = {}
+        for keys in sorted(candidates, key=len, reverse=True):
+            into = next((longer for longer in merged if longer[:len(keys)] == keys), keys)
+            target = merged.setdefault(into, {'benefit': 0, 'shapes': []})
+            target['benefit'] += candidates[keys]['benefit']
+            target['shapes'] += candidates[keys]['shapes']
+        paths = _attribute_paths(model)
+        names = _index_namer(model)
+        for keys, candidate in sorted(merged.items(), key=lambda item: item[1]['benefit'], reverse=True):
+            if candidate['benefit'] < min_benefit:
+                continue
+            proposals.append({
+                'model': model.__name__, 'collection': collection, 'keys': list(keys),
+                'fields': [('-' if direction < 0 else '') + paths.get(field, field) for field, direction in keys],
+                'name': next(names), 'benefit': candidate['benefit'], 'shapes': candidate['shapes']})
+    return sorted(proposals, key=lambda proposal: proposal['benefit'], reverse=True)
+
+
+def definition(proposal: dict) -> str:
+    """The proposal as an entry for the model's meta['indexes']."""
+    return f"{{'fields': {proposal['fields']}, 'name': '{proposal['name']}'}}"
+
+
+def apply(proposals: [dict], dry_run: bool = True) -> [str]:
+    """
+    Create the proposed indexes, or just say what would be created.
+    :param dry_run: True to only describe the createIndexes commands.
+    :return:        A line for each proposal, saying what was (or would be) done.
+    """
+    models = {model.__name__: model for model in MODELS}
+    done = []
+    for proposal in proposals:
+        keys = [tuple(key) for key in proposal['keys']]
+        if not dry_run:
+            models[proposal['model']]._get_collection().create_index(keys, name=proposal['name'])
+        done.append(f"{'would create' if dry_run else 'created'} {proposal['name']} on "
+                    f"{proposal['collection']} {keys}")
+    return done
+
+
+def format_proposals(proposals: [dict]) -> str:
+    lines = []
+    for rank, proposal in enumerate(proposals, start=1):
+        lines.append(f"{rank}. {proposal['model']}: {definition(proposal)}")
+        lines.append(f"   saves about {proposal['benefit']:.0f} documents read, for {len(proposal['shapes'])} "
+                     f"query shapes:")
+        for shape in proposal['shapes']:
+            lines.append(f"     {shape.get('description') or json.dumps(shape.get('filter'))}"
+                         + (f" sort {shape['sort']}" if shape['sort'] else ''))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Propose indexes for the query shapes that were recorded.')
+    parser.add_argument('--report', action='append', default=[], metavar='FILE',
+                        help='a SlowQueries report; give it more than once to combine reports')
+    parser.add_argument('--no-hot-queries', action='store_true', help='leave the HOT_QUERIES in Indexes out')
+    parser.add_argument('--min-benefit', type=float, default=1)
+    parser.add_argument('--apply', action='store_true', help='create the indexes (the default is a dry run)')
+    parser.add_argument('--uri', default=os.environ.get('MONGO_URI', 'mongodb://localhost:27017/Enrollment'))
+    args = parser.parse_args()
+    connect(host=args.uri)
+    shapes = [] if args.no_hot_queries else hot_query_shapes()
+    for filename in args.report:
+        shapes += load_report(filename)
+    sizes = {model._get_collection_name(): model._get_collection().estimated_document_count() for model in MODELS}
+    proposals = advise(shapes, sizes, args.min_benefit)
+    print(format_proposals(proposals) or 'Every recorded query shape is served by a declared index.')
+    for line in apply(proposals, dry_run=not args.apply):
+        print(line)
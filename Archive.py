@@ -0,0 +1,157 @@
+"""
+Enrollment history archival.  Student.enrollment would otherwise grow by every section that a
+student ever took, and every lookup of the student would drag all of it along.  Enrollments in
+closed terms (every term before the current one) are moved into EnrollmentArchive buckets, one per
+student per year; the current and future terms stay embedded.  enrollment_history puts the two
+back together for listings and transcripts.
+
+The current term comes from the ENROLLMENT_CURRENT_TERM environment variable ("Fall 2026"), or
+can be passed in.
+
+Usage:
+    python Archive.py [--term "Fall 2026"] [--batch-size N] [--limit N] [--uri URI]
+"""
+import argparse
+import os
+import time
+
+from mongoengine import connect
+from pymongo import UpdateOne
+
+from Enrollment import Enrollment
+from EnrollmentArchive import EnrollmentArchive
+from Student import Student
+from enums import Semester
+
+# The order of the terms within a year.
+TERM_ORDER = [Semester.Winter, Semester.Spring, Semester.Summer_I, Semester.Summer_II, Semester.Summer_III,
+              Semester.Fall]
+
+
+def parse_term(term: str) -> tuple:
+    """
+    :param term:    A term such as "Fall 2026" or "Summer I 2026".
+    :return:        (semester value, year), e.g. ('Fall', 2026).
+    """
+    semester, _, year = term.strip().rpartition(' ')
+    return Semester(semester).value, int(year)
+
+
+def current_term() -> tuple:
+    """The current term from ENROLLMENT_CURRENT_TERM, as (semester value, year), or None if it is not set."""
+    term = os.environ.get('ENROLLMENT_CURRENT_TERM')
+    return parse_term(term) if term else None
+
+
+def term_order(semester: str, year: int) -> tuple:
+    """A sort key that puts terms in calendar order."""
+    return year, TERM_ORDER.index(Semester(semester))
+
+
+def closed_terms_filter(semester: str, year: int) -> dict:
+    """
+    The filter on an enrollment (as an array element) for the terms before the given one.
+    :return:    A raw filter on section_year and semester.
+    """
+    earlier = [term.value for term in TERM_ORDER[:TERM_ORDER.index(Semester(semester))]]
+    return {'$or': [{'section_year': {'$lt': year}}, {'section_year': year, 'semester': {'$in': earlier}}]}
+
+
+def _is_closed(enrollment: dict, term: tuple) -> bool:
+    return term_order(enrollment['semester'], enrollment['section_year']) < term_order(*term)
+
+
+def _archive_operations(student: dict, term: tuple) -> tuple:
+    """
+    The writes that move one student's closed enrollments into the archive.
+    :param student: The raw student, with its _id and enrollment.
+    :param term:    The current term.
+    :return:        (the bucket upserts, the $pull from the student, or None if there is nothing to move).
+    """
+    closed = [enrollment for enrollment in student.get(Student.enrollment.db_field, []) if _is_closed(enrollment, term)]
+    if not closed:
+        return [], None
+    by_year = {}
+    for enrollment in closed:
+        by_year.setdefault(enrollment['section_year'], []).append(enrollment)
+    # $addToSet, so that running the migration again after a failure does not archive anything twice.
+    buckets = [UpdateOne({'student': student['_id'], 'year': year},
+                         {'$addToSet': {EnrollmentArchive.enrollment.db_field: {'$each': enrollments}}}, upsert=True)
+               for year, enrollments in by_year.items()]
+    # Pull exactly the copies that went into the buckets.
+    pull = UpdateOne({'_id': student['_id']}, {'$pull': {Student.enrollment.db_field: {'$in': closed}}})
+    return buckets, pull
+
+
+def migrate(term: tuple = None, batch_size: int = 500, limit: int = None) -> int:
+    """
+    Move the enrollments of every closed term out of the students and into the archive.  Each batch
+    of students is written with two bulk_writes: the buckets first, then the pulls, so a student is
+    never left without a copy of an enrollment.  Safe to run again, and to stop part way through.
+    :param term:        The current term as (semester, year).  Defaults to current_term().
+    :param batch_size:  How many students to read and write at a time.
+    :param limit:       The most students to migrate in this run, or None for all of them.
+    :return:            The number of students whose enrollments were archived.
+    """
+    term = term or current_term()
+    if term is None:
+        raise ValueError('Give the current term, or set ENROLLMENT_CURRENT_TERM.')
+    students = Student._get_collection()
+    archives = EnrollmentArchive._get_collection()
+    cursor = students.find({Student.enrollment.db_field: {'$elemMatch': closed_terms_filter(*term)}},
+                           {Student.enrollment.db_field: 1}, batch_size=batch_size)
+    if limit:
+        cursor = cursor.limit(limit)
+    migrated = 0
+    buckets, pulls = [], []
+
+    def flush():
+        if buckets:
+            archives.bulk_write(buckets, ordered=False)
+            students.bulk_write(pulls, ordered=False)
+        buckets.clear()
+        pulls.clear()
+
+    for student in cursor:
+        student_buckets, pull = _archive_operations(student, term)
+        if pull is None:
+            continue
+        buckets.extend(student_buckets)
+        pulls.append(pull)
+        migrated += 1
+        if len(pulls) >= batch_size:
+            flush()
+    flush()
+    return migrated
+
+
+def archived_enrollments(student: Student) -> [Enrollment]:
+    """The student's archived enrollments, oldest year first, read with one indexed query."""
+    buckets = EnrollmentArchive._get_collection().find({'student': student.pk}, sort=[('year', 1)])
+    return [Enrollment._from_son(enrollment) for bucket in buckets
+            for enrollment in bucket.get(EnrollmentArchive.enrollment.db_field, [])]
+
+
+def enrollment_history(student: Student) -> [Enrollment]:
+    """
+    Every enrollment of the student, archived or current, in term order.
+    :param student: The student, with its enrollment loaded.
+    :return:        The list of Enrollment documents.
+    """
+    history = archived_enrollments(student) + list(student.enrollment)
+    return sorted(history, key=lambda enrollment: term_order(Semester(enrollment.semester).value,
+                                                             enrollment.sectionYear))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Move the enrollments of closed terms into the archive.')
+    parser.add_argument('--term', help='the current term, e.g. "Fall 2026"; defaults to ENROLLMENT_CURRENT_TERM')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--limit', type=int, help='stop after this many students')
+    parser.add_argument('--uri', default=os.environ.get('MONGO_URI', 'mongodb://localhost:27017/Enrollment'))
+    args = parser.parse_args()
+    connect(host=args.uri)
+    EnrollmentArchive.ensure_indexes()
+    start = time.perf_counter()
+    count = migrate(parse_term(args.term) if args.term else None, args.batch_size, args.limit)
+    print(f'Archived the closed enrollments of {count} students in {time.perf_counter() - start:.2f} seconds.')
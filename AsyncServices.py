@@ -0,0 +1,328 @@
+"""
+The core operations of Services, for asyncio: lookup by a uniqueness constraint, enroll, drop,
+declare a major, and paginated listings.  One event loop can then serve many clients at once,
+where the MongoEngine code handles one request at a time per thread.
+
+It talks to MongoDB with pymongo's AsyncMongoClient (pymongo 4.9 or later), or with Motor if that
+is what is installed, but it keeps using the MongoEngine classes for everything else: the
+collection and field names, the validation and conversion of the embedded documents, the
+uniqueness constraints declared in their meta, and hydrating the results with _from_son.  The
+writes are the same atomic conditional updates that Services uses.
+
+Each operation runs under a semaphore (at most max_concurrency operations in flight) and a
+timeout, which default to the ENROLLMENT_ASYNC_CONCURRENCY and ENROLLMENT_ASYNC_TIMEOUT
+environment variables.
+
+    service = AsyncEnrollmentService('mongodb://localhost:27017/Enrollment')
+    student = await service.find_one(Student, lastName='Doe', firstName='Jane')
+    await service.enroll(student.pk, 'CECS', 323, 1, 'Fall', 2026, min_satisfactory='C')
+"""
+import asyncio
+import os
+from datetime import datetime
+
+try:
+    from pymongo import AsyncMongoClient
+except ImportError:
+    try:
+        from motor.motor_asyncio import AsyncIOMotorClient as AsyncMongoClient
+    except ImportError:
+        AsyncMongoClient = None
+
+import Services
+from Services import ServiceError, SectionFull, TimetableClash
+from ConstraintUtilities import declared_constraints
+from Listings import Pager, default_page_size
+from Timetable import enrolled_courses_query, enrolled_sections_query, student_clashes, MEETING_FIELDS
+from Department import Department
+from Course import Course
+from Section import Section
+from Major import Major
+from Student import Student
+from Enrollment import Enrollment
+from Waitlist import Waitlist
+from RosterEntry import RosterEntry
+from enums import Semester
+
+default_concurrency = int(os.environ.get('ENROLLMENT_ASYNC_CONCURRENCY', 100))
+default_timeout = float(os.environ.get('ENROLLMENT_ASYNC_TIMEOUT', 10))
+
+# The student fields that an enrollment needs: the enrollments for the timetable, and the rest for the roster.
+_STUDENT_FIELDS = {'enrollment': 1, 'last_name': 1, 'first_name': 1, 'e_mail': 1}
+
+
+class AsyncPager(Pager):
+    """
+    Keyset pagination, the same as Pager, over the async client.  The uniqueness constraints come
+    from the class's meta rather than from the server.
+    """
+    def __init__(self, service: 'AsyncEnrollmentService', cls, sort: [str], page_size: int = None):
+        self.service = service
+        self.cls = cls
+        self.sort = list(sort)
+        columns = [cls._fields[attribute].db_field for attribute in self.sort]
+        if not any(constraint['columns'] == columns for constraint in declared_constraints(cls)):
+            self.sort.append('id')
+        self.page_size = page_size or default_page_size
+        self.batch_size = self.page_size
+        self.first = None
+        self.last = None
+
+    async def _fetch(self, keys, forward: bool) -> list:
+        direction = 1 if forward else -1
+        order = [(self.cls._fields[attribute].db_field, direction) for attribute in self.sort]
+        query = {} if keys is None else self._range(keys, '$gt' if forward else '$lt')
+        cursor = self.service.collection(self.cls).find(query, sort=order, limit=self.page_size)
+        page = await self.service.run(cursor.to_list(length=None))
+        if not forward:
+            page.reverse()
+        if page:
+            self.first = self._keys(page[0])
+            self.last = self._keys(page[-1])
+        return page
+
+    async def next_page(self) -> list:
+        """
+        :return:    The next page of raw documents; print each one with Listings.display().
+        """
+        return await self._fetch(self.last, True)
+
+    async def previous_page(self) -> list:
+        if self.first is None:
+            return []
+        return await self._fetch(self.first, False)
+
+
+class AsyncEnrollmentService:
+    """
+    The asyncio service layer over one async client.
+    """
+    def __init__(self, uri: str = None, database: str = None, max_concurrency: int = None, timeout: float = None,
+                 client=None):
+        """
+        :param uri:             The MongoDB connection string.  Defaults to MONGO_URI, then the local mongod.
+        :param database:        The database name.  Defaults to the one in the connection string.
+        :param max_concurrency: The most operations in flight at once.
+        :param timeout:         How many seconds an operation may take before it is cancelled.
+        :param client:          An async client to use instead of making one.
+        """
+        if client is None:
+            if AsyncMongoClient is None:
+                raise RuntimeError('The asyncio service layer needs pymongo 4.9 or later, or motor.')
+            client = AsyncMongoClient(uri or os.environ.get('MONGO_URI', 'mongodb://localhost:27017/Enrollment'))
+        self.client = client
+        self.database = client[database] if database else client.get_default_database()
+        self.limit = asyncio.Semaphore(max_concurrency or default_concurrency)
+        self.timeout = timeout or default_timeout
+
+    def collection(self, cls):
+        return self.database[cls._get_collection_name()]
+
+    async def run(self, awaitable):
+        """Wait for one database call, under the timeout."""
+        return await asyncio.wait_for(awaitable, self.timeout)
+
+    async def _limited(self, operation):
+        """Run one whole operation under the concurrency limit and the timeout."""
+        async with self.limit:
+            return await asyncio.wait_for(operation, self.timeout)
+
+    async def find_one(self, cls, **attributes):
+        """
+        Look a document up by one of its uniqueness constraints.
+        :param cls:         The MongoEngine class.
+        :param attributes:  A value for each attribute of one of the class's uniqueness constraints.
+        :return:            The MongoEngine document, or None if there is none.
+        :raises ServiceError:   If the attributes are not a uniqueness constraint.
+        """
+        fields = {cls._fields[attribute].db_field: cls._fields[attribute].to_mongo(value)
+                  for attribute, value in attributes.items()}
+        if not any(set(constraint['columns']) == set(fields) for constraint in declared_constraints(cls)):
+            raise ServiceError(f'{", ".join(sorted(attributes))} is not a uniqueness constraint of {cls.__name__}.')
+        document = await self._limited(self.collection(cls).find_one(fields))
+        return None if document is None else cls._from_son(document)
+
+    async def _reserve_seat(self, section_id) -> bool:
+        reserved = await self.run(self.collection(Section).find_one_and_update(
+            {'_id': section_id, **Services.SEAT_AVAILABLE}, {'$inc': {'enrolled_count': 1}}, projection={'_id': True}))
+        return reserved is not None
+
+    async def _release_seat(self, section_id):
+        await self.run(self.collection(Section).update_one({'_id': section_id, 'enrolled_count': {'$gt': 0}},
+                                                           {'$inc': {'enrolled_count': -1}}))
+
+    async def _push_unless_present(self, student_id, array_attribute: str, element, guard: [str]) -> bool:
+        element.validate()
+        array = Student._fields[array_attribute].db_field
+        result = await self.run(self.collection(Student).update_one(
+            {'_id': student_id, array: {'$not': {'$elemMatch': Services.guard_values(element, guard)}}},
+            {'$push': {array: element.to_mongo()}}))
+        return result.modified_count == 1
+
+    async def _add_to_roster(self, section_id, student: dict):
+        await self.run(self.collection(RosterEntry).update_one(
+            {'section': section_id, 'student': student['_id']},
+            {'$set': {column: student.get(column) for column in ('last_name', 'first_name', 'e_mail')}}, upsert=True))
+
+    async def _clashes(self, student: dict, section: dict) -> [dict]:
+        enrollments = student.get('enrollment', [])
+        semester, section_year = section['semester'], section['section_year']
+        query = enrolled_courses_query(enrollments, semester, section_year)
+        if query is None:
+            return []
+        courses = await self.run(self.collection(Course).find(query, {'abbreviation': 1, 'course_number': 1})
+                                 .to_list(length=None))
+        query = enrolled_sections_query(enrollments, semester, section_year, courses)
+        if query is None:
+            return []
+        current = await self.run(self.collection(Section).find(query, MEETING_FIELDS).to_list(length=None))
+        return student_clashes(current, section)
+
+    async def _course_id(self, abbreviation: str, course_number: int):
+        """The _id of the course, which the sections refer to, since course numbers repeat across departments."""
+        if await self.run(self.collection(Department).find_one({'abbreviation': abbreviation}, {'_id': 1})) is None:
+            raise ServiceError(f'Department with abbreviation {abbreviation} not found.')
+        course = await self.run(self.collection(Course).find_one(
+            {'abbreviation': abbreviation, 'course_number': course_number}, {'_id': 1}))
+        if course is None:
+            raise ServiceError(f'Course with number {course_number} not found in department {abbreviation}.')
+        return course['_id']
+
+    async def _enroll(self, student_id, abbreviation: str, course_number: int, section_number: int, semester: str,
+                      section_year: int, application_date, min_satisfactory):
+        course_id = await self._course_id(abbreviation, course_number)
+        section = await self.run(self.collection(Section).find_one(
+            {'course_embedded.course': course_id, 'section_number': section_number, 'course_number': course_number,
+             'semester': Semester(semester).value, 'section_year': section_year}))
+        if section is None:
+            raise ServiceError('Section not found.')
+        student = await self.run(self.collection(Student).find_one({'_id': student_id}, _STUDENT_FIELDS))
+        if student is None:
+            raise ServiceError('Student not found.')
+        enrollment = Services.build_enrollment(Student(pk=student_id), abbreviation, course_number, section_number,
+                                               semester, section_year, application_date, min_satisfactory)
+        clashes = await self._clashes(student, section)
+        if clashes:
+            raise TimetableClash(clashes)
+        if not await self._reserve_seat(section['_id']):
+            raise SectionFull(Student(pk=student_id), Section._from_son(section), enrollment)
+        try:
+            enrolled = await self._push_unless_present(student_id, 'enrollment', enrollment, Services.ENROLLMENT_GUARD)
+        except BaseException:
+            # Including a cancellation by the timeout: the seat must not leak.
+            await asyncio.shield(self._release_seat(section['_id']))
+            raise
+        if not enrolled:
+            await self._release_seat(section['_id'])
+            raise ServiceError('Student is already enrolled in the same course.')
+        await self._add_to_roster(section['_id'], student)
+        return enrollment
+
+    async def enroll(self, student_id, abbreviation: str, course_number: int, section_number: int, semester: str,
+                     section_year: int, application_date: datetime = None, min_satisfactory: str = None):
+        """
+        The same as Services.enroll, for the student with this _id.
+        :return:    The new Enrollment.
+        """
+        return await self._limited(self._enroll(student_id, abbreviation, course_number, section_number, semester,
+                                                section_year, application_date, min_satisfactory))
+
+    async def _promote(self, section: dict):
+        waitlists = self.collection(Waitlist)
+        while True:
+            entry = await self.run(waitlists.find_one_and_delete({'section': section['_id']},
+                                                                 sort=[('priority', -1), ('requested_at', 1)]))
+            if entry is None:
+                return None
+            student = await self.run(self.collection(Student).find_one({'_id': entry['student']}, _STUDENT_FIELDS))
+            if student is not None and await self._clashes(student, section):
+                continue
+            if not await self._reserve_seat(section['_id']):
+                await self.run(waitlists.insert_one(entry))
+                return None
+            enrollment = Enrollment._from_son(entry['enrollment'])
+            try:
+                enrolled = student is not None and await self._push_unless_present(
+                    entry['student'], 'enrollment', enrollment, Services.ENROLLMENT_GUARD)
+            except BaseException:
+                await asyncio.shield(self._release_seat(section['_id']))
+                await asyncio.shield(self.run(waitlists.insert_one(entry)))
+                raise
+            if enrolled:
+                await self._add_to_roster(section['_id'], student)
+                return entry['student']
+            await self._release_seat(section['_id'])
+
+    async def _drop(self, student_id, abbreviation: str, course_number: int, section_number: int, semester: str,
+                    section_year: int):
+        course_id = await self._course_id(abbreviation, course_number)
+        student = await self.run(self.collection(Student).find_one({'_id': student_id}, _STUDENT_FIELDS))
+        if student is None:
+            raise ServiceError('Student not found.')
+        wanted = {'abbreviation': abbreviation, 'course_number': course_number, 'section_number': section_number}
+        if semester is not None:
+            wanted['semester'] = Semester(semester).value
+        if section_year is not None:
+            wanted['section_year'] = section_year
+        enrollments = [enrollment for enrollment in student.get('enrollment', [])
+                       if all(enrollment.get(column) == value for column, value in wanted.items())]
+        if not enrollments:
+            raise ServiceError('Enrollment not found.')
+        if len(enrollments) > 1:
+            raise ServiceError('The student is enrolled in this section in more than one term; give the semester '
+                               'and year.')
+        match = {column: enrollments[0].get(column) for column in
+                 ('abbreviation', 'course_number', 'section_number', 'semester', 'section_year')}
+        pulled = await self.run(self.collection(Student).update_one({'_id': student_id},
+                                                                    {'$pull': {'enrollment': match}}))
+        if not pulled.modified_count:
+            return None
+        section = await self.run(self.collection(Section).find_one(
+            {'course_embedded.course': course_id, 'section_number': section_number, 'course_number': course_number,
+             'semester': match['semester'], 'section_year': match['section_year']}, MEETING_FIELDS))
+        if section is None:
+            return None
+        await self.run(self.collection(RosterEntry).delete_one({'section': section['_id'], 'student': student_id}))
+        await self._release_seat(section['_id'])
+        return await self._promote(section)
+
+    async def drop(self, student_id, abbreviation: str, course_number: int, section_number: int,
+                   semester: str = None, section_year: int = None):
+        """
+        The same as Services.drop_enrollment, for the student with this _id.
+        :param semester:        The term of the enrollment.  Only needed when the student has this
+        :param section_year:    section in more than one term.
+        :return:                The _id of the student promoted from the waitlist into the freed seat, or None.
+        """
+        return await self._limited(self._drop(student_id, abbreviation, course_number, section_number, semester,
+                                              section_year))
+
+    async def _declare_major(self, student_id, major_name: str, declaration_date: datetime):
+        major = await self.run(self.collection(Major).find_one({'major_name': major_name}))
+        if major is None:
+            raise ServiceError('Major not found.')
+        student_major = Services.new_student_major(Student(pk=student_id), Major._from_son(major), declaration_date)
+        if not await self._push_unless_present(student_id, 'studentMajor', student_major,
+                                               Services.STUDENT_MAJOR_GUARD):
+            raise ServiceError(f'Student is already majored in {major_name}.')
+        return student_major
+
+    async def declare_major(self, student_id, major_name: str, declaration_date: datetime):
+        """
+        The same as Services.add_student_major, for the student with this _id.
+        :return:    The new StudentMajor.
+        """
+        return await self._limited(self._declare_major(student_id, major_name, declaration_date))
+
+    def pager(self, cls, sort: [str], page_size: int = None) -> AsyncPager:
+        """
+        Page through a collection in sort order.  Each page is one bounded call, so it is not held
+        to the concurrency limit the way that the operations are.
+        """
+        return AsyncPager(self, cls, sort, page_size)
+
+    async def close(self):
+        # pymongo's async client closes with a coroutine, Motor's does not.
+        closing = self.client.close()
+        if asyncio.iscoroutine(closing):
+            await closing
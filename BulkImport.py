@@ -0,0 +1,408 @@
+"""
+Streaming bulk importer for the enrollment collections.  Rows come from a CSV file (with a header
+line of attribute names) or a JSONL file (one JSON object per line, keyed by attribute name), are
+validated against the MongoEngine field definitions, have their references resolved through
+in-memory lookup tables, are checked against the uniqueness constraints in memory, and are then
+written with unordered insert_many calls, batch_size documents at a time.
+
+Usage:
+    python BulkImport.py department departments.csv [--batch-size N] [--report errors.csv] [--uri URI]
+
+Courses and majors are looked up by their department abbreviation, and sections by the department
+abbreviation and course number, so load the departments first, then the courses, then the sections.
+Student rows in JSONL may carry their studentMajor and enrollment lists (of attribute keyed objects;
+an enrollment gives either an applicationDate or a minSatisfactory grade, and has to name a section
+that exists), so load the majors and sections before the students, and rebuild the rosters after
+them (cli.py check-rosters --rebuild).
+Sections are also checked for room and instructor conflicts, against the sections already in their
+term and the ones imported before them.
+"""
+import argparse
+import csv
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from mongoengine import connect, DateTimeField, IntField, ListField, EmbeddedDocumentField, ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from ConstraintUtilities import get_constraints
+from Services import build_enrollment, ServiceError
+from Timetable import ConflictIndex, MEETING_FIELDS
+from Department import Department
+from Course import Course
+from Section import Section
+from Major import Major
+from Student import Student
+from StudentMajor import StudentMajor
+from Enrollment import Enrollment
+from PassFail import PassFail
+from embeded import DepartmentEmbedded, CourseEmbedded, MajorEmbedded
+
+
+class ImportReport:
+    """
+    The outcome of one import: how many rows made it in, and what went wrong with the rest.
+    """
+    def __init__(self):
+        self.inserted = 0
+        # One {'row': row number, 'error': text} dictionary per rejected row.
+        self.errors = []
+
+    def reject(self, row_number: int, error: str):
+        self.errors.append({'row': row_number, 'error': error})
+
+    def write(self, filename: str):
+        """
+        Write the per row error report as CSV.
+        :param filename:    The name of the file to write the report to.
+        :return:            None
+        """
+        with open(filename, 'w', newline='') as report:
+            writer = csv.DictWriter(report, fieldnames=['row', 'error'])
+            writer.writeheader()
+            writer.writerows(self.errors)
+
+    def __str__(self):
+        return f'{self.inserted} rows inserted, {len(self.errors)} rows rejected'
+
+
+def read_rows(filename: str):
+    """
+    Stream the rows of a CSV or JSONL file, one dictionary at a time.
+    :param filename:    The file to read.  Files ending in .jsonl or .json are read as JSONL,
+                        everything else as CSV with a header line.
+    :return:            A generator of (row number, dictionary) pairs.  Row numbers start at 1.
+    """
+    with open(filename, newline='') as source:
+        if filename.endswith(('.jsonl', '.json')):
+            row_number = 0
+            for line in source:
+                if line.strip():
+                    row_number += 1
+                    yield row_number, json.loads(line)
+        else:
+            for row_number, row in enumerate(csv.DictReader(source), start=1):
+                yield row_number, row
+
+
+def coerce_value(field, value):
+    """
+    Convert a value read from the file into the Python type that the MongoEngine field expects.
+    CSV gives us nothing but strings, and JSON does not have dates.
+    :param field:   The MongoEngine field that the value is for.
+    :param value:   The raw value from the file.
+    :return:        The converted value, or None if the value was empty.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(field, IntField):
+        return int(value)
+    if isinstance(field, DateTimeField) and isinstance(value, str):
+        # Section start times are entered as HH:MM, the same as in add_section.
+        if len(value) <= 5:
+            return datetime.strptime(value, '%H:%M')
+        return datetime.fromisoformat(value)
+    return value
+
+
+def build_attributes(cls, row: dict) -> dict:
+    """
+    Pick the scalar attributes of cls out of the row and convert them to the right types.  Columns
+    that are not attributes of cls (such as a lookup key) and embedded lists are left alone.
+    :param cls:     The MongoEngine class that we are importing into.
+    :param row:     The row from the file.
+    :return:        The attribute name -> value dictionary to construct an instance with.
+    """
+    attributes = {}
+    for name, field in cls._fields.items():
+        if name == 'id' or isinstance(field, (ListField, EmbeddedDocumentField)):
+            continue
+        value = coerce_value(field, row.get(name))
+        if value is not None:
+            attributes[name] = value
+    return attributes
+
+
+class ReferenceLookup:
+    """
+    In-memory lookup tables for the parents that the imported rows refer to.  Each table is read
+    from the database once, the first time that it is needed, and then kept up to date with the
+    parents that the import itself inserts.
+    """
+    def __init__(self):
+        self.departments = None     # abbreviation -> DepartmentEmbedded
+        self.courses = None         # (abbreviation, course number) -> CourseEmbedded
+        self.majors = None          # major name -> MajorEmbedded
+        self.sections = None        # {(course id, section number, semester, section year)}
+
+    def department(self, abbreviation: str) -> DepartmentEmbedded:
+        if self.departments is None:
+            self.departments = {}
+            for department in Department.objects().only('departmentName', 'abbreviation').as_pymongo():
+                self.add_department(department['_id'], department.get('department_name'),
+                                    department['abbreviation'])
+        if abbreviation not in self.departments:
+            raise ValueError(f'Department with abbreviation {abbreviation} not found.')
+        return self.departments[abbreviation]
+
+    def add_department(self, department_id, department_name: str, abbreviation: str):
+        if self.departments is not None:
+            self.departments[abbreviation] = DepartmentEmbedded(department=department_id,
+                                                                departmentName=department_name,
+                                                                abbreviation=abbreviation)
+
+    def course(self, abbreviation: str, course_number: int) -> CourseEmbedded:
+        if self.courses is None:
+            self.courses = {}
+            for course in Course.objects().only('abbreviation', 'courseNumber', 'courseName').as_pymongo():
+                self.add_course(course['_id'], course['abbreviation'], course['course_number'],
+                                course['course_name'])
+        if (abbreviation, course_number) not in self.courses:
+            raise ValueError(f'Course {abbreviation} {course_number} not found.')
+        return self.courses[(abbreviation, course_number)]
+
+    def add_course(self, course_id, abbreviation: str, course_number: int, course_name: str):
+        if self.courses is not None:
+            self.courses[(abbreviation, course_number)] = CourseEmbedded(course=course_id,
+                                                                         courseNumber=course_number,
+                                                                         courseName=course_name)
+
+    def major(self, major_name: str) -> MajorEmbedded:
+        if self.majors is None:
+            self.majors = {major['major_name']: MajorEmbedded(major=major['_id'], majorName=major['major_name'])
+                           for major in Major.objects().only('majorName').as_pymongo()}
+        if major_name not in self.majors:
+            raise ValueError(f'Major {major_name} not found.')
+        return self.majors[major_name]
+
+    def section(self, course: CourseEmbedded, section_number: int, semester: str, section_year: int):
+        """Check that the course has a section with this number in this term."""
+        if self.sections is None:
+            self.sections = {(section['course_embedded']['course'], section['section_number'], section['semester'],
+                              section['section_year'])
+                             for section in Section.objects().only('course.course', 'sectionNumber', 'semester',
+                                                                   'sectionYear').as_pymongo()}
+        # to_mongo() gives the course's _id without dereferencing it.
+        if (course.to_mongo()['course'], section_number, semester, section_year) not in self.sections:
+            raise ValueError(f'Section {section_number} of course {course.courseNumber} in {semester} {section_year} '
+                             f'not found.')
+
+
+def build_department(row: dict, lookup: ReferenceLookup) -> Department:
+    return Department(**build_attributes(Department, row))
+
+
+def build_course(row: dict, lookup: ReferenceLookup) -> Course:
+    attributes = build_attributes(Course, row)
+    return Course(departmentEmbedded=lookup.department(attributes.get('abbreviation')), **attributes)
+
+
+def build_section(row: dict, lookup: ReferenceLookup) -> Section:
+    attributes = build_attributes(Section, row)
+    course = lookup.course(row.get('abbreviation'), attributes.get('courseNumber'))
+    return Section(course=course, **attributes)
+
+
+def build_major(row: dict, lookup: ReferenceLookup) -> Major:
+    return Major(departmentEmbedded=lookup.department(row.get('abbreviation')), **build_attributes(Major, row))
+
+
+def build_student(row: dict, lookup: ReferenceLookup) -> Student:
+    # The embedded majors and enrollments refer back to the student, so it gets its _id up front.
+    student = Student(id=ObjectId(), **build_attributes(Student, row))
+    student.studentMajor = []
+    for declared in row.get('studentMajor') or []:
+        declaration_date = coerce_value(StudentMajor._fields['declarationDate'], declared.get('declarationDate'))
+        student.studentMajor.append(StudentMajor(student=student.id, majorName=declared.get('majorName'),
+                                                 declarationDate=declaration_date,
+                                                 majorEmbedded=[lookup.major(declared.get('majorName'))]))
+    student.enrollment = []
+    for enrolled in row.get('enrollment') or []:
+        numbers = {name: coerce_value(Enrollment._fields[name], enrolled.get(name))
+                   for name in ('courseNumber', 'sectionNumber', 'sectionYear')}
+        course = lookup.course(enrolled.get('abbreviation'), numbers['courseNumber'])
+        lookup.section(course, numbers['sectionNumber'], enrolled.get('semester'), numbers['sectionYear'])
+        student.enrollment.append(build_enrollment(
+            student.id, enrolled.get('abbreviation'), numbers['courseNumber'], numbers['sectionNumber'],
+            enrolled.get('semester'), numbers['sectionYear'],
+            coerce_value(PassFail._fields['applicationDate'], enrolled.get('applicationDate')),
+            enrolled.get('minSatisfactory')))
+    return student
+
+
+# What we know how to import: the class, and how to turn one row of the file into an instance.
+IMPORTERS = {
+    'department': (Department, build_department),
+    'course': (Course, build_course),
+    'section': (Section, build_section),
+    'major': (Major, build_major),
+    'student': (Student, build_student),
+}
+
+
+def _hashable(value):
+    """Turn a stored value (possibly an embedded document or a list) into something we can put in a set."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _hashable(item)) for key, item in value.items()))
+    if isinstance(value, list):
+        return tuple(_hashable(item) for item in value)
+    return value
+
+
+class UniqueKeys:
+    """
+    The values of every uniqueness constraint already in the collection, plus those of the rows
+    imported so far, so that duplicates can be caught without a round trip per row.
+    """
+    def __init__(self, cls):
+        # _id_ is left out: the documents that we import do not have an _id yet.
+        self.constraints = [constraint for constraint in get_constraints(cls) if constraint['name'] != '_id_']
+        self.seen = {constraint['name']: set() for constraint in self.constraints}
+        projection = {column: True for constraint in self.constraints for column in constraint['columns']}
+        if projection:
+            for existing in cls._get_collection().find({}, projection):
+                self.add(existing)
+
+    def keys(self, document) -> dict:
+        return {constraint['name']: tuple(_hashable(document.get(column)) for column in constraint['columns'])
+                for constraint in self.constraints}
+
+    def violated(self, document) -> [str]:
+        return [name for name, key in self.keys(document).items() if key in self.seen[name]]
+
+    def add(self, document):
+        for name, key in self.keys(document).items():
+            self.seen[name].add(key)
+
+
+class TermBookings:
+    """
+    The room and instructor bookings of every term that the imported sections are in.  Each term is
+    loaded from the database in one query the first time that a section in it comes along.
+    """
+    def __init__(self):
+        self.index = ConflictIndex()
+        self.terms = set()
+
+    def conflicts(self, document: dict) -> [tuple]:
+        term = (document['semester'], document['section_year'])
+        if term not in self.terms:
+            self.terms.add(term)
+            self.index.load(Section._get_collection().find({'semester': term[0], 'section_year': term[1]},
+                                                           MEETING_FIELDS))
+        return self.index.conflicts(document)
+
+    def add(self, document: dict, row_number: int):
+        # The document has no _id until it is inserted, so it is reported by its row number.
+        self.index.add(document, f'row {row_number}')
+
+    def remove(self, document: dict, row_number: int):
+        """Free the bookings of a row that the server rejected, so that they do not block later rows."""
+        self.index.remove(document, f'row {row_number}')
+
+
+def _flush(cls, batch: [tuple], report: ImportReport, lookup: ReferenceLookup, bookings: TermBookings = None):
+    """
+    Write one batch with an unordered insert_many, record the rows that the server rejected, and
+    copy the newly inserted children into their department the way that add_course and add_major do.
+    :param cls:         The MongoEngine class that we are importing into.
+    :param batch:       (row number, document) pairs.
+    :param report:      Where to record the outcome.
+    :param lookup:      The lookup tables to add new parents to.
+    :param bookings:    The section bookings, to take the rejected rows back out of.
+    :return:            None
+    """
+    if not batch:
+        return
+    failed = set()
+    try:
+        cls._get_collection().insert_many([document for _, document in batch], ordered=False)
+    except BulkWriteError as bwe:
+        for error in bwe.details.get('writeErrors', []):
+            failed.add(error['index'])
+            row_number, document = batch[error['index']]
+            report.reject(row_number, error.get('errmsg', 'write error'))
+            if bookings is not None:
+                bookings.remove(document, row_number)
+    inserted = [document for position, (_, document) in enumerate(batch) if position not in failed]
+    report.inserted += len(inserted)
+    parents = []
+    for document in inserted:
+        # insert_many fills in the _id of each document that it inserts.
+        if cls is Department:
+            lookup.add_department(document['_id'], document['department_name'], document['abbreviation'])
+        elif cls is Course:
+            lookup.add_course(document['_id'], document['abbreviation'], document['course_number'],
+                              document['course_name'])
+            embedded = CourseEmbedded(course=document['_id'], courseNumber=document['course_number'],
+                                      courseName=document['course_name'])
+            parents.append(UpdateOne({'_id': document['department_embedded']['department']},
+                                     {'$push': {Department.courseEmbedded.db_field: embedded.to_mongo()}}))
+        elif cls is Major:
+            embedded = MajorEmbedded(major=document['_id'], majorName=document['major_name'])
+            parents.append(UpdateOne({'_id': document['department_embedded']['department']},
+                                     {'$push': {Department.majorEmbedded.db_field: embedded.to_mongo()}}))
+    if parents:
+        Department._get_collection().bulk_write(parents, ordered=False)
+
+
+def import_file(model: str, filename: str, batch_size: int = 1000) -> ImportReport:
+    """
+    Import every row of the file into the collection for the given model.
+    :param model:       One of the IMPORTERS keys: department, course, section, major or student.
+    :param filename:    The CSV or JSONL file to read.
+    :param batch_size:  How many documents to send to the server in each insert_many.
+    :return:            The ImportReport with the counts and the per row errors.
+    """
+    cls, build = IMPORTERS[model]
+    lookup = ReferenceLookup()
+    unique_keys = UniqueKeys(cls)
+    bookings = TermBookings() if cls is Section else None
+    report = ImportReport()
+    batch = []
+    for row_number, row in read_rows(filename):
+        try:
+            instance = build(row, lookup)
+            instance.validate()
+        except (ValueError, TypeError, KeyError, ValidationError, ServiceError) as error:
+            report.reject(row_number, str(error))
+            continue
+        document = instance.to_mongo().to_dict()
+        violated = unique_keys.violated(document)
+        if violated:
+            report.reject(row_number, f'Uniqueness constraint violated: {", ".join(violated)}')
+            continue
+        if bookings is not None:
+            conflicts = bookings.conflicts(document)
+            if conflicts:
+                report.reject(row_number, 'Schedule conflict: ' + ', '.join(f'same {kind} as {owner}'
+                                                                            for kind, owner in conflicts))
+                continue
+            bookings.add(document, row_number)
+        unique_keys.add(document)
+        batch.append((row_number, document))
+        if len(batch) >= batch_size:
+            _flush(cls, batch, report, lookup, bookings)
+            batch = []
+    _flush(cls, batch, report, lookup, bookings)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bulk import CSV or JSONL files into the enrollment database.')
+    parser.add_argument('model', choices=sorted(IMPORTERS.keys()))
+    parser.add_argument('filename')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--report', help='write the per row error report to this CSV file')
+    parser.add_argument('--uri', default='mongodb://localhost:27017/Enrollment')
+    args = parser.parse_args()
+    connect(host=args.uri)
+    results = import_file(args.model, args.filename, args.batch_size)
+    print(results)
+    if args.report:
+        results.write(args.report)
+    else:
+        for rejected in results.errors:
+            print(f"row {rejected['row']}: {rejected['error']}")
@@ -0,0 +1,463 @@
+"""
+Deterministic synthetic campus data, for load testing.
+
+CampusGenerator lays out a catalog (the departments, their courses and majors, and the sections of
+the courses in each term) and then streams students, each with their declared majors and their
+enrollments.  Only the catalog and the seats left in each section are held in memory, so a million
+students take no more memory than a thousand.  The same seed and knobs give the same data every
+time, down to the _ids.
+
+Every uniqueness constraint of the models holds, and no two sections overlap in a room or for an
+instructor: each term's meetings are laid out on SLOTS, a grid of meeting times that do not overlap
+one another, and a room or an instructor gets each slot at most once.  A student never gets two
+sections in the same slot, or two sections of the same course in a term.  The department, course
+and major copies embedded in the other documents are filled in, and when the data is written to
+the database the rosters and the sections' enrolled counts match the enrollments.
+
+    python CampusGenerator.py --students 1000000 --uri mongodb://localhost:27017/LoadTest
+    python CampusGenerator.py --students 100000 --jsonl campus     # files for BulkImport.py
+
+Load the JSONL files with BulkImport.py in the order department, course, major, section, student,
+then run cli.py check-rosters --rebuild to fill in the rosters and the enrolled counts.
+"""
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from mongoengine import connect
+from pymongo import UpdateOne
+
+from Department import Department
+from Course import Course
+from Section import Section
+from Major import Major
+from Student import Student
+from StudentMajor import StudentMajor
+from Enrollment import Enrollment
+from LetterGrade import LetterGrade
+from PassFail import PassFail
+from RosterEntry import RosterEntry
+from embeded import DepartmentEmbedded, CourseEmbedded, MajorEmbedded
+from enums import Building, ClassStanding, MinimumSatisfactory, Schedule
+from Indexes import provision_indexes
+
+SUBJECTS = [
+    ('Computer Engineering and Computer Science', 'CECS'), ('Mathematics and Statistics', 'MATH'),
+    ('Physics and Astronomy', 'PHYS'), ('Chemistry and Biochemistry', 'CHEM'), ('Biological Sciences', 'BIOL'),
+    ('Electrical Engineering', 'EE'), ('Mechanical and Aerospace Engineering', 'MAE'),
+    ('Civil Engineering and Construction', 'CECEM'), ('Chemical Engineering', 'CHE'), ('Economics', 'ECON'),
+    ('History', 'HIST'), ('English', 'ENGL'), ('Philosophy', 'PHIL'), ('Psychology', 'PSY'), ('Sociology', 'SOC'),
+    ('Geography', 'GEOG'), ('Linguistics', 'LING'), ('Music', 'MUS'), ('Art', 'ART'), ('Theatre Arts', 'THEA'),
+    ('Kinesiology', 'KIN'), ('Nursing', 'NRSG'), ('Accountancy', 'ACCT'), ('Finance', 'FIN'), ('Marketing', 'MKTG'),
+]
+FIRST_NAMES = ['Ava', 'Ben', 'Carmen', 'David', 'Elena', 'Farid', 'Grace', 'Hiro', 'Isabel', 'Jamal', 'Kai', 'Lena',
+               'Mateo', 'Nadia', 'Omar', 'Priya', 'Quinn', 'Rosa', 'Sam', 'Tariq', 'Uma', 'Victor', 'Wen', 'Ximena',
+               'Yusuf', 'Zoe', 'Aiden', 'Bianca', 'Chen', 'Dara']
+LAST_NAMES = ['Nguyen', 'Garcia', 'Smith', 'Kim', 'Patel', 'Johnson', 'Lopez', 'Chen', 'Williams', 'Martinez',
+              'Brown', 'Tran', 'Davis', 'Hernandez', 'Wilson', 'Singh', 'Anderson', 'Gonzalez', 'Thomas', 'Lee',
+              'Moore', 'Rodriguez', 'Taylor', 'Pham', 'Jackson', 'Ramirez', 'White', 'Flores', 'Harris', 'Rivera',
+              'Clark', 'Sanchez', 'Lewis', 'Torres', 'Young', 'Diaz', 'Walker', 'Cruz', 'Hall', 'Reyes']
+TOPICS = ['Introduction', 'Fundamentals', 'Methods', 'Theory', 'Laboratory', 'Seminar', 'Design', 'Analysis',
+          'Systems', 'Applications', 'Topics', 'Research']
+DEGREES = ['B.S.', 'B.A.', 'M.S.', 'Ph.D.', 'Minor']
+BUILDINGS = [building.value for building in Building]
+
+# Meeting times that do not overlap one another, as (schedule, start): MW and TuTh classes every 90
+# minutes, and the long Friday and Saturday classes every three hours, all starting between 8:00
+# and 18:30.  MWF is left out, since its Friday meetings would collide with the Friday slots.
+SLOTS = ([(Schedule.MW.value, 8 * 60 + 90 * k) for k in range(8)] +
+         [(Schedule.TuTh.value, 8 * 60 + 90 * k) for k in range(8)] +
+         [(Schedule.F.value, 8 * 60 + 180 * k) for k in range(4)] +
+         [(Schedule.S.value, 8 * 60 + 180 * k) for k in range(4)])
+
+# The first and last course numbers.  Each department numbers its own courses from the first, as
+# course numbers are only unique within a department, so it can have at most 600 courses.
+FIRST_COURSE_NUMBER = 100
+LAST_COURSE_NUMBER = 699
+# The first and last room numbers in each building.
+FIRST_ROOM, LAST_ROOM = 100, 999
+# The creation time of every generated _id, so that the same seed gives the same _ids.
+_ID_EPOCH = int(datetime(2026, 1, 1).timestamp())
+
+
+def parse_weights(text: str) -> dict:
+    """'0:0.1,1:0.8,2:0.1' -> {0: 0.1, 1: 0.8, 2: 0.1}, for the distribution knobs on the command line."""
+    weights = {}
+    for pair in text.split(','):
+        value, weight = pair.split(':')
+        weights[int(value)] = float(weight)
+    return weights
+
+
+def person(number: int) -> tuple:
+    """A (first name, last name) pair that no other number gets: past the pool of names, a numeral is added."""
+    first = FIRST_NAMES[(number // len(LAST_NAMES)) % len(FIRST_NAMES)]
+    last = LAST_NAMES[number % len(LAST_NAMES)]
+    generation = number // (len(LAST_NAMES) * len(FIRST_NAMES))
+    return (f'{first} {generation}' if generation else first), last
+
+
+class CampusGenerator:
+    """
+    One synthetic campus.  The catalog is laid out when the generator is made; the students are
+    generated as they are written, and take seats in the sections as they go, so use one generator
+    per data set.
+    """
+    def __init__(self, seed: int = 0, departments: int = 12, courses: int = 120, department_skew: float = 1.0,
+                 majors_per_department: int = 2, sections_per_course: tuple = (1, 4), terms: list = None,
+                 capacity: tuple = (25, 45), fill_rate: tuple = (0.6, 1.0), majors_per_student: dict = None,
+                 enrollments_per_term: dict = None, pass_fail_rate: float = 0.1, instructor_load: int = 4):
+        """
+        :param seed:                    The seed of the one random number generator behind everything.
+        :param departments:             How many departments.
+        :param courses:                 How many courses in all, split over the departments, at most 600
+                                        in any one department.
+        :param department_skew:         0 for departments of the same size; the higher, the more of the
+                                        courses go to the first few departments (size ~ 1 / rank ** skew).
+        :param majors_per_department:   How many majors each department offers, up to len(DEGREES).
+        :param sections_per_course:     (fewest, most) sections of each course in each term.
+        :param terms:                   The (semester, year) pairs to lay sections out in.
+        :param capacity:                (smallest, largest) section capacity.
+        :param fill_rate:               (lowest, highest) fraction of a section's seats that students may take.
+        :param majors_per_student:      Number of majors -> weight.
+        :param enrollments_per_term:    Number of sections a student takes in each term -> weight.
+        :param pass_fail_rate:          The fraction of the enrollments that are pass/fail.
+        :param instructor_load:         How many sections each instructor teaches in a term, up to len(SLOTS).
+        """
+        if departments > courses:
+            raise ValueError('Every department needs at least one course.')
+        if not 1 <= instructor_load <= len(SLOTS):
+            raise ValueError(f'An instructor can teach from 1 to {len(SLOTS)} sections in a term.')
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.ids = 0
+        self.terms = terms or [('Fall', 2026)]
+        self.capacity = capacity
+        self.fill_rate = fill_rate
+        self.majors_per_student = majors_per_student or {0: 0.1, 1: 0.8, 2: 0.1}
+        self.enrollments_per_term = enrollments_per_term or {0: 0.05, 2: 0.15, 3: 0.3, 4: 0.35, 5: 0.15}
+        self.pass_fail_rate = pass_fail_rate
+        self.instructor_load = instructor_load
+        self.departments = []       # Department documents
+        self.courses = []           # Course documents
+        self.section_courses = []   # The Course document of each section
+        self.majors = []            # Major documents
+        self.sections = []          # Section documents
+        self.section_slots = []     # The index into SLOTS of each section
+        self.seats_left = []        # The seats still open to students in each section
+        self.enrolled = []          # The students enrolled in each section so far
+        self.open_sections = {}     # (semester, year) -> indexes of the sections with seats left
+        self._lay_out_catalog(departments, courses, department_skew, majors_per_department, sections_per_course)
+
+    def object_id(self) -> ObjectId:
+        """The next _id: a fixed timestamp, the seed, and a counter, so they come out the same on every run."""
+        self.ids += 1
+        return ObjectId(_ID_EPOCH.to_bytes(4, 'big') + (self.seed % 2 ** 24).to_bytes(3, 'big') +
+                        self.ids.to_bytes(5, 'big'))
+
+    def _department_sizes(self, departments: int, courses: int, skew: float) -> [int]:
+        """Split the courses over the departments in proportion to 1 / rank ** skew, at least one each."""
+        weights = [1 / (rank + 1) ** skew for rank in range(departments)]
+        sizes = [max(1, int(courses * weight / sum(weights))) for weight in weights]
+        rank = 0
+        while sum(sizes) < courses:
+            sizes[rank % departments] += 1
+            rank += 1
+        return sizes
+
+    def _lay_out_catalog(self, departments: int, courses: int, skew: float, majors_per_department: int,
+                         sections_per_course: tuple):
+        sizes = self._department_sizes(departments, courses, skew)
+        if max(sizes) > LAST_COURSE_NUMBER - FIRST_COURSE_NUMBER + 1:
+            raise ValueError(f'A department can have at most {LAST_COURSE_NUMBER - FIRST_COURSE_NUMBER + 1} '
+                             f'courses; add departments or lower the skew.')
+        for position, size in enumerate(sizes):
+            name, abbreviation = SUBJECTS[position] if position < len(SUBJECTS) else (f'Subject {position}',
+                                                                                     f'S{position}')
+            first, last = person(position)
+            department = Department(id=self.object_id(), departmentName=name, abbreviation=abbreviation,
+                                    chairName=f'{first} {last}', building=BUILDINGS[position % len(BUILDINGS)],
+                                    office=FIRST_ROOM + position // len(BUILDINGS),
+                                    description=f'The department of {name}'[:80], majorEmbedded=[], courseEmbedded=[])
+            embedded = DepartmentEmbedded(department=department.id, departmentName=name, abbreviation=abbreviation)
+            for number in range(size):
+                course_number = FIRST_COURSE_NUMBER + number
+                course = Course(id=self.object_id(), courseName=f'{TOPICS[number % len(TOPICS)]} '
+                                                                f'{number // len(TOPICS) + 1}',
+                                courseNumber=course_number, description=f'{name}, course {course_number}',
+                                units=self.random.randint(1, 5), abbreviation=abbreviation,
+                                departmentEmbedded=embedded)
+                department.courseEmbedded.append(CourseEmbedded(course=course.id, courseNumber=course_number,
+                                                                courseName=course.courseName))
+                self.courses.append(course)
+            for degree in DEGREES[:majors_per_department]:
+                major = Major(id=self.object_id(), majorName=f'{name} {degree}', description=f'{degree} in {name}',
+                              departmentEmbedded=embedded)
+                department.majorEmbedded.append(MajorEmbedded(major=major.id, majorName=major.majorName))
+                self.majors.append(major)
+            self.departments.append(department)
+        for semester, year in self.terms:
+            self._lay_out_term(semester, year, sections_per_course)
+        for document in self.departments + self.courses + self.majors + self.sections:
+            document.validate()
+
+    def _lay_out_term(self, semester: str, year: int, sections_per_course: tuple):
+        """
+        Give each section of the term the next place on the grid: consecutive places fill one room's
+        slots and then move to the next room, and each instructor takes instructor_load consecutive
+        places, which are all different slots.  Each department starts with a new instructor.
+        """
+        self.open_sections[(semester, year)] = []
+        place = 0
+        abbreviation = None
+        for course in self.courses:
+            if course.abbreviation != abbreviation:
+                abbreviation = course.abbreviation
+                place = -(-place // self.instructor_load) * self.instructor_load
+            for section_number in range(1, self.random.randint(*sections_per_course) + 1):
+                room = place // len(SLOTS)
+                if FIRST_ROOM + room // len(BUILDINGS) > LAST_ROOM:
+                    raise ValueError('There are not enough rooms for that many sections in a term.')
+                schedule, start = SLOTS[place % len(SLOTS)]
+                first, last = person(place // self.instructor_load)
+                capacity = self.random.randint(*self.capacity)
+                section = Section(id=self.object_id(), courseNumber=course.courseNumber,
+                                  sectionNumber=section_number, semester=semester, sectionYear=year,
+                                  building=BUILDINGS[room % len(BUILDINGS)],
+                                  roomNumber=FIRST_ROOM + room // len(BUILDINGS), schedule=schedule,
+                                  startTime=datetime(1900, 1, 1, start // 60, start % 60),
+                                  instructor=f'{first} {last}', capacity=capacity, enrolledCount=0,
+                                  course=CourseEmbedded(course=course.id, courseNumber=course.courseNumber,
+                                                        courseName=course.courseName))
+                self.open_sections[(semester, year)].append(len(self.sections))
+                self.sections.append(section)
+                self.section_courses.append(course)
+                self.section_slots.append(place % len(SLOTS))
+                self.seats_left.append(round(capacity * self.random.uniform(*self.fill_rate)))
+                self.enrolled.append(0)
+                place += 1
+
+    def _weighted(self, weights: dict) -> int:
+        return self.random.choices(list(weights), list(weights.values()))[0]
+
+    def _take_sections(self, semester: str, year: int, wanted: int) -> [int]:
+        """Take a seat in up to wanted random sections of a term, no two in one slot or of one course."""
+        open_sections = self.open_sections[(semester, year)]
+        taken, slots, courses = [], set(), set()
+        for _ in range(4 * wanted):
+            if len(taken) == wanted or not open_sections:
+                break
+            position = self.random.randrange(len(open_sections))
+            index = open_sections[position]
+            if self.section_slots[index] in slots or self.section_courses[index].id in courses:
+                continue
+            taken.append(index)
+            slots.add(self.section_slots[index])
+            courses.add(self.section_courses[index].id)
+            self.seats_left[index] -= 1
+            self.enrolled[index] += 1
+            if not self.seats_left[index]:
+                open_sections[position] = open_sections[-1]
+                open_sections.pop()
+        return taken
+
+    def students(self, count: int):
+        """
+        Generate the students, one at a time.
+        :param count:   How many students.
+        :return:        A generator of dictionaries with the student's _id, firstName, lastName, eMail
+                        and classStanding, their majors as (major index, declaration date) pairs, and
+                        their enrollments as (section index, application date or None, minimum
+                        satisfactory grade or None) tuples.
+        """
+        standings = [standing.value for standing in ClassStanding]
+        grades = [grade.value for grade in MinimumSatisfactory]
+        for number in range(count):
+            first, last = person(number)
+            majors = self.random.sample(range(len(self.majors)),
+                                        min(self._weighted(self.majors_per_student), len(self.majors)))
+            enrollments = []
+            for semester, year in self.terms:
+                for index in self._take_sections(semester, year, self._weighted(self.enrollments_per_term)):
+                    if self.random.random() < self.pass_fail_rate:
+                        enrollments.append((index, datetime(year, 1, 1) + timedelta(days=self.random.randrange(365)),
+                                            None))
+                    else:
+                        enrollments.append((index, None, self.random.choice(grades)))
+            yield {'id': self.object_id(), 'firstName': first, 'lastName': last,
+                   'eMail': f'{first}.{last}.{number}@student.example.edu'.lower().replace(' ', ''),
+                   'classStanding': self.random.choice(standings),
+                   'majors': [(major, datetime(2024, 1, 1) + timedelta(days=self.random.randrange(900)))
+                              for major in majors],
+                   'enrollments': enrollments}
+
+    def _enrollment(self, student_id, index: int, application_date, grade) -> Enrollment:
+        section = self.sections[index]
+        return Enrollment(student=student_id, abbreviation=self.section_courses[index].abbreviation,
+                          courseNumber=section.courseNumber, sectionNumber=section.sectionNumber,
+                          semester=section.semester, sectionYear=section.sectionYear,
+                          passFail=PassFail(sectionNumber=section.sectionNumber, applicationDate=application_date)
+                          if application_date else None,
+                          letterGrade=LetterGrade(sectionNumber=section.sectionNumber, min_satisfactory=grade)
+                          if grade else None)
+
+    def _templates(self) -> tuple:
+        """
+        The raw embedded enrollments of each (section, grade), and the raw student majors of each
+        major, built once with MongoEngine, so that each student only has to copy them.
+        """
+        placeholder = ObjectId(b'\0' * 12)
+        enrollments = {(index, grade): self._enrollment(placeholder, index, None, grade).to_mongo().to_dict()
+                       for index in range(len(self.sections)) for grade in MinimumSatisfactory}
+        majors = [StudentMajor(student=placeholder, majorName=major.majorName, declarationDate=datetime(2024, 1, 1),
+                               majorEmbedded=[MajorEmbedded(major=major.id, majorName=major.majorName)])
+                  .to_mongo().to_dict() for major in self.majors]
+        return enrollments, majors
+
+    def write_database(self, students: int, batch_size: int = 1000) -> dict:
+        """
+        Insert the catalog, then stream the students (and their roster entries) in with insert_many,
+        batch_size at a time, and set each section's enrolled count at the end.
+        :return:    The number of documents written to each collection.
+        """
+        provision_indexes()
+        counts = {}
+        for cls, documents in ((Department, self.departments), (Course, self.courses), (Major, self.majors),
+                               (Section, self.sections)):
+            cls._get_collection().insert_many([document.to_mongo() for document in documents], ordered=False)
+            counts[cls._get_collection_name()] = len(documents)
+        enrollment_templates, major_templates = self._templates()
+        fields = {name: field.db_field for name, field in Student._fields.items()}
+        roster_fields = {name: field.db_field for name, field in RosterEntry._fields.items()}
+        student_field = Enrollment._fields['student'].db_field
+        date_field = StudentMajor._fields['declarationDate'].db_field
+        students_collection, rosters = Student._get_collection(), RosterEntry._get_collection()
+        batch, roster_batch = [], []
+        counts[Student._get_collection_name()] = counts[RosterEntry._get_collection_name()] = 0
+        for student in self.students(students):
+            document = {'_id': student['id'], fields['lastName']: student['lastName'],
+                        fields['firstName']: student['firstName'], fields['eMail']: student['eMail'],
+                        fields['classStanding']: student['classStanding'], fields['studentMajor']: [],
+                        fields['enrollment']: []}
+            for major, declared in student['majors']:
+                document[fields['studentMajor']].append(dict(major_templates[major], **{student_field: student['id'],
+                                                                                        date_field: declared}))
+            for index, application_date, grade in student['enrollments']:
+                if application_date:
+                    enrollment = self._enrollment(student['id'], index, application_date, None).to_mongo().to_dict()
+                else:
+                    enrollment = dict(enrollment_templates[(index, MinimumSatisfactory(grade))],
+                                      **{student_field: student['id']})
+                document[fields['enrollment']].append(enrollment)
+                roster_batch.append({roster_fields['section']: self.sections[index].id,
+                                     roster_fields['student']: student['id'],
+                                     roster_fields['lastName']: student['lastName'],
+                                     roster_fields['firstName']: student['firstName'],
+                                     roster_fields['eMail']: student['eMail']})
+            batch.append(document)
+            if len(batch) >= batch_size:
+                students_collection.insert_many(batch, ordered=False)
+                counts[Student._get_collection_name()] += len(batch)
+                batch = []
+            if len(roster_batch) >= batch_size:
+                rosters.insert_many(roster_batch, ordered=False)
+                counts[RosterEntry._get_collection_name()] += len(roster_batch)
+                roster_batch = []
+        if batch:
+            students_collection.insert_many(batch, ordered=False)
+            counts[Student._get_collection_name()] += len(batch)
+        if roster_batch:
+            rosters.insert_many(roster_batch, ordered=False)
+            counts[RosterEntry._get_collection_name()] += len(roster_batch)
+        Section._get_collection().bulk_write(
+            [UpdateOne({'_id': section.id}, {'$set': {Section.enrolledCount.db_field: enrolled}})
+             for section, enrolled in zip(self.sections, self.enrolled) if enrolled], ordered=False)
+        return counts
+
+    def write_jsonl(self, directory: str, students: int) -> dict:
+        """
+        Write one JSONL file per model, in the rows that BulkImport.py reads: department.jsonl,
+        course.jsonl, major.jsonl, section.jsonl and student.jsonl.
+        :return:    The number of rows written to each file.
+        """
+        os.makedirs(directory, exist_ok=True)
+        rows = {
+            'department': ({'departmentName': department.departmentName, 'abbreviation': department.abbreviation,
+                            'chairName': department.chairName, 'building': department.building.value,
+                            'office': department.office, 'description': department.description}
+                           for department in self.departments),
+            'course': ({'abbreviation': course.abbreviation, 'courseName': course.courseName,
+                        'courseNumber': course.courseNumber, 'description': course.description, 'units': course.units}
+                       for course in self.courses),
+            'major': ({'abbreviation': major.departmentEmbedded.abbreviation, 'majorName': major.majorName,
+                       'description': major.description} for major in self.majors),
+            'section': ({'abbreviation': course.abbreviation,
+                         'courseNumber': section.courseNumber, 'sectionNumber': section.sectionNumber,
+                         'semester': section.semester.value, 'sectionYear': section.sectionYear,
+                         'building': section.building.value, 'roomNumber': section.roomNumber,
+                         'schedule': section.schedule.value, 'startTime': section.startTime.strftime('%H:%M'),
+                         'instructor': section.instructor, 'capacity': section.capacity}
+                        for section, course in zip(self.sections, self.section_courses)),
+            'student': (self._student_row(student) for student in self.students(students)),
+        }
+        counts = {}
+        for model, model_rows in rows.items():
+            counts[model] = 0
+            with open(os.path.join(directory, f'{model}.jsonl'), 'w') as output:
+                for row in model_rows:
+                    output.write(json.dumps(row) + '\n')
+                    counts[model] += 1
+        return counts
+
+    def _student_row(self, student: dict) -> dict:
+        enrollments = []
+        for index, application_date, grade in student['enrollments']:
+            section = self.sections[index]
+            enrollment = {'abbreviation': self.section_courses[index].abbreviation,
+                          'courseNumber': section.courseNumber, 'sectionNumber': section.sectionNumber,
+                          'semester': section.semester.value, 'sectionYear': section.sectionYear}
+            if application_date:
+                enrollment['applicationDate'] = application_date.isoformat()
+            else:
+                enrollment['minSatisfactory'] = grade
+            enrollments.append(enrollment)
+        majors = [{'majorName': self.majors[major].majorName, 'declarationDate': declared.date().isoformat()}
+                  for major, declared in student['majors']]
+        return {'lastName': student['lastName'], 'firstName': student['firstName'], 'eMail': student['eMail'],
+                'classStanding': student['classStanding'], 'studentMajor': majors, 'enrollment': enrollments}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic campus for load testing.')
+    parser.add_argument('--students', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--departments', type=int, default=12)
+    parser.add_argument('--courses', type=int, default=120, help='at most 600 in any one department')
+    parser.add_argument('--department-skew', type=float, default=1.0, help='0 for departments of the same size')
+    parser.add_argument('--majors-per-department', type=int, default=2)
+    parser.add_argument('--sections-per-course', type=int, nargs=2, default=[1, 4], metavar=('FEWEST', 'MOST'))
+    parser.add_argument('--terms', nargs='+', default=['Fall 2026'], help='e.g. "Fall 2026" "Spring 2027"')
+    parser.add_argument('--capacity', type=int, nargs=2, default=[25, 45], metavar=('SMALLEST', 'LARGEST'))
+    parser.add_argument('--fill-rate', type=float, nargs=2, default=[0.6, 1.0], metavar=('LOWEST', 'HIGHEST'))
+    parser.add_argument('--majors-per-student', type=parse_weights, default=None, help='e.g. 0:0.1,1:0.8,2:0.1')
+    parser.add_argument('--enrollments-per-term', type=parse_weights, default=None, help='e.g. 3:0.5,4:0.5')
+    parser.add_argument('--pass-fail-rate', type=float, default=0.1)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--jsonl', metavar='DIRECTORY', help='write JSONL files for BulkImport.py instead')
+    parser.add_argument('--uri', default=os.environ.get('MONGO_URI', 'mongodb://localhost:27017/Enrollment'))
+    args = parser.parse_args()
+    generator = CampusGenerator(args.seed, args.departments, args.courses, args.department_skew,
+                                args.majors_per_department, tuple(args.sections_per_course),
+                                [(term.rsplit(' ', 1)[0], int(term.rsplit(' ', 1)[1])) for term in args.terms],
+                                tuple(args.capacity), tuple(args.fill_rate), args.majors_per_student,
+                                args.enrollments_per_term, args.pass_fail_rate)
+    if args.jsonl:
+        written = generator.write_jsonl(args.jsonl, args.students)
+    else:
+        connect(host=args.uri)
+        written = generator.write_database(args.students, args.batch_size)
+    for name, count in written.items():
+        print(f'{name}: {count}')
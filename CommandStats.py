@@ -0,0 +1,163 @@
+"""
+Where the database time goes.  CommandStats is a pymongo command listener that keeps a latency
+histogram for every (collection, command, menu action) combination: how many commands, how many
+failed, and their p50, p95, p99 and maximum latency.
+
+The menu action is whatever the application is doing when the command is sent.  main.py and cli.py
+set it around each action with the action() context manager, and it rides along in a context
+variable, so it is correct for each thread (and each asyncio task) on its own.
+
+Recording costs a dictionary lookup and a logarithm per command, and with a sample_rate below 1
+only that fraction of the commands are recorded at all, so the listener can stay on in
+production.  The statistics are written as JSON by dump(): on demand, on SIGUSR1 where there is
+one, and at exit.
+
+    stats = CommandStats.install('command_stats.json', sample_rate=0.1)
+    with CommandStats.action('list_section()'):
+        ...
+"""
+import atexit
+import contextlib
+import contextvars
+import json
+import math
+import os
+import random
+import signal
+import threading
+
+from pymongo import monitoring
+
+# The menu action (or cli subcommand) that the current thread or task is carrying out.
+current_action = contextvars.ContextVar('current_action', default='-')
+
+# The histogram buckets grow by this factor, so a percentile is accurate to within about 5%.
+_BUCKET_GROWTH = 1.1
+_LOG_GROWTH = math.log(_BUCKET_GROWTH)
+
+
+@contextlib.contextmanager
+def action(name: str):
+    """Attribute the commands sent inside the with block to the named action."""
+    token = current_action.set(name)
+    try:
+        yield
+    finally:
+        current_action.reset(token)
+
+
+class LatencyHistogram:
+    """
+    A log-bucketed histogram of latencies in microseconds.  Constant memory per bucket that is
+    used, and constant time per value.
+    """
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.failures = 0
+        self.maximum = 0
+
+    def record(self, micros: int, failed: bool = False):
+        bucket = int(math.log(micros) / _LOG_GROWTH) if micros > 1 else 0
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.failures += failed
+        self.maximum = max(self.maximum, micros)
+
+    def percentile(self, fraction: float) -> float:
+        """
+        :param fraction:    0.5 for the median, 0.99 for p99, ...
+        :return:            The latency in milliseconds, at the top edge of the bucket that the percentile falls in.
+        """
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(_BUCKET_GROWTH ** (bucket + 1), self.maximum) / 1000
+        return self.maximum / 1000
+
+
+class CommandStats(monitoring.CommandListener):
+    """
+    The command listener.  Register it with pymongo.monitoring.register(), or hand it to a client
+    in event_listeners, or just call install().
+    """
+    def __init__(self, sample_rate: float = 1.0):
+        """
+        :param sample_rate: The fraction of the commands to record, from 0 to 1.
+        """
+        self.sample_rate = sample_rate
+        self.histograms = {}        # (collection, command, action) -> LatencyHistogram
+        self.in_flight = {}         # (connection, request id) -> (collection, command, action)
+        self.lock = threading.Lock()
+
+    def started(self, event):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            # Commands like getMore carry a cursor id here; ping and friends have no collection at all.
+            collection = event.command.get('collection', '-')
+        self.in_flight[(event.connection_id, event.request_id)] = (collection, event.command_name,
+                                                                   current_action.get())
+
+    def _finish(self, event, failed: bool):
+        key = self.in_flight.pop((event.connection_id, event.request_id), None)
+        if key is None:
+            return
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram()
+            histogram.record(event.duration_micros, failed)
+
+    def succeeded(self, event):
+        self._finish(event, False)
+
+    def failed(self, event):
+        self._finish(event, True)
+
+    def snapshot(self) -> [dict]:
+        """
+        :return:    One dictionary per (collection, command, action), the ones with the most total
+                    time first.  The counts are of the sampled commands.
+        """
+        with self.lock:
+            rows = [{'collection': collection, 'command': command, 'action': action_name,
+                     'count': histogram.count, 'failures': histogram.failures,
+                     'p50_ms': round(histogram.percentile(0.5), 3), 'p95_ms': round(histogram.percentile(0.95), 3),
+                     'p99_ms': round(histogram.percentile(0.99), 3), 'max_ms': round(histogram.maximum / 1000, 3)}
+                    for (collection, command, action_name), histogram in self.histograms.items()]
+        return sorted(rows, key=lambda row: row['count'] * row['p50_ms'], reverse=True)
+
+    def dump(self, filename: str):
+        """Write the snapshot, and the sample rate that it was taken at, to a JSON file."""
+        with open(filename, 'w') as output:
+            json.dump({'sample_rate': self.sample_rate, 'commands': self.snapshot()}, output, indent=2)
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+
+
+def install(filename: str = None, sample_rate: float = None) -> CommandStats:
+    """
+    Register a CommandStats with pymongo for every client made from now on, and arrange for it to
+    dump its statistics at exit and on SIGUSR1.
+    :param filename:    Where to write the JSON.  Defaults to the ENROLLMENT_COMMAND_STATS environment
+                        variable, or command_stats.json.
+    :param sample_rate: Defaults to the ENROLLMENT_COMMAND_SAMPLE_RATE environment variable, or 1.
+    :return:            The listener.
+    """
+    filename = filename or os.environ.get('ENROLLMENT_COMMAND_STATS', 'command_stats.json')
+    if sample_rate is None:
+        sample_rate = float(os.environ.get('ENROLLMENT_COMMAND_SAMPLE_RATE', 1.0))
+    stats = CommandStats(sample_rate)
+    monitoring.register(stats)
+    atexit.register(stats.dump, filename)
+    if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, lambda signum, frame: stats.dump(filename))
+    return stats
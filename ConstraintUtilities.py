@@ -1,8 +1,21 @@
 import datetime
+import os
+
+from mongoengine.errors import NotUniqueError
+from pymongo.errors import DuplicateKeyError
 
 from Menu import Menu
 from Option import Option
 
+# The two ways that insert_general can guard the uniqueness constraints:
+#   precheck   - run unique_general first, and only save when nothing is violated.
+#   optimistic - just insert, and let the unique indexes on the server reject duplicates.
+# The default can be set with the ENROLLMENT_INSERT_STRATEGY environment variable so that
+# the two strategies can be compared without changing any code.
+PRECHECK = 'precheck'
+OPTIMISTIC = 'optimistic'
+insert_strategy = os.environ.get('ENROLLMENT_INSERT_STRATEGY', PRECHECK)
+
 
 def prompt_for_date(prompt: str) -> datetime:
     """
@@ -27,6 +40,23 @@ def prompt_for_date(prompt: str) -> datetime:
             print('Please try again.')
 
 
+def prompt_for_optional_int(prompt: str) -> int:
+    """
+    Prompt for a whole number that the user may leave out.  Keeps prompting until the entry is
+    blank or a whole number.
+    :param prompt:  The text to display, which should say what leaving it blank means.
+    :return:        The number, or None if the entry was blank.
+    """
+    while True:
+        entry = input(prompt).strip()
+        if not entry:
+            return None
+        try:
+            return int(entry)
+        except ValueError:
+            print(f'{entry} is not a whole number.  Please try again.')
+
+
 def get_attr_from_column(cls, column_name) -> str:
     """
     Returns the name of the attribute that corresponds to the given column name.  The attribute
@@ -44,30 +74,114 @@ def get_attr_from_column(cls, column_name) -> str:
             return attribute
 
 
+# Per-class cache of the uniqueness constraints and the column -> attribute map for each
+# MongoEngine class.  Building these means a round trip to MongoDB for index_information()
+# and a scan of the class attributes for every column, so we only do it once per class.
+_constraint_registry = {}
+
+
+def _declared_index_version(cls):
+    """
+    Returns a fingerprint of the indexes that the class declares in its meta.  If someone changes
+    (or reloads) the class with a different set of indexes, the fingerprint changes and the cached
+    constraints for that class are rebuilt the next time that they are asked for.
+    :param cls:     The MongoEngine class.
+    :return:        A hashable description of the declared indexes.
+    """
+    return tuple((spec.get('name'), tuple(spec['fields']), spec.get('unique', False))
+                 for spec in cls._meta.get('index_specs', []))
+
+
+def _registry_entry(cls) -> dict:
+    """
+    Find (or build) the cached constraint information for the given class.
+    :param cls:     The MongoEngine class that we want the constraints for.
+    :return:        A dictionary with the unique constraints and the column -> attribute map.
+    """
+    version = _declared_index_version(cls)
+    entry = _constraint_registry.get(cls)
+    if entry is None or entry['version'] != version:
+        index_info = cls._get_collection().index_information()
+        constraints = []
+        for index in index_info.keys():
+            # _id_ does not have a property named unique since _id_ is ALWAYS unique.  Hence, the order in the if.
+            if index == '_id_' or index_info[index].get('unique'):
+                constraints.append({'name': index, 'columns': [col[0] for col in index_info[index]['key']]})
+        attributes = {}
+        for attribute, field in cls._fields.items():
+            # Keep the first attribute that maps to a column, the same as get_attr_from_column does.
+            attributes.setdefault(field.db_field, attribute)
+        entry = {'version': version, 'constraints': constraints, 'attributes': attributes}
+        _constraint_registry[cls] = entry
+    return entry
+
+
+def declared_constraints(cls) -> [dict]:
+    """
+    Returns the uniqueness constraints that the class declares in its meta, in the same form as
+    get_constraints, without asking MongoDB.  For code that has no MongoEngine connection to ask
+    with, such as the asyncio service layer.
+    :param cls:     The MongoEngine class.
+    :return:        A list of {'name': index name, 'columns': [column names]} dictionaries.
+    """
+    constraints = [{'name': '_id_', 'columns': ['_id']}]
+    for spec in cls._meta.get('index_specs', []):
+        if spec.get('unique'):
+            constraints.append({'name': spec.get('name'), 'columns': [column for column, _ in spec['fields']]})
+    return constraints
+
+
+def get_constraints(cls) -> [dict]:
+    """
+    Returns the uniqueness constraints on the collection for the given class, served from the
+    registry after the first call.
+    :param cls:     The MongoEngine class.
+    :return:        A list of {'name': index name, 'columns': [column names]} dictionaries.
+    """
+    return _registry_entry(cls)['constraints']
+
+
+def get_column_attributes(cls) -> dict:
+    """
+    Returns the cached mapping from database column name to attribute name for the given class.
+    :param cls:     The MongoEngine class.
+    :return:        A dictionary of column name -> attribute name.
+    """
+    return _registry_entry(cls)['attributes']
+
+
+def invalidate_constraints(cls=None):
+    """
+    Drop the cached constraints so that they are read from MongoDB again on the next use.  Call
+    this after creating or dropping indexes on a collection.
+    :param cls:     The class to forget about, or None to clear the whole registry.
+    :return:        None
+    """
+    if cls is None:
+        _constraint_registry.clear()
+    else:
+        _constraint_registry.pop(cls, None)
+
+
 def select_general(cls):
     """Return one instance of the class that's supplied as an input, by prompting the user for
     the values of the selected uniqueness constraint for the collection corresponding to that class.
     :param cls: The class that the user wants a single instance of.
     :return: The instance that the user selected."""
-    # If we were doing this directly in mongodb, we'd say collection=db[whatever collection it is]
-    collection = cls._get_collection()
-    index_info = collection.index_information()
-    # Loop through the indexes of the collection.
+    # The uniqueness constraints come from the registry, so we only ask MongoDB for them once.
+    constraints = {constraint['name']: constraint['columns'] for constraint in get_constraints(cls)}
+    attributes = get_column_attributes(cls)
     choices = []
-    for index in index_info.keys():
-        # see if the index is unique.  If not, we're not interested in using it.
-        # _id_ does not have a property named unique since _id_ is ALWAYS unique.  Hence, the order in the if statement.
-        if index == '_id_' or index_info[index]['unique']:
-            columns = [col[0] for col in index_info[index]['key']]
-            choices.append(Option(f'index: {index} - cols: {columns}', index))
+    for index, columns in constraints.items():
+        choices.append(Option(f'index: {index} - cols: {columns}', index))
     index_menu = Menu('which index', 'Which index do you want to search by:', choices)
     while True:
         # What happens if there are no unique indexes at all?
         chosen_index = index_menu.menu_prompt()
         filters = {}  # The attribute/value pairs that we're going to search by
-        for column in [col[0] for col in index_info[chosen_index]['key']]:
+        for column in constraints[chosen_index]:
             # now I have to convert from the column name to the attribute name.
-            attribute_name = get_attr_from_column(cls, column)
+            attribute_name = attributes[column]
             # If this attribute is a reference, we need to go find that referenced document.
             attribute = getattr(cls, attribute_name)
             if type(attribute).__name__ == 'ReferenceField':
@@ -97,7 +211,34 @@ def select_general(cls):
             print('Sorry, no rows found that match those criteria.  Try again.')
 
 
-def unique_general(instance):
+def _unique_batched(instance, constraints) -> [dict]:
+    """
+    Check every uniqueness constraint of the instance with a single query.  Each constraint becomes
+    one branch of an $or, and the (at most one per constraint) documents that come back are
+    matched against each branch to tell which of the named constraints they violate.
+    :param instance:    The MongoEngine instance that we are about to insert.
+    :param constraints: The uniqueness constraints from the registry.
+    :return:            The violated constraints, in the same order as constraints.
+    """
+    # to_mongo gives us the values the way that they will be stored: column names, enum values, embedded SON.
+    document = instance.to_mongo()
+    clauses = []
+    projection = {}
+    for constraint in constraints:
+        clauses.append({column: document.get(column) for column in constraint['columns']})
+        for column in constraint['columns']:
+            projection[column] = True
+    if not clauses:
+        return []
+    matched = set()
+    for existing in instance.__class__._get_collection().find({'$or': clauses}, projection):
+        for position, clause in enumerate(clauses):
+            if all(existing.get(column) == value for column, value in clause.items()):
+                matched.add(position)
+    return [constraint for position, constraint in enumerate(constraints) if position in matched]
+
+
+def unique_general(instance, batched: bool = True):
     """
     Check all uniqueness constraints on the collection that instance belongs to and return those
     uniqueness constraints that have been violated.  If that returned list has no members, then
@@ -105,31 +246,25 @@ def unique_general(instance):
     save that instance.
     :param instance:    An instance of a MongoEngine class that the user want to test against all
                         uniqueness constraints on that collection.
+    :param batched:     True to check all the constraints in one round trip to the server, False
+                        to run one count query per uniqueness constraint.
     :return:            A list of the 0 or more uniqueness constraints that have been violated.
     """
-    # If we were doing this directly in mongodb, we'd say collection=db[whatever collection it is]
     cls = instance.__class__  # get the class from the instance.
-    collection = cls._get_collection()  # Get the collection corresponding to that class.
-    index_info = collection.index_information()  # get a list of all indexes on that collection.
-    # Loop through the indexes of the collection.
-    constraints = []
+    # The unique indexes (including _id_) and the column -> attribute map come from the registry.
+    # Normally, _id_ is assigned by MongoDB, but the user COULD use that for a descriptive
+    # attribute, which COULD mean that there is a document with that _id_ value already.
+    constraints = get_constraints(cls)
+    if batched:
+        return _unique_batched(instance, constraints)
+    attributes = get_column_attributes(cls)
     violated_constraints = []
-    for index in index_info.keys():  # Loop through the list of index names.
-        # see if the index is unique.  If not, we're not interested in using it.
-        # _id_ does not have a property named unique since _id_ is ALWAYS unique.
-        # Normally, _id_ is assigned by MongoDB, but the user COULD use that for a descriptive
-        # attribute, which COULD mean that there is a document with that _id_ value already.
-        if index == '_id_' or index_info[index]['unique']:
-            # harvest the list of column names from this index.
-            columns = [col[0] for col in index_info[index]['key']]
-            # add the name of the index & the column list to our constraints list of dictionaries.
-            constraints.append({'name': index, 'columns': columns})
     for constraint in constraints:
         # What happens if there are no unique indexes at all?
         filters = {}  # The attribute/value pairs that we're going to search by
         for column in constraint['columns']:
             # now I have to convert from the column name to the attribute name.
-            attribute_name = get_attr_from_column(cls, column)
+            attribute_name = attributes[column]
             # Add the next key=value pair to our list of filters.
             filters[attribute_name] = instance[attribute_name]
         # count the number of rows that meet those criteria.
@@ -139,3 +274,67 @@ def unique_general(instance):
             violated_constraints.append(constraint)
     # If the returned list of violated constraints == [], we know that we are good to insert this object.
     return violated_constraints
+
+
+def set_insert_strategy(strategy: str):
+    """
+    Choose how insert_general checks the uniqueness constraints from now on.
+    :param strategy:    Either PRECHECK or OPTIMISTIC.
+    :return:            None
+    """
+    global insert_strategy
+    if strategy not in (PRECHECK, OPTIMISTIC):
+        raise ValueError(f'Unknown insert strategy: {strategy}')
+    insert_strategy = strategy
+
+
+def constraint_from_duplicate_key(cls, error: DuplicateKeyError):
+    """
+    Work out which named uniqueness constraint a duplicate key error came from.  The server reports
+    the offending key values in keyValue, so we look for the unique index with exactly those columns.
+    If the server did not send keyValue, we fall back on the index name in the error message.
+    :param cls:     The MongoEngine class that we were inserting into.
+    :param error:   The DuplicateKeyError that the server raised.
+    :return:        The {'name': ..., 'columns': [...]} constraint, or None if we cannot tell.
+    """
+    details = error.details or {}
+    constraints = get_constraints(cls)
+    columns = set((details.get('keyValue') or {}).keys())
+    for constraint in constraints:
+        if columns and set(constraint['columns']) == columns:
+            return constraint
+    message = details.get('errmsg', str(error))
+    for constraint in constraints:
+        if f'index: {constraint["name"]} ' in message:
+            return constraint
+    return None
+
+
+def insert_general(instance, strategy: str = None) -> [dict]:
+    """
+    Insert a brand-new instance, respecting all the uniqueness constraints on its collection.
+    Either way, the caller gets back the list of violated uniqueness constraints, in the same
+    form that unique_general returns them.  The optimistic strategy only learns about the first
+    constraint that the server tripped over, where the precheck reports all of them.
+    :param instance:    An instance of a MongoEngine class that has not been saved yet.
+    :param strategy:    PRECHECK or OPTIMISTIC.  Defaults to the module wide insert_strategy.
+    :return:            A list of the 0 or more uniqueness constraints that have been violated.
+                        If the list is empty, the instance has been saved.
+    """
+    strategy = strategy or insert_strategy
+    if strategy == PRECHECK:
+        violated_constraints = unique_general(instance)
+        if not violated_constraints:
+            instance.save()
+        return violated_constraints
+    try:
+        instance.save(force_insert=True)
+    except NotUniqueError as nue:
+        # MongoEngine wraps the DuplicateKeyError, the original is still chained onto the exception.
+        duplicate = nue.__cause__ or nue.__context__
+        if isinstance(duplicate, DuplicateKeyError):
+            constraint = constraint_from_duplicate_key(instance.__class__, duplicate)
+            if constraint:
+                return [constraint]
+        raise
+    return []
@@ -15,6 +15,10 @@ class Course(Document):
         'indexes': [
             {'unique': True, 'fields': ['abbreviation', 'courseNumber'], 'name': 'course_uk_01'},
             {'unique': True, 'fields': ['abbreviation', 'courseName'], 'name': 'course_uk_02'}
+        ],
+        'dependents': [
+            {'name': 'course_section_fk', 'document': 'Section', 'fields': {'course__course': 'id'},
+             'description': 'sections are found in this course'}
         ]
     }
 
@@ -21,6 +21,13 @@ class Department(Document):
             {'unique': True, 'fields': ['departmentName'], 'name': 'department_uk_02'},
             {'unique': True, 'fields': ['chairName'], 'name': 'department_uk_03'},
             {'unique': True, 'fields': ['building', 'office'], 'name': 'department_uk_04'},
+        ],
+        'dependents': [
+            {'name': 'department_course_fk', 'document': 'Course', 'fields': {'abbreviation': 'abbreviation'},
+             'description': 'courses are found in this department'},
+            {'name': 'department_major_fk', 'document': 'Major',
+             'fields': {'departmentEmbedded__abbreviation': 'abbreviation'},
+             'description': 'majors are found in this department'}
         ]
     }
 
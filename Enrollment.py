@@ -15,15 +15,8 @@ class Enrollment(EmbeddedDocument):
     passFail = EmbeddedDocumentField('PassFail', db_field='pass_fail')
     letterGrade = EmbeddedDocumentField('LetterGrade', db_field='letter_grade')
 
-    meta = {
-        'collection': 'enrollments',
-        'indexes': [
-            {'unique': True, 'fields': ['student', 'section_number'], 'name': 'enrollment_uk_01'},
-            {'unique': True,
-             'fields': ['semester', 'sectionYear', 'abbreviation', 'courseNumber', 'studentID'],
-             'name': 'enrollment_uk_02'}
-        ]
-    }
+    # Enrollments are embedded in students, so MongoDB never creates indexes declared here.  The
+    # multikey indexes on students.enrollment are declared in Student.
 
     def __str__(self):
         return (f"    - Course number: {self.courseNumber}\n"
@@ -0,0 +1,21 @@
+from mongoengine import *
+from Enrollment import Enrollment
+
+
+class EnrollmentArchive(Document):
+    """The enrollments of one student in the closed terms of one year.  Archive.migrate moves them
+    here out of the student, so that the student document only carries the current enrollments."""
+    student = ReferenceField('Student', db_field='student', required=True)
+    year = IntField(db_field='year', required=True)
+
+    enrollment = ListField(EmbeddedDocumentField('Enrollment', db_field='enrollment', required=True))
+
+    meta = {
+        'collection': 'enrollment_archives',
+        'indexes': [
+            {'unique': True, 'fields': ['student', 'year'], 'name': 'enrollment_archive_uk_01'}
+        ]
+    }
+
+    def __str__(self):
+        return f'Archived enrollments for {self.year}: {len(self.enrollment)}'
@@ -0,0 +1,77 @@
+"""
+Index provisioning and query plan verification.  MongoEngine only creates the indexes declared in
+a class's meta lazily, so provision_indexes builds all of them up front at startup, and
+verify_query_plans makes sure that the hot lookups in main.py are really answered from an index.
+"""
+from ConstraintUtilities import invalidate_constraints
+from Department import Department
+from Course import Course
+from Section import Section
+from Major import Major
+from Student import Student
+from Waitlist import Waitlist
+from RosterEntry import RosterEntry
+from EnrollmentArchive import EnrollmentArchive
+
+# Every class that has a collection of its own.
+MODELS = [Department, Course, Section, Major, Student, Waitlist, RosterEntry, EnrollmentArchive]
+
+# The lookups from main.py that must never scan a whole collection.  Each entry is a description,
+# the class, and the filter with stand-in values (the plan does not depend on the values).
+HOT_QUERIES = [
+    ('department by abbreviation', Department, {'abbreviation': 'CECS'}),
+    ('major by name', Major, {'majorName': 'Computer Science'}),
+    ('student by name', Student, {'lastName': 'Doe', 'firstName': 'Jane'}),
+    ('students enrolled in a section', Student, {'enrollment__sectionNumber': 1}),
+    ('students enrolled in a course section', Student, {'enrollment__sectionNumber': 1,
+                                                        'enrollment__courseNumber': 323}),
+    ('students declared in a major', Student, {'studentMajor__majorName': 'Computer Science'}),
+    ('sections of a course', Section, {'courseNumber': 323}),
+    ('waitlist of a section', Waitlist, {'section': None}),
+    ('roster of a section', RosterEntry, {'section': None}),
+]
+
+
+def provision_indexes():
+    """
+    Create every index declared in the meta of each class (including the multikey indexes on the
+    embedded arrays), and make the constraint registry pick up any that are new.
+    :return:    None
+    """
+    for model in MODELS:
+        model.ensure_indexes()
+    invalidate_constraints()
+
+
+def plan_stages(plan) -> [str]:
+    """
+    Collect the names of every stage in an explain plan.  Plans nest their stages in inputStage,
+    inputStages, or (with the slot based engine) queryPlan, so we just walk everything.
+    :param plan:    The explain output, or any part of it.
+    :return:        The list of stage names, e.g. ['FETCH', 'IXSCAN'].
+    """
+    stages = []
+    if isinstance(plan, dict):
+        if isinstance(plan.get('stage'), str):
+            stages.append(plan['stage'])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(plan_stages(value))
+    return stages
+
+
+def verify_query_plans():
+    """
+    Explain each of the HOT_QUERIES and fail loudly if any of them still does a collection scan.
+    :return:    None
+    :raises RuntimeError:   Listing every hot query whose winning plan contains a COLLSCAN.
+    """
+    scans = []
+    for description, model, filters in HOT_QUERIES:
+        explained = model.objects(**filters).explain()
+        if 'COLLSCAN' in plan_stages(explained['queryPlanner']['winningPlan']):
+            scans.append(f'{description}: {model.__name__}.objects({filters})')
+    if scans:
+        raise RuntimeError('These queries are doing a collection scan:\n    ' + '\n    '.join(scans))
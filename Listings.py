@@ -0,0 +1,255 @@
+"""
+Read-only listings.
+
+Listings that join parents to their children do not ask for the children of each parent one
+query at a time.  Each of them runs a single sorted query (or aggregation) over the children, and
+hands them back grouped by parent as the cursor streams in.
+
+The listings also skip building MongoEngine documents when they can.  documents() asks for raw
+dictionaries with just the fields that __str__ prints, and display() formats them with the
+lightweight formatters below, which produce exactly the same text as __str__.
+"""
+import os
+from itertools import groupby
+
+from ConstraintUtilities import get_constraints
+from enums import Building, Schedule, Semester
+from Department import Department
+from Course import Course
+from Section import Section
+from Major import Major
+from Student import Student
+
+# True to list from raw documents, False to hydrate every document and call its __str__.
+raw_listings = True
+# How many documents the paginated listings show at a time, and how many documents the cursor
+# fetches from the server in each batch.
+default_page_size = int(os.environ.get('ENROLLMENT_PAGE_SIZE', 20))
+default_batch_size = int(os.environ.get('ENROLLMENT_CURSOR_BATCH_SIZE', 100))
+
+
+def _enum(enum_class, value):
+    """Turn a stored enum value back into the enum member, which is what __str__ prints."""
+    return None if value is None else enum_class(value)
+
+
+def _department_text(document: dict) -> str:
+    return (f"Department name: {document.get('department_name')}\n"
+            f"   Abbreviation: {document.get('abbreviation')}\n"
+            f"   Chair name: {document.get('chair_name')}\n"
+            f"   Building: {document.get('building')}\n"
+            f"   Office: {document.get('office')}\n"
+            f"   Description: {document.get('description')}")
+
+
+def _course_text(document: dict) -> str:
+    return (f"Department: {document.get('department_embedded', {}).get('department_name')}\n"
+            f"    Course Name: {document.get('course_name')}\n"
+            f"    Course Number: {document.get('course_number')}\n"
+            f"    Units: {document.get('units')}\n"
+            f"    Description: {document.get('description')}")
+
+
+def _section_text(document: dict) -> str:
+    course = document.get('course_embedded', {})
+    return (f"Course: {course.get('course_name')} {course.get('course_number')}\n"
+            f"   Section Number: {document.get('section_number')}\n"
+            f"   Semester: {_enum(Semester, document.get('semester'))}\n"
+            f"   Section Year: {document.get('section_year')}\n"
+            f"   Building: {_enum(Building, document.get('building'))}\n"
+            f"   Room Number: {document.get('room')}\n"
+            f"   Schedule: {_enum(Schedule, document.get('schedule'))}\n"
+            f"   StartTime: {document.get('startTime')}\n"
+            f"   Instructor: {document.get('instructor')}")
+
+
+def _major_text(document: dict) -> str:
+    return (f"Department: {document.get('department_embedded', {}).get('department_name')}\n"
+            f"  major name: {document.get('major_name')}\n"
+            f"  Description: {document.get('description')}")
+
+
+def _student_text(document: dict) -> str:
+    return (f"Student's last name: {document.get('last_name')}\n"
+            f"Student's first name: {document.get('first_name')}\n"
+            f"email: {document.get('e_mail')}")
+
+
+# For each class: the attributes that its __str__ prints (the projection), and the raw formatter.
+RAW_VIEWS = {
+    Department: (['departmentName', 'abbreviation', 'chairName', 'building', 'office', 'description'],
+                 _department_text),
+    Course: (['departmentEmbedded', 'courseName', 'courseNumber', 'units', 'description', 'abbreviation'],
+             _course_text),
+    Section: (['course', 'courseNumber', 'sectionNumber', 'semester', 'sectionYear', 'building', 'roomNumber',
+               'schedule', 'startTime', 'instructor'], _section_text),
+    Major: (['departmentEmbedded', 'majorName', 'description'], _major_text),
+    Student: (['lastName', 'firstName', 'eMail'], _student_text),
+}
+
+
+def documents(queryset):
+    """
+    The documents of a read-only listing, as raw dictionaries with only the printed fields when
+    raw_listings is on, or as MongoEngine documents when it is off.
+    :param queryset:    The MongoEngine queryset to list.
+    :return:            Something to iterate over; pass each item to display().
+    """
+    cls = queryset._document
+    if raw_listings and cls in RAW_VIEWS:
+        return queryset.only(*RAW_VIEWS[cls][0]).as_pymongo()
+    return queryset
+
+
+def attribute_value(cls, document, attribute: str):
+    """
+    Read an attribute from an item returned by documents(), whichever form it is in.
+    :param cls:         The MongoEngine class that the document belongs to.
+    :param document:    A raw dictionary or a MongoEngine document.
+    :param attribute:   The attribute name.
+    :return:            The value of that attribute.
+    """
+    if isinstance(document, dict):
+        return document.get(cls._fields[attribute].db_field)
+    return getattr(document, attribute)
+
+
+def display(cls, document) -> str:
+    """
+    The text that the listing prints for one item returned by documents().
+    :param cls:         The MongoEngine class that the document belongs to.
+    :param document:    A raw dictionary or a MongoEngine document.
+    :return:            The same text as str() of the MongoEngine document.
+    """
+    if isinstance(document, dict):
+        return RAW_VIEWS[cls][1](document)
+    return str(document)
+
+
+def sections_by_course():
+    """
+    All the sections, grouped by course and sorted by course and section number.  One query,
+    supported by section_ix_01.
+    :return:    A generator of (course number, iterator of sections) pairs.  Print the sections with display().
+    """
+    sections = documents(Section.objects().order_by('courseNumber', 'sectionNumber'))
+    for course_number, course_sections in groupby(
+            sections, key=lambda section: attribute_value(Section, section, 'courseNumber')):
+        yield course_number, course_sections
+
+
+def courses_by_department():
+    """
+    All the courses, grouped by department and sorted by department abbreviation and course
+    number.  One query, supported by course_uk_01.
+    :return:    A generator of (department abbreviation, iterator of courses) pairs.  Print the courses
+                with display().
+    """
+    courses = documents(Course.objects().order_by('abbreviation', 'courseNumber'))
+    for abbreviation, department_courses in groupby(
+            courses, key=lambda course: attribute_value(Course, course, 'abbreviation')):
+        yield abbreviation, department_courses
+
+
+def enrollments_by_section():
+    """
+    Every enrollment, grouped by the section that it is in.  Enrollments are embedded in the
+    students, so this is one aggregation that unwinds them and sorts them by section; the
+    grouping is done here as the results stream in, so the server never builds the rosters.
+    :return:    A generator of (section key, iterator of enrollment dictionaries) pairs.  The section
+                key is (semester, year, abbreviation, course number, section number), and each
+                enrollment dictionary has the student's last_name, first_name and e_mail.
+    """
+    pipeline = [
+        {'$match': {'enrollment.section_number': {'$exists': True}}},
+        {'$unwind': '$enrollment'},
+        {'$project': {'_id': 0, 'last_name': 1, 'first_name': 1, 'e_mail': 1,
+                      'semester': '$enrollment.semester', 'section_year': '$enrollment.section_year',
+                      'abbreviation': '$enrollment.abbreviation', 'course_number': '$enrollment.course_number',
+                      'section_number': '$enrollment.section_number'}},
+        {'$sort': {'section_year': 1, 'semester': 1, 'abbreviation': 1, 'course_number': 1,
+                   'section_number': 1, 'last_name': 1, 'first_name': 1}}
+    ]
+    enrollments = Student._get_collection().aggregate(pipeline, allowDiskUse=True)
+
+    def section_key(enrollment):
+        return (enrollment.get('semester'), enrollment.get('section_year'), enrollment.get('abbreviation'),
+                enrollment.get('course_number'), enrollment.get('section_number'))
+
+    for key, section_enrollments in groupby(enrollments, key=section_key):
+        yield key, section_enrollments
+
+
+class Pager:
+    """
+    Keyset pagination over a collection, in the order of its natural sort keys.  Each page is
+    fetched with a range query that starts just after (or just before) the keys of the edge of the
+    current page, so a page costs the same no matter how deep into the collection it is, as long
+    as there is an index on the sort keys.  If the sort keys are not a uniqueness constraint, _id
+    is added to them to break ties.
+    """
+    def __init__(self, cls, sort: [str], page_size: int = None, batch_size: int = None):
+        """
+        :param cls:         The MongoEngine class to page through.
+        :param sort:        The attribute names to sort by, most significant first.
+        :param page_size:   The number of documents on a page.  Defaults to default_page_size.
+        :param batch_size:  The cursor batch size.  Defaults to default_batch_size.
+        """
+        self.cls = cls
+        self.sort = list(sort)
+        columns = [cls._fields[attribute].db_field for attribute in self.sort]
+        if not any(constraint['columns'] == columns for constraint in get_constraints(cls)):
+            self.sort.append('id')
+        self.page_size = page_size or default_page_size
+        self.batch_size = batch_size or default_batch_size
+        self.first = None       # The sort keys of the first document on the current page.
+        self.last = None        # The sort keys of the last document on the current page.
+
+    def _keys(self, document) -> tuple:
+        keys = []
+        for attribute in self.sort:
+            field = self.cls._fields[attribute]
+            value = attribute_value(self.cls, document, attribute)
+            # Hydrated documents give us Python values; the range query needs them the way they are stored.
+            keys.append(value if isinstance(document, dict) else field.to_mongo(value))
+        return tuple(keys)
+
+    def _range(self, keys: tuple, operator: str) -> dict:
+        """The raw filter for every document strictly after (or before) keys in sort order."""
+        branches = []
+        for position, attribute in enumerate(self.sort):
+            branch = {self.cls._fields[prior].db_field: keys[prior_position]
+                      for prior_position, prior in enumerate(self.sort[:position])}
+            branch[self.cls._fields[attribute].db_field] = {operator: keys[position]}
+            branches.append(branch)
+        # The bound on the leading key lets the server start the index scan at the edge of the page.
+        leading = self.cls._fields[self.sort[0]].db_field
+        return {leading: {operator + 'e': keys[0]}, '$or': branches}
+
+    def _fetch(self, keys, forward: bool) -> list:
+        order = [attribute if forward else f'-{attribute}' for attribute in self.sort]
+        queryset = self.cls.objects().order_by(*order).limit(self.page_size).batch_size(self.batch_size)
+        if keys is not None:
+            queryset = queryset.filter(__raw__=self._range(keys, '$gt' if forward else '$lt'))
+        page = list(documents(queryset))
+        if not forward:
+            page.reverse()
+        if page:
+            self.first = self._keys(page[0])
+            self.last = self._keys(page[-1])
+        return page
+
+    def next_page(self) -> list:
+        """
+        :return:    The next page of documents (the first page, the first time), or an empty list
+                    if there are no more.  Print each one with display().
+        """
+        return self._fetch(self.last, True)
+
+    def previous_page(self) -> list:
+        """
+        :return:    The page before the current one, or an empty list if this is the first page.
+        """
+        if self.first is None:
+            return []
+        return self._fetch(self.first, False)
@@ -11,7 +11,13 @@ class Major(Document):
     meta = {
         'collection': 'majors',
         'indexes': [
-            {'unique': True, 'fields': ['majorName'], 'name': 'major_uk_01'}
+            {'unique': True, 'fields': ['majorName'], 'name': 'major_uk_01'},
+            {'fields': ['departmentEmbedded.abbreviation'], 'name': 'major_ix_01'}
+        ],
+        'dependents': [
+            {'name': 'major_student_fk', 'document': 'Student', 'fields': {'studentMajor__majorName': 'majorName'},
+             'description': 'a student is declared in this major',
+             'cascade': {'pull': 'studentMajor', 'match': {'majorName': 'majorName'}}}
         ]
     }
 
@@ -0,0 +1,152 @@
+"""
+Read-through cache for the reference entities: departments, courses and majors.  These change a
+few times per term but are looked up on nearly every add and delete, so each lookup is served
+from a bounded, thread-safe LRU cache keyed by the entity's uniqueness constraint.  The services
+evict an entity themselves, with evict(), when they delete it or update it in place.  When the
+blinker package is installed a save() or delete() anywhere else in this process evicts it too,
+through the MongoEngine signals.  Nothing tells the cache about a change made by another process,
+so every entry also expires after a few seconds (DEFAULT_TTL, or ENROLLMENT_CACHE_TTL in the
+environment): a department that another process renamed or deleted is read again soon after.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from mongoengine import signals
+
+from Department import Department
+from Course import Course
+from Major import Major
+
+# How many seconds a cached entity stays good, unless ENROLLMENT_CACHE_TTL says otherwise.
+DEFAULT_TTL = 5.0
+
+
+class ReferenceCache:
+    """
+    A bounded LRU cache with a time to live and hit/miss counters.  Misses (entities
+    that do not exist) are not cached, so a newly added entity is found right away.
+    """
+    def __init__(self, name: str, loader, max_entries: int = 1000, ttl: float = DEFAULT_TTL):
+        """
+        :param name:        A descriptive name, for the statistics.
+        :param loader:      The function that reads the entity from MongoDB, given the key.  Returns None
+                            if there is no such entity.
+        :param max_entries: The most entities to keep.  The least recently used one is evicted first.
+        :param ttl:         How many seconds an entry stays good, or None to keep it until it is evicted
+                            (only safe when no other process changes these entities).
+        """
+        self.name = name
+        self.loader = loader
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()        # key -> (entity, time loaded)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        :param key: The uniqueness constraint values of the entity.
+        :return:    The entity, from the cache if we have a fresh copy, otherwise from MongoDB.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and (self.ttl is None or time.monotonic() - entry[1] < self.ttl):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        # Read outside of the lock, so that one slow read does not hold up every other lookup.
+        entity = self.loader(key)
+        if entity is not None:
+            with self.lock:
+                self.entries[key] = (entity, time.monotonic())
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return entity
+
+    def invalidate(self, key=None):
+        """
+        :param key: The key to evict, or None to empty the whole cache.
+        :return:    None
+        """
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+    def invalidate_entity(self, entity):
+        """
+        Evict the cached copy of an entity, whatever key it was cached under.  Going by the id
+        rather than the key catches an entity whose key values have just been changed.
+        :param entity:  The MongoEngine document that was saved or deleted.
+        :return:        None
+        """
+        with self.lock:
+            for key in [key for key, (cached, _) in self.entries.items() if cached.pk == entity.pk]:
+                del self.entries[key]
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {'name': self.name, 'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+
+_max_entries = int(os.environ.get('ENROLLMENT_CACHE_SIZE', 1000))
+_ttl = float(os.environ.get('ENROLLMENT_CACHE_TTL') or DEFAULT_TTL)
+
+departments = ReferenceCache('departments', lambda abbreviation: Department.objects(abbreviation=abbreviation).first(),
+                             _max_entries, _ttl)
+courses = ReferenceCache('courses', lambda key: Course.objects(abbreviation=key[0], courseNumber=key[1]).first(),
+                         _max_entries, _ttl)
+majors = ReferenceCache('majors', lambda major_name: Major.objects(majorName=major_name).first(),
+                        _max_entries, _ttl)
+
+
+def get_department(abbreviation: str) -> Department:
+    return departments.get(abbreviation)
+
+
+def get_course(abbreviation: str, course_number: int) -> Course:
+    return courses.get((abbreviation, int(course_number)))
+
+
+def get_major(major_name: str) -> Major:
+    return majors.get(major_name)
+
+
+def invalidate_all():
+    for cache in (departments, courses, majors):
+        cache.invalidate()
+
+
+def stats() -> [dict]:
+    return [cache.stats() for cache in (departments, courses, majors)]
+
+
+def evict(document):
+    """
+    Forget the cached copy of a reference entity that was just changed or deleted.
+    :param document:    A Department, Course or Major.  Anything else is ignored.
+    :return:            None
+    """
+    if isinstance(document, Department):
+        departments.invalidate_entity(document)
+    elif isinstance(document, Course):
+        courses.invalidate_entity(document)
+    elif isinstance(document, Major):
+        majors.invalidate_entity(document)
+
+
+def _evict(sender, document, **kwargs):
+    """Signal handler: forget the saved or deleted entity."""
+    evict(document)
+
+
+if signals.signals_available:
+    for _model in (Department, Course, Major):
+        signals.post_save.connect(_evict, sender=_model)
+        signals.post_delete.connect(_evict, sender=_model)
@@ -0,0 +1,122 @@
+"""
+Declarative referential integrity.  Each class lists the documents that depend on it in the
+'dependents' entry of its meta, right next to its indexes:
+
+    'dependents': [
+        {'name': 'major_student_fk',                            # a name for the relationship
+         'document': 'Student',                                 # the class of the dependent documents
+         'fields': {'studentMajor__majorName': 'majorName'},    # dependent query -> our attribute
+         'filter': {...},                                       # optional, extra fixed query terms
+         'description': 'a student is declared in this major',  # why we cannot delete the parent
+         'cascade': {'pull': 'studentMajor',                    # optional, the array to $pull from
+                     'match': {'majorName': 'majorName'}},      # array element attribute -> our attribute
+         'check': False}                                        # optional, only there for the cascade
+    ]
+
+Leave 'check' out unless another relationship already answers the same question more cheaply.
+
+Our attributes may be dotted paths through embedded documents and references, such as
+'course.course.abbreviation'.  A field of the form 'array__match' takes a dictionary of array
+element attribute -> our attribute, and is checked with one $elemMatch, so that all of the values
+have to be found in the same element.
+
+Every check is a limit(1) existence query on the server, so declare an index in the dependent
+class to back each one.
+"""
+from mongoengine.base import get_document
+
+
+def attribute_value(instance, path: str):
+    """The value of an attribute of the instance, or of a dotted path of attributes from it."""
+    value = instance
+    for attribute in path.split('.'):
+        value = getattr(value, attribute)
+    return value
+
+
+def dependent_filters(instance, dependent: dict) -> dict:
+    """
+    Build the MongoEngine query for the documents that depend on instance through one relationship.
+    :param instance:    The parent document.
+    :param dependent:   One entry from the 'dependents' meta of the parent's class.
+    :return:            The keyword arguments for the dependent class's objects().
+    """
+    filters = {}
+    for query, attribute in dependent['fields'].items():
+        if isinstance(attribute, dict):
+            filters[query] = {element: attribute_value(instance, path) for element, path in attribute.items()}
+        else:
+            filters[query] = attribute_value(instance, attribute)
+    filters.update(dependent.get('filter', {}))
+    return filters
+
+
+def has_dependents(instance, dependent: dict) -> bool:
+    """
+    Find out whether at least one document depends on the instance through this relationship.
+    :param instance:    The parent document.
+    :param dependent:   One entry from the 'dependents' meta of the parent's class.
+    :return:            True if there is a dependent document.
+    """
+    cls = get_document(dependent['document'])
+    return cls.objects(**dependent_filters(instance, dependent)).only('id').limit(1).as_pymongo().first() is not None
+
+
+def find_dependents(instance) -> [dict]:
+    """
+    Check all the relationships that the instance's class declares, the same way that
+    unique_general checks all the uniqueness constraints.
+    :param instance:    The document that the user wants to delete.
+    :return:            The 'dependents' entries that still have documents depending on the
+                        instance.  If the list is empty, it is safe to delete the instance.
+    """
+    return [dependent for dependent in instance._meta.get('dependents', [])
+            if dependent.get('check', True) and has_dependents(instance, dependent)]
+
+
+def cascade(instance, dependent: dict) -> int:
+    """
+    Remove whatever depends on the instance through one relationship.  With a 'pull' cascade the
+    matching array elements are pulled out of the dependent documents with one update_many,
+    otherwise the dependent documents themselves are deleted.
+    :param instance:    The parent document.
+    :param dependent:   One entry from the 'dependents' meta of the parent's class.
+    :return:            The number of dependent documents that were changed or deleted.
+    """
+    cls = get_document(dependent['document'])
+    queryset = cls.objects(**dependent_filters(instance, dependent))
+    pull = dependent.get('cascade', {}).get('pull')
+    if not pull:
+        return queryset.delete()
+    array = cls._fields[pull]
+    element_fields = array.field.document_type._fields
+    element = {}
+    for element_attribute, attribute in dependent['cascade']['match'].items():
+        field = element_fields[element_attribute]
+        element[field.db_field] = field.to_mongo(attribute_value(instance, attribute))
+    # queryset._query is the raw MongoDB filter that MongoEngine built from the keyword arguments.
+    return cls._get_collection().update_many(queryset._query, {'$pull': {array.db_field: element}}).modified_count
+
+
+def delete_general(instance, cascades=False) -> [dict]:
+    """
+    Delete the instance, but only if nothing depends on it.  The relationships that will not be
+    cascaded are checked first, so that nothing is cascaded away for a delete that cannot happen.
+    :param instance:    The document to delete.
+    :param cascades:    True to first run all the declared cascades, or the names of the
+                        relationships to cascade, so that those no longer stand in the way.
+    :return:            The relationships that prevented the delete.  If empty, the instance is gone.
+    """
+    dependents = instance._meta.get('dependents', [])
+    cascading = [dependent for dependent in dependents if 'cascade' in dependent and
+                 (cascades is True or (cascades and dependent['name'] in cascades))]
+    blocking = [dependent for dependent in dependents if dependent not in cascading and
+                dependent.get('check', True) and has_dependents(instance, dependent)]
+    if not blocking and cascading:
+        for dependent in cascading:
+            cascade(instance, dependent)
+        blocking = [dependent for dependent in cascading
+                    if dependent.get('check', True) and has_dependents(instance, dependent)]
+    if not blocking:
+        instance.delete()
+    return blocking
@@ -0,0 +1,29 @@
+from mongoengine import *
+
+
+class RosterEntry(Document):
+    """One student enrolled in one section.  This is the section -> students side of the
+    enrollments embedded in the students, kept up to date by Services.enroll and
+    Services.drop_enrollment.  The student's name and e-mail are copied in, so that a roster can
+    be printed without reading the students.  Rosters.check_rosters compares it with the students,
+    and Rosters.rebuild_rosters rebuilds it from them."""
+    section = ReferenceField('Section', db_field='section', required=True)
+    student = ReferenceField('Student', db_field='student', required=True)
+    lastName = StringField(db_field='last_name', required=True)
+    firstName = StringField(db_field='first_name', required=True)
+    eMail = StringField(db_field='e_mail', required=True)
+
+    # roster_ix_01 gives us each section's roster already in name order.
+    meta = {
+        'collection': 'rosters',
+        'indexes': [
+            {'unique': True, 'fields': ['section', 'student'], 'name': 'roster_uk_01'},
+            {'fields': ['section', 'lastName', 'firstName'], 'name': 'roster_ix_01'},
+            {'fields': ['student'], 'name': 'roster_ix_02'}
+        ]
+    }
+
+    def __str__(self):
+        return (f"Student's last name: {self.lastName}\n"
+                f"Student's first name: {self.firstName}\n"
+                f"email: {self.eMail}")
@@ -0,0 +1,176 @@
+"""
+Class rosters.  Enrollments are embedded in the students, so the roster of a section used to take
+a query over the students.  The rosters collection (RosterEntry) is the reverse index: one entry
+per (section, student), maintained in the same code paths that push and pull the enrollments.
+The count of students in a section is Section.enrolledCount, which those code paths maintain as
+well, so it is a single document read.
+
+If the two ever disagree (a process died between the $push and the roster insert, say),
+check_rosters reports the differences and rebuild_rosters regenerates the rosters, and the
+enrolled counts, from the students.
+"""
+import csv
+from itertools import chain
+
+from Course import Course
+from EnrollmentArchive import EnrollmentArchive
+from RosterEntry import RosterEntry
+from Section import Section
+from Student import Student
+
+# The attributes of a student that are copied into the roster.
+ROSTER_ATTRIBUTES = ['lastName', 'firstName', 'eMail']
+
+
+def add_to_roster(section: Section, student: Student):
+    """
+    Record that the student is now enrolled in the section.  An upsert, so that running it twice
+    does no harm.
+    :param section: The section.
+    :param student: The student, with at least the ROSTER_ATTRIBUTES loaded.
+    :return:        None
+    """
+    copied = {Student._fields[attribute].db_field: student[attribute] for attribute in ROSTER_ATTRIBUTES}
+    RosterEntry._get_collection().update_one({'section': section.pk, 'student': student.pk},
+                                             {'$set': copied}, upsert=True)
+
+
+def remove_from_roster(section: Section, student: Student):
+    """Record that the student is no longer enrolled in the section."""
+    RosterEntry._get_collection().delete_one({'section': section.pk, 'student': student.pk})
+
+
+def enrolled_count(section: Section) -> int:
+    """The number of students enrolled in the section, without counting them."""
+    document = Section.objects(pk=section.pk).only('enrolledCount').as_pymongo().first()
+    return (document or {}).get('enrolled_count', 0)
+
+
+def roster(section: Section, batch_size: int = 500):
+    """
+    Stream the roster of a section in name order, straight off of roster_ix_01.
+    :param section:     The section.
+    :param batch_size:  How many entries the cursor fetches from the server at a time.
+    :return:            A cursor of dictionaries with last_name, first_name, e_mail and student.
+    """
+    return RosterEntry._get_collection().find(
+        {'section': section.pk}, {'_id': 0, 'section': 0},
+        sort=[('last_name', 1), ('first_name', 1)], batch_size=batch_size)
+
+
+def export_roster(section: Section, filename: str) -> int:
+    """
+    Write the roster of a section to a CSV file, one entry at a time.
+    :param section:     The section.
+    :param filename:    The CSV file to write.
+    :return:            The number of students written.
+    """
+    written = 0
+    with open(filename, 'w', newline='') as output:
+        writer = csv.writer(output)
+        writer.writerow(['last_name', 'first_name', 'e_mail', 'student'])
+        for entry in roster(section):
+            writer.writerow([entry.get('last_name'), entry.get('first_name'), entry.get('e_mail'),
+                             entry.get('student')])
+            written += 1
+    return written
+
+
+def _section_ids() -> dict:
+    """
+    Map the natural key of every section, as it is stored in an enrollment, to the section's _id.
+    Course numbers are only unique within a department, so the key starts with the department
+    abbreviation, which the section has through its course.
+    """
+    abbreviations = {course['_id']: course['abbreviation']
+                     for course in Course._get_collection().find({}, {'abbreviation': 1})}
+    sections = Section._get_collection().find({}, {'course_embedded.course': 1, 'course_number': 1,
+                                                   'section_number': 1, 'semester': 1, 'section_year': 1})
+    return {(abbreviations.get(section.get('course_embedded', {}).get('course')), section.get('course_number'),
+             section.get('section_number'), section.get('semester'), section.get('section_year')): section['_id']
+            for section in sections}
+
+
+def _expected_entries():
+    """
+    Derive the roster entries from the students, with one aggregation that unwinds the enrollments,
+    and from the archived enrollments, with one that unwinds the buckets and looks up the students.
+    :return:    A generator of roster entry dictionaries, ready to insert.  Enrollments in a section
+                that no longer exists are skipped.
+    """
+    section_ids = _section_ids()
+    pipeline = [
+        {'$match': {'enrollment.section_number': {'$exists': True}}},
+        {'$unwind': '$enrollment'},
+        {'$project': {'last_name': 1, 'first_name': 1, 'e_mail': 1, 'abbreviation': '$enrollment.abbreviation',
+                      'course_number': '$enrollment.course_number', 'section_number': '$enrollment.section_number',
+                      'semester': '$enrollment.semester', 'section_year': '$enrollment.section_year'}}
+    ]
+    archived = [
+        {'$unwind': '$enrollment'},
+        {'$lookup': {'from': Student._get_collection_name(), 'localField': 'student', 'foreignField': '_id',
+                     'as': 'owner'}},
+        {'$unwind': '$owner'},
+        {'$project': {'_id': '$student', 'last_name': '$owner.last_name', 'first_name': '$owner.first_name',
+                      'e_mail': '$owner.e_mail', 'abbreviation': '$enrollment.abbreviation',
+                      'course_number': '$enrollment.course_number',
+                      'section_number': '$enrollment.section_number', 'semester': '$enrollment.semester',
+                      'section_year': '$enrollment.section_year'}}
+    ]
+    enrollments = chain(Student._get_collection().aggregate(pipeline, allowDiskUse=True),
+                        EnrollmentArchive._get_collection().aggregate(archived, allowDiskUse=True))
+    for enrollment in enrollments:
+        section_id = section_ids.get((enrollment.get('abbreviation'), enrollment.get('course_number'),
+                                      enrollment.get('section_number'), enrollment.get('semester'),
+                                      enrollment.get('section_year')))
+        if section_id is not None:
+            yield {'section': section_id, 'student': enrollment['_id'], 'last_name': enrollment.get('last_name'),
+                   'first_name': enrollment.get('first_name'), 'e_mail': enrollment.get('e_mail')}
+
+
+def check_rosters() -> dict:
+    """
+    Compare the rosters with the enrollments in the students, and the enrolled counts with the rosters.
+    :return:    A dictionary with 'missing' (the (section, student) pairs enrolled but not on the roster),
+                'extra' (on the roster but not enrolled) and 'miscounted' (section _id -> (enrolledCount,
+                roster size)).  All three are empty when everything is consistent.  A seat that is
+                reserved for an enrollment still in progress shows up as a miscount.
+    """
+    expected = {(entry['section'], entry['student']) for entry in _expected_entries()}
+    actual = {(entry['section'], entry['student'])
+              for entry in RosterEntry._get_collection().find({}, {'_id': 0, 'section': 1, 'student': 1})}
+    sizes = {}
+    for section_id, _ in actual:
+        sizes[section_id] = sizes.get(section_id, 0) + 1
+    miscounted = {}
+    for section in Section._get_collection().find({}, {'enrolled_count': 1}):
+        counted = section.get('enrolled_count', 0)
+        if counted != sizes.get(section['_id'], 0):
+            miscounted[section['_id']] = (counted, sizes.get(section['_id'], 0))
+    return {'missing': sorted(expected - actual), 'extra': sorted(actual - expected), 'miscounted': miscounted}
+
+
+def rebuild_rosters(batch_size: int = 1000) -> int:
+    """
+    Throw the rosters away and rebuild them from the students, then set every section's enrolled
+    count to the size of its roster.  Run it while nobody is enrolling.
+    :param batch_size:  How many entries to insert at a time.
+    :return:            The number of roster entries.
+    """
+    rosters = RosterEntry._get_collection()
+    rosters.delete_many({})
+    sizes = {}
+    batch = []
+    for entry in _expected_entries():
+        sizes[entry['section']] = sizes.get(entry['section'], 0) + 1
+        batch.append(entry)
+        if len(batch) == batch_size:
+            rosters.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        rosters.insert_many(batch, ordered=False)
+    sections = Section._get_collection()
+    sections.update_many({'_id': {'$nin': list(sizes)}}, {'$set': {'enrolled_count': 0}})
+    for section_id, size in sizes.items():
+        sections.update_one({'_id': section_id}, {'$set': {'enrolled_count': size}})
+    return sum(sizes.values())
@@ -12,7 +12,13 @@ class Section(Document):
     roomNumber = IntField(db_field='room', min_value=1, max_value=999, required=True)
     schedule = EnumField(Schedule, required=True)
     startTime = DateTimeField(db_field='startTime', required=True)
+    # In minutes.  Sections without one meet for the usual length of their schedule; see Timetable.
+    duration = IntField(db_field='duration', min_value=1, max_value=600)
     instructor = StringField(db_field='instructor', required=True)
+    # The number of seats, and how many of them are taken.  Sections without a capacity are not capped.
+    # enrolledCount is only ever changed with atomic $inc updates; see Services.reserve_seat.
+    capacity = IntField(db_field='capacity', min_value=1)
+    enrolledCount = IntField(db_field='enrolled_count', min_value=0, default=0)
 
     course = EmbeddedDocumentField('CourseEmbedded', db_field='course_embedded', required=True)
 
@@ -23,7 +29,28 @@ class Section(Document):
             {'unique': True, 'fields': ['semester', 'sectionYear', 'building', 'roomNumber', 'schedule', 'startTime'],
              'name': 'section_uk_02'},
             {'unique': True, 'fields': ['semester', 'sectionYear', 'schedule', 'startTime', 'instructor'],
-             'name': 'section_uk_03'}
+             'name': 'section_uk_03'},
+            {'fields': ['courseNumber', 'sectionNumber', 'id'], 'name': 'section_ix_01'},
+            {'fields': ['semester', 'sectionYear', 'instructor'], 'name': 'section_ix_02'},
+            {'fields': ['course.course'], 'name': 'section_ix_03'}
+        ],
+        # The students are checked, not just the rosters, since an enrollment that was imported or
+        # generated may not have a roster entry; the rosters are only there to cascade the delete.
+        'dependents': [
+            {'name': 'section_roster_fk', 'document': 'RosterEntry', 'fields': {'section': 'id'},
+             'description': 'a student is on the roster of this section', 'cascade': {}, 'check': False},
+            {'name': 'section_enrollment_fk', 'document': 'Student',
+             'fields': {'enrollment__match': {'abbreviation': 'course.course.abbreviation',
+                                              'courseNumber': 'courseNumber', 'sectionNumber': 'sectionNumber',
+                                              'semester': 'semester', 'sectionYear': 'sectionYear'}},
+             'description': 'a student is enrolled in this section',
+             'cascade': {'pull': 'enrollment', 'match': {'abbreviation': 'course.course.abbreviation',
+                                                         'courseNumber': 'courseNumber',
+                                                         'sectionNumber': 'sectionNumber',
+                                                         'semester': 'semester',
+                                                         'sectionYear': 'sectionYear'}}},
+            {'name': 'section_waitlist_fk', 'document': 'Waitlist', 'fields': {'section': 'id'},
+             'description': 'students are waiting for this section', 'cascade': {}}
         ]
     }
 
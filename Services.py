@@ -0,0 +1,617 @@
+"""
+The business logic behind each menu option, with no prompting.  main.py prompts the user and calls
+these; cli.py calls them straight from the command line or from a batch file.  Anything that
+cannot be done is reported by raising a ServiceError with the message to show the user.
+"""
+from datetime import datetime, time
+
+from ConstraintUtilities import insert_general
+from ReferentialIntegrity import delete_general
+import ReferenceCache
+import Rosters
+from Timetable import load_conflict_index, enrolled_sections, student_clashes
+from Department import Department
+from Course import Course
+from Section import Section
+from Student import Student
+from Major import Major
+from StudentMajor import StudentMajor
+from Enrollment import Enrollment
+from Waitlist import Waitlist
+from PassFail import PassFail
+from LetterGrade import LetterGrade
+from embeded import DepartmentEmbedded, MajorEmbedded, CourseEmbedded
+from enums import MinimumSatisfactory, ClassStanding
+
+
+class ServiceError(Exception):
+    """A request that cannot be carried out.  The message is meant for the user."""
+
+
+class SectionFull(ServiceError):
+    """Every seat in the section is taken.  Carries what the student asked for, so that the caller
+    can put them on the waitlist with join_waitlist(error.student, error.section, error.enrollment)."""
+    def __init__(self, student, section, enrollment):
+        self.student = student
+        self.section = section
+        self.enrollment = enrollment
+        super().__init__('This section is full.')
+
+
+class ScheduleConflict(ServiceError):
+    """The new section would be in the same room, or have the same instructor, as another section
+    at an overlapping time."""
+    def __init__(self, conflicts: [tuple]):
+        self.conflicts = conflicts
+        super().__init__('\n'.join(f'The section would overlap {section.course.courseName} section '
+                                   f'{section.sectionNumber} (same {kind}).' for kind, section in conflicts))
+
+
+class TimetableClash(ServiceError):
+    """The student is already enrolled in a section that meets at the same time."""
+    def __init__(self, clashes: [dict]):
+        self.clashes = clashes
+        super().__init__('\n'.join(f"This section meets at the same time as course {clash['course_number']} "
+                                   f"section {clash['section_number']}, which the student is enrolled in."
+                                   for clash in clashes))
+
+
+class HasDependents(ServiceError):
+    """Other documents still depend on the one to delete.  When cascadable is True, every one of
+    the relationships has a cascade, so the caller can offer to delete again with cascade=True."""
+    def __init__(self, description: str, dependents: [dict]):
+        self.dependents = dependents
+        self.cascadable = all('cascade' in dependent for dependent in dependents)
+        super().__init__('\n'.join(f"This {description} cannot be deleted since {dependent['description']}."
+                                   for dependent in dependents))
+
+
+class ConstraintViolation(ServiceError):
+    """The new document would duplicate an existing one on one or more uniqueness constraints."""
+    def __init__(self, violated_constraints: [dict]):
+        self.violated_constraints = violated_constraints
+        super().__init__('\n'.join(f'Your input values violated constraint: {violated_constraint}'
+                                   for violated_constraint in violated_constraints))
+
+
+def _insert(instance):
+    """Insert a new document, raising ConstraintViolation if it duplicates an existing one."""
+    violated_constraints = insert_general(instance)
+    if violated_constraints:
+        raise ConstraintViolation(violated_constraints)
+    return instance
+
+
+def _delete(instance, description: str, cascade=False):
+    """
+    Delete a document, raising HasDependents if anything still depends on it.
+    :param cascade: True to first remove whatever depends on it through the relationships that
+                    declare a cascade, or the names of the relationships to cascade.
+    """
+    dependents = delete_general(instance, cascade)
+    if dependents:
+        raise HasDependents(description, dependents)
+    # The signals only evict when blinker is installed, so drop a deleted reference entity here.
+    ReferenceCache.evict(instance)
+
+
+def find_department(abbreviation: str) -> Department:
+    department = ReferenceCache.get_department(abbreviation)
+    if not department:
+        raise ServiceError(f'Department with abbreviation {abbreviation} not found.')
+    return department
+
+
+def find_course(abbreviation: str, course_number) -> Course:
+    course = ReferenceCache.get_course(abbreviation, course_number)
+    if not course:
+        raise ServiceError(f'Course with number {course_number} not found in department {abbreviation}.')
+    return course
+
+
+def find_section(course: Course, section_number: int, semester: str = None, section_year: int = None) -> Section:
+    """
+    The section of a course with this number, in the given term.  Without a term, the course must
+    have a section with this number in only one term.
+    """
+    filters = {'courseNumber': course.courseNumber, 'sectionNumber': section_number, 'course__course': course}
+    if semester is not None:
+        filters['semester'] = semester
+    if section_year is not None:
+        filters['sectionYear'] = section_year
+    sections = list(Section.objects(**filters).limit(2))
+    if not sections:
+        raise ServiceError('Section not found.')
+    if len(sections) > 1:
+        raise ServiceError(f'Course {course.courseNumber} has a section {section_number} in more than one term; '
+                           f'give the semester and year.')
+    return sections[0]
+
+
+def find_major(major_name: str) -> Major:
+    major = ReferenceCache.get_major(major_name)
+    if not major:
+        raise ServiceError('Major not found.')
+    return major
+
+
+def find_student(last_name: str, first_name: str) -> Student:
+    student = Student.objects(lastName=last_name, firstName=first_name).first()
+    if not student:
+        raise ServiceError('Student not found.')
+    return student
+
+
+def find_precise_section(abbreviation: str, course_number: int, section_number: int, semester: str,
+                         section_year: int) -> Section:
+    """The one section of a course with this number in this term."""
+    find_department(abbreviation)
+    return find_section(find_course(abbreviation, course_number), section_number, semester, section_year)
+
+
+def parse_start_time(start_time: str) -> datetime:
+    """
+    Convert the HH:MM start time of a section, which has to be between 8:00 and 19:30.
+    :param start_time:  The start time as text.
+    :return:            The start time as a datetime (on 1900-01-01, like strptime gives us).
+    """
+    try:
+        parsed = datetime.strptime(start_time, '%H:%M')
+    except ValueError as ve:
+        raise ServiceError(f'Invalid input: {ve}')
+    if not (time(8, 0) <= parsed.time() <= time(19, 30)):
+        raise ServiceError('Invalid input: Start time must be between 8:00 and 19:30.')
+    return parsed
+
+
+def add_department(department_name: str, abbreviation: str, chair_name: str, building: str, office: int,
+                   description: str) -> Department:
+    return _insert(Department(
+        departmentName=department_name,
+        abbreviation=abbreviation,
+        chairName=chair_name,
+        building=building,
+        office=office,
+        description=description,
+        majorEmbedded=[],
+        courseEmbedded=[]
+    ))
+
+
+def add_course(abbreviation: str, course_name: str, course_number: int, description: str, units: int) -> Course:
+    department = find_department(abbreviation)
+    department_embedded = DepartmentEmbedded(
+        department=department,
+        departmentName=department.departmentName,
+        abbreviation=department.abbreviation
+    )
+    new_course = _insert(Course(
+        abbreviation=abbreviation,
+        courseName=course_name,
+        courseNumber=course_number,
+        description=description,
+        units=units,
+        departmentEmbedded=department_embedded
+    ))
+    department.update(push__courseEmbedded=CourseEmbedded(
+        course=new_course,
+        courseNumber=course_number,
+        courseName=course_name
+    ))
+    # A queryset update does not fire the signals, so the cached department has to be dropped here.
+    ReferenceCache.evict(department)
+    return new_course
+
+
+def add_section(abbreviation: str, course_number: int, section_number: int, semester: str, section_year: int,
+                building: str, room_number: int, schedule: str, start_time: datetime, instructor: str,
+                capacity: int = None, duration: int = None) -> Section:
+    """
+    Add a section of a course.  Besides the uniqueness constraints, the section must not overlap
+    another section in the same room, or with the same instructor, in the same term.
+    :param duration:    How many minutes the section meets for, or None for the usual length of its schedule.
+    """
+    find_department(abbreviation)
+    course = find_course(abbreviation, course_number)
+    course_embedded = CourseEmbedded(
+        course=course,
+        courseName=course.courseName,
+        courseNumber=course.courseNumber
+    )
+    section = Section(
+        courseNumber=course_number,
+        sectionNumber=section_number,
+        semester=semester,
+        sectionYear=section_year,
+        building=building,
+        roomNumber=room_number,
+        schedule=schedule,
+        startTime=start_time,
+        duration=duration,
+        instructor=instructor,
+        capacity=capacity,
+        course=course_embedded
+    )
+    section.validate()
+    stored = section.to_mongo()
+    bookings = load_conflict_index(Section._get_collection(), stored['semester'], stored['section_year'],
+                                   stored['building'], stored['room'], stored['instructor'])
+    conflicts = bookings.conflicts(stored)
+    if conflicts:
+        sections = {other.pk: other for other in Section.objects(pk__in=[owner for _, owner in conflicts])}
+        conflicts = [(kind, sections[owner]) for kind, owner in conflicts if owner in sections]
+    if conflicts:
+        raise ScheduleConflict(conflicts)
+    return _insert(section)
+
+
+def add_major(major_name: str, abbreviation: str, description: str) -> Major:
+    department = find_department(abbreviation)
+    department_embedded = DepartmentEmbedded(
+        department=department,
+        departmentName=department.departmentName,
+        abbreviation=department.abbreviation
+    )
+    new_major = _insert(Major(
+        majorName=major_name,
+        description=description,
+        departmentEmbedded=department_embedded
+    ))
+    department.update(push__majorEmbedded=MajorEmbedded(
+        major=new_major,
+        majorName=major_name
+    ))
+    ReferenceCache.evict(department)
+    return new_major
+
+
+def add_student(last_name: str, first_name: str, e_mail: str, class_standing: str = None) -> Student:
+    return _insert(Student(
+        lastName=last_name,
+        firstName=first_name,
+        eMail=e_mail,
+        classStanding=ClassStanding(class_standing) if class_standing else None,
+        studentMajor=[],
+        enrollment=[]
+    ))
+
+
+# The opt-in WriteBehindQueue that the writes to the students' arrays go through, or None to write
+# each of them straight away.  See use_write_behind.
+_write_behind = None
+
+
+def use_write_behind(queue):
+    """
+    Send the enrollment and major writes through a WriteBehindQueue, or straight to MongoDB again.
+    Each call still waits for its own write, so nothing changes for the callers except that the
+    writes of many concurrent callers go out together.
+    :param queue:   The WriteBehind.WriteBehindQueue, or None to stop using one.
+    :return:        The queue that was in use before, so that the caller can close() it.
+    """
+    global _write_behind
+    previous, _write_behind = _write_behind, queue
+    return previous
+
+
+def pull_from(student: Student, array_attribute: str, match: dict) -> bool:
+    """
+    Pull the elements of one of the student's arrays that have all of the match values.
+    :param student:         The student to update.  Only its id is used.
+    :param array_attribute: The name of the array attribute in Student, e.g. 'enrollment'.
+    :param match:           The raw (db_field) values that identify the elements to pull.
+    :return:                True if anything was pulled.
+    """
+    array = Student._fields[array_attribute]
+    if _write_behind is not None:
+        return _write_behind.pull(student.pk, array.db_field, match).result()
+    return Student._get_collection().update_one({'_id': student.pk},
+                                                {'$pull': {array.db_field: match}}).modified_count == 1
+
+
+def guard_values(element, guard: [str]) -> dict:
+    """The raw (db_field) values of the guard attributes of an embedded document."""
+    stored = element.to_mongo()
+    element_fields = element.__class__._fields
+    return {element_fields[attribute].db_field: stored.get(element_fields[attribute].db_field) for attribute in guard}
+
+
+def push_unless_present(student: Student, array_attribute: str, element, guard: [str]) -> bool:
+    """
+    Atomically append an embedded document to one of the student's arrays, unless the array already
+    has an element that matches it on all the guard attributes.  The check and the $push happen in
+    one conditional update on the server, so we never rewrite the whole student, and two concurrent
+    writers can neither clobber each other nor both add the same element.
+    :param student:         The student to update.  Only its id is used.
+    :param array_attribute: The name of the array attribute in Student, e.g. 'enrollment'.
+    :param element:         The embedded document to append.
+    :param guard:           The attribute names of the element that must not be duplicated.
+    :return:                True if the element was appended, False if a matching element was already there.
+    """
+    element.validate()
+    array = Student._fields[array_attribute]
+    stored = element.to_mongo()
+    duplicate = guard_values(element, guard)
+    if _write_behind is not None:
+        return _write_behind.push_unless_present(student.pk, array.db_field, stored, duplicate).result()
+    result = Student._get_collection().update_one(
+        {'_id': student.pk, array.db_field: {'$not': {'$elemMatch': duplicate}}},
+        {'$push': {array.db_field: stored}})
+    return result.modified_count == 1
+
+
+# A student can only be enrolled in a course once per term, and declared in a major once.
+ENROLLMENT_GUARD = ['semester', 'sectionYear', 'abbreviation', 'courseNumber']
+STUDENT_MAJOR_GUARD = ['majorName']
+
+
+def new_student_major(student: Student, major: Major, declaration_date: datetime) -> StudentMajor:
+    return StudentMajor(
+        student=student,
+        majorName=major.majorName,
+        declarationDate=declaration_date,
+        majorEmbedded=[MajorEmbedded(major=major, majorName=major.majorName)]
+    )
+
+
+def add_student_major(student: Student, major_name: str, declaration_date: datetime) -> StudentMajor:
+    student_major = new_student_major(student, find_major(major_name), declaration_date)
+    if not push_unless_present(student, 'studentMajor', student_major, STUDENT_MAJOR_GUARD):
+        raise ServiceError(f'Student is already majored in {major_name}.')
+    return student_major
+
+
+# The filter for a section that still has a seat: it has no cap, or fewer students than its capacity.
+SEAT_AVAILABLE = {'$or': [{'capacity': None},
+                          {'$expr': {'$lt': [{'$ifNull': ['$enrolled_count', 0]}, '$capacity']}}]}
+
+
+def reserve_seat(section: Section) -> bool:
+    """
+    Take one seat in the section, if there is one left.  The capacity check and the increment are a
+    single find_one_and_update, so no matter how many students go after the same section at once,
+    it is never oversubscribed.
+    :param section: The section to take a seat in.
+    :return:        True if we got a seat, False if the section is full.
+    """
+    reserved = Section._get_collection().find_one_and_update(
+        {'_id': section.pk, **SEAT_AVAILABLE}, {'$inc': {'enrolled_count': 1}}, projection={'_id': True})
+    return reserved is not None
+
+
+def release_seat(section: Section):
+    """Give back a seat taken with reserve_seat."""
+    Section._get_collection().update_one({'_id': section.pk, 'enrolled_count': {'$gt': 0}},
+                                         {'$inc': {'enrolled_count': -1}})
+
+
+def timetable_clashes(student: Student, section: Section) -> [dict]:
+    """
+    Check the section against the student's weekly timetable for its term.  Reads the student's
+    enrollments as they are now, and their sections in one batched query.
+    :param student: The student who wants to enroll.
+    :param section: The section that they want to enroll in.
+    :return:        The raw sections that the student is in that meet at the same time, if any.
+    """
+    stored = section.to_mongo()
+    enrollments = Student._get_collection().find_one({'_id': student.pk}, {Student.enrollment.db_field: 1}) or {}
+    current = enrolled_sections(Section._get_collection(), Course._get_collection(),
+                                enrollments.get(Student.enrollment.db_field, []), stored['semester'],
+                                stored['section_year'])
+    return student_clashes(current, stored)
+
+
+def build_enrollment(student: Student, abbreviation: str, course_number: int, section_number: int, semester: str,
+                     section_year: int, application_date: datetime = None, min_satisfactory: str = None) -> Enrollment:
+    """
+    The new enrollment, pass/fail if there is an application_date, or for a letter grade if there
+    is a min_satisfactory grade.  Does not touch the database.
+    """
+    if application_date is not None:
+        pass_fail = PassFail(sectionNumber=section_number, applicationDate=application_date)
+        letter_grade = None
+    elif min_satisfactory is not None:
+        if not any(min_satisfactory == ms.value for ms in MinimumSatisfactory):
+            raise ServiceError('Invalid choice for minimum satisfactory grade.')
+        pass_fail = None
+        letter_grade = LetterGrade(sectionNumber=section_number, min_satisfactory=min_satisfactory)
+    else:
+        raise ServiceError('Invalid. Please enter P for pass/fail or L for letter grade.')
+    return Enrollment(
+        student=student,
+        abbreviation=abbreviation,
+        courseNumber=course_number,
+        sectionNumber=section_number,
+        semester=semester,
+        sectionYear=section_year,
+        passFail=pass_fail,
+        letterGrade=letter_grade
+    )
+
+
+def enroll(student: Student, abbreviation: str, course_number: int, section_number: int, semester: str,
+           section_year: int, application_date: datetime = None, min_satisfactory: str = None) -> Enrollment:
+    """
+    Enroll a student into a section, either pass/fail (give the application_date) or for a letter
+    grade (give the min_satisfactory grade).
+    """
+    section = find_precise_section(abbreviation, course_number, section_number, semester, section_year)
+    new_enrollment = build_enrollment(student, abbreviation, course_number, section_number, semester, section_year,
+                                      application_date, min_satisfactory)
+    clashes = timetable_clashes(student, section)
+    if clashes:
+        raise TimetableClash(clashes)
+    if not reserve_seat(section):
+        raise SectionFull(student, section, new_enrollment)
+    # One enrollment per course per term, the same as enrollment_uk_02 would have it.  If the
+    # enrollment does not go in, hand the seat back.
+    try:
+        enrolled = push_unless_present(student, 'enrollment', new_enrollment, ENROLLMENT_GUARD)
+    except Exception:
+        release_seat(section)
+        raise
+    if not enrolled:
+        release_seat(section)
+        raise ServiceError('Student is already enrolled in the same course.')
+    Rosters.add_to_roster(section, student)
+    return new_enrollment
+
+
+def delete_department(abbreviation: str):
+    _delete(find_department(abbreviation), 'department')
+
+
+def delete_course(abbreviation: str, course_number: int):
+    find_department(abbreviation)
+    _delete(find_course(abbreviation, course_number), 'course')
+
+
+def delete_section(abbreviation: str, course_number: int, section_number: int, semester: str = None,
+                   section_year: int = None, cascade: bool = False):
+    """
+    :param semester:        The term of the section.  Only needed when the course has a section
+    :param section_year:    with this number in more than one term.
+    :param cascade:         True to also drop the section's enrollments, roster entries and waitlist.
+    """
+    find_department(abbreviation)
+    course = find_course(abbreviation, course_number)
+    _delete(find_section(course, section_number, semester, section_year), 'section', cascade)
+
+
+def delete_major(major_name: str, cascade: bool = False):
+    """
+    :param cascade: True to also take the major off every student who has declared it.
+    """
+    _delete(find_major(major_name), 'major', cascade)
+
+
+def delete_student(last_name: str, first_name: str):
+    """
+    Delete a student who is not enrolled in anything, has no majors and has no archived enrollments.
+    The student's waitlist entries go with them.
+    """
+    _delete(find_student(last_name, first_name), 'student', ('student_waitlist_fk',))
+
+
+def delete_student_major(student: Student, major_name: str):
+    student_major_to_delete = None
+    for student_major in student.studentMajor:
+        if str(student_major.majorName).strip() == str(major_name).strip():
+            student_major_to_delete = student_major
+            break
+    if not student_major_to_delete:
+        raise ServiceError('Major specified is not associated with the student.')
+    find_major(major_name)
+    pull_from(student, 'studentMajor', {StudentMajor.majorName.db_field: student_major_to_delete.majorName})
+
+
+# Waitlist priority by class standing.  Students with no class standing get 0.
+CLASS_STANDING_PRIORITY = {
+    ClassStanding.Senior: 4,
+    ClassStanding.Junior: 3,
+    ClassStanding.Sophomore: 2,
+    ClassStanding.Freshman: 1,
+}
+
+
+def join_waitlist(student: Student, section: Section, enrollment: Enrollment) -> Waitlist:
+    """
+    Put the student in line for a seat in a full section.
+    :param student:     The student who wants in.
+    :param section:     The full section.
+    :param enrollment:  The enrollment to give the student once a seat frees up.
+    :return:            The new waitlist entry.
+    """
+    try:
+        return _insert(Waitlist(
+            section=section,
+            student=student,
+            priority=CLASS_STANDING_PRIORITY.get(student.classStanding, 0),
+            requestedAt=datetime.utcnow(),
+            enrollment=enrollment
+        ))
+    except ConstraintViolation:
+        raise ServiceError('Student is already on the waitlist for this section.')
+
+
+def waitlist_position(entry: Waitlist) -> int:
+    """How many students are ahead of this entry in its section's queue, plus one."""
+    ahead = Waitlist.objects(section=entry.section, __raw__={'$or': [
+        {'priority': {'$gt': entry.priority}},
+        {'priority': entry.priority, 'requested_at': {'$lt': entry.requestedAt}}]}).count()
+    return ahead + 1
+
+
+def promote_from_waitlist(section: Section):
+    """
+    Fill a free seat in the section from the head of its waitlist.  Each entry is taken off the
+    queue with find_one_and_delete, so two seats freeing up at the same moment can never promote
+    the same student.  If the seat has already gone to someone else, the entry goes back in line
+    with its original priority and time.  Students whose timetable now clashes with the section
+    are taken off the waitlist.
+    :param section: The section that a seat was just freed in.
+    :return:        The id of the student who was enrolled, or None if nobody was.
+    """
+    waitlists = Waitlist._get_collection()
+    while True:
+        entry = waitlists.find_one_and_delete({'section': section.pk},
+                                              sort=[('priority', -1), ('requested_at', 1)])
+        if entry is None:
+            return None
+        student = Student.objects(pk=entry['student']).only(*Rosters.ROSTER_ATTRIBUTES).first()
+        if student is not None and timetable_clashes(student, section):
+            # The student has since enrolled in something at the same time, so this seat is no use to them.
+            continue
+        if not reserve_seat(section):
+            waitlists.insert_one(entry)
+            return None
+        enrollment = Enrollment._from_son(entry['enrollment'])
+        try:
+            enrolled = student is not None and push_unless_present(student, 'enrollment', enrollment, ENROLLMENT_GUARD)
+        except Exception:
+            release_seat(section)
+            waitlists.insert_one(entry)
+            raise
+        if enrolled:
+            Rosters.add_to_roster(section, student)
+            return entry['student']
+        # The student got into the course some other way in the meantime (or is gone); try the next one in line.
+        release_seat(section)
+
+
+def drop_enrollment(student: Student, abbreviation: str, course_number: int, section_number: int,
+                    semester: str = None, section_year: int = None):
+    """
+    Take the student out of a section.  The seat goes to the head of the section's waitlist.
+    :param semester:        The term of the enrollment.  Only needed when the student has this
+    :param section_year:    section in more than one term.
+    :return:                The id of the student who was promoted from the waitlist, or None.
+    """
+    find_department(abbreviation)
+    course = find_course(abbreviation, course_number)
+    wanted = {'abbreviation': abbreviation, 'course_number': course_number, 'section_number': section_number}
+    if semester is not None:
+        wanted['semester'] = semester
+    if section_year is not None:
+        wanted['section_year'] = section_year
+    enrollments = [stored for stored in (enrollment.to_mongo() for enrollment in student.enrollment)
+                   if all(stored.get(column) == value for column, value in wanted.items())]
+    if not enrollments:
+        raise ServiceError('Enrollment not found.')
+    if len(enrollments) > 1:
+        raise ServiceError('The student is enrolled in this section in more than one term; give the semester '
+                           'and year.')
+    stored = enrollments[0]
+    pulled = pull_from(student, 'enrollment', {column: stored.get(column) for column in
+                                               ('abbreviation', 'course_number', 'section_number',
+                                                'semester', 'section_year')})
+    # Only hand the seat back if it was this call that took the enrollment out, and then give it
+    # straight to whoever is at the head of the waitlist.
+    if pulled:
+        section = Section.objects(sectionNumber=section_number, courseNumber=course_number, course__course=course,
+                                  semester=stored.get('semester'), sectionYear=stored.get('section_year')).first()
+        if section:
+            Rosters.remove_from_roster(section, student)
+            release_seat(section)
+            return promote_from_waitlist(section)
+    return None
@@ -0,0 +1,261 @@
+"""
+Slow query capture.  SlowQueryRecorder is a pymongo command listener that notices every query that
+takes longer than a threshold, reduces it to its shape (the collection, the command, the fields and
+operators of the filter and the sort, with every value stripped out), and explains one example of
+each shape on a background thread, away from the request that was slow.  Each explained shape is
+flagged for:
+
+    COLLSCAN    the winning plan scans the whole collection
+    RATIO       it examines many more documents than it returns
+    SORT        it sorts in memory rather than reading an index in order
+
+The report ranks the shapes by the total time spent in them, and records the equality, range and
+sort fields of each one, and the menu actions (CommandStats.action) that sent it.
+
+    recorder = SlowQueries.install(threshold_ms=50)
+    ...
+    recorder.write_report('slow_queries.json')
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+
+from mongoengine.connection import get_connection
+from pymongo import monitoring
+
+from CommandStats import current_action
+from Indexes import plan_stages
+
+# The commands that we know how to find the filter in, and to explain.
+EXPLAINABLE = {'find', 'aggregate', 'count', 'distinct', 'update', 'delete', 'findAndModify'}
+# The parts of a command that belong to the driver or the session, not to the query.
+_DRIVER_FIELDS = {'lsid', '$db', '$clusterTime', 'txnNumber', '$readPreference', 'readConcern', 'writeConcern',
+                  'autocommit', 'startTransaction', 'apiVersion', 'apiStrict', 'apiDeprecationErrors'}
+# The filter operators that make a field a range rather than an equality, from an index's point of view.
+_RANGE_OPERATORS = {'$gt', '$gte', '$lt', '$lte', '$ne', '$nin', '$exists', '$regex', '$not', '$elemMatch'}
+
+default_threshold_ms = float(os.environ.get('ENROLLMENT_SLOW_QUERY_MS', 100))
+# Flag a query that examines more than this many documents for each one that it returns.
+default_ratio = float(os.environ.get('ENROLLMENT_SLOW_QUERY_RATIO', 10))
+
+# How many seconds a report waits for the explains still queued before it goes without them.
+default_explain_timeout = 10
+# The action that the explain thread's own commands are attributed to, so that CommandStats does
+# not count them against whichever menu action happened to be slow.
+EXPLAIN_ACTION = 'slow-query-explain'
+
+# Set on the explain thread, so that the recorder does not record its own explains.
+_explaining = threading.local()
+
+
+def strip_values(value):
+    """
+    The shape of a filter: the same field names and operators, with every value replaced by '?'.
+    Lists of conditions ($or, $and) keep each condition's shape; lists of values collapse to ['?'].
+    """
+    if isinstance(value, dict):
+        return {key: strip_values(item) for key, item in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, dict) for item in value):
+            return [strip_values(item) for item in value]
+        return ['?']
+    return '?'
+
+
+def query_parts(command_name: str, command: dict) -> tuple:
+    """
+    :return:    (the filter, the sort) of a command, either of which may be empty.
+    """
+    if command_name == 'find':
+        return command.get('filter') or {}, command.get('sort') or {}
+    if command_name in ('count', 'distinct'):
+        return command.get('query') or {}, {}
+    if command_name == 'findAndModify':
+        return command.get('query') or {}, command.get('sort') or {}
+    if command_name in ('update', 'delete'):
+        statements = command.get('updates' if command_name == 'update' else 'deletes') or [{}]
+        return statements[0].get('q') or {}, {}
+    if command_name == 'aggregate':
+        pipeline = command.get('pipeline') or []
+        match = next((stage['$match'] for stage in pipeline if '$match' in stage), {})
+        sort = next((stage['$sort'] for stage in pipeline if '$sort' in stage), {})
+        return match, sort
+    return {}, {}
+
+
+def field_roles(query: dict, prefix: str = '') -> tuple:
+    """
+    Split the fields of a filter into the ones compared for equality and the ones compared by range.
+    The branches of an $or are folded in, since an index that serves them has to have their fields too.
+    :return:    (equality fields, range fields), each a list in the order that they appear.
+    """
+    equality, ranges = [], []
+    for key, value in query.items():
+        if key in ('$or', '$and', '$nor') and isinstance(value, list):
+            for branch in value:
+                branch_equality, branch_ranges = field_roles(branch, prefix)
+                equality += [field for field in branch_equality if field not in equality]
+                ranges += [field for field in branch_ranges if field not in ranges]
+        elif key.startswith('$'):
+            continue
+        elif isinstance(value, dict) and any(operator in _RANGE_OPERATORS for operator in value):
+            ranges.append(prefix + key)
+        else:
+            equality.append(prefix + key)
+    return equality, [field for field in ranges if field not in equality]
+
+
+class SlowQueryRecorder(monitoring.CommandListener):
+    """
+    The listener, and the background thread that explains what it records.
+    """
+    def __init__(self, threshold_ms: float = None, ratio: float = None, client=None):
+        """
+        :param threshold_ms:    Record the queries that take at least this many milliseconds.
+        :param ratio:           Flag the queries that examine more than ratio documents per document returned.
+        :param client:          The pymongo client to explain with.  Defaults to MongoEngine's connection.
+        """
+        self.threshold_micros = (default_threshold_ms if threshold_ms is None else threshold_ms) * 1000
+        self.ratio = default_ratio if ratio is None else ratio
+        self.client = client
+        self.in_flight = {}     # (connection, request id) -> (database, command name, command, action)
+        self.shapes = {}        # shape key -> the statistics and the explain findings of that shape
+        self.lock = threading.Lock()
+        self.explains = queue.Queue()
+        self.thread = threading.Thread(target=self._explain_loop, name='slow-query-explain', daemon=True)
+        self.thread.start()
+
+    def started(self, event):
+        if event.command_name in EXPLAINABLE and not getattr(_explaining, 'active', False):
+            with self.lock:
+                self.in_flight[(event.connection_id, event.request_id)] = (event.database_name, event.command_name,
+                                                                           event.command, current_action.get())
+
+    def succeeded(self, event):
+        with self.lock:
+            started = self.in_flight.pop((event.connection_id, event.request_id), None)
+        if started is not None and event.duration_micros >= self.threshold_micros:
+            self._record(*started, event.duration_micros)
+
+    def failed(self, event):
+        with self.lock:
+            self.in_flight.pop((event.connection_id, event.request_id), None)
+
+    def _record(self, database: str, command_name: str, command: dict, action_name: str, micros: int):
+        collection = command.get(command_name)
+        query, sort = query_parts(command_name, command)
+        key = json.dumps({'ns': f'{database}.{collection}', 'command': command_name,
+                          'filter': strip_values(query), 'sort': list(sort.items())}, sort_keys=True, default=str)
+        with self.lock:
+            shape = self.shapes.get(key)
+            if shape is None:
+                equality, ranges = field_roles(query)
+                shape = self.shapes[key] = {
+                    'namespace': f'{database}.{collection}', 'collection': collection, 'command': command_name,
+                    'filter': strip_values(query), 'sort': [[field, direction] for field, direction in sort.items()],
+                    'equality': equality, 'range': ranges, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'actions': [], 'flags': [], 'plan': None}
+                # Explain the first one of each shape; the values do not change the shape of the plan.
+                self.explains.put((key, database, command_name,
+                                   {name: value for name, value in command.items() if name not in _DRIVER_FIELDS}))
+            shape['count'] += 1
+            if action_name not in shape['actions']:
+                shape['actions'].append(action_name)
+            shape['total_ms'] += micros / 1000
+            shape['max_ms'] = max(shape['max_ms'], micros / 1000)
+
+    def _explain_loop(self):
+        _explaining.active = True
+        current_action.set(EXPLAIN_ACTION)
+        while True:
+            key, database, command_name, command = self.explains.get()
+            try:
+                client = self.client or get_connection()
+                explained = client[database].command({'explain': command, 'verbosity': 'executionStats'})
+                findings = self.analyze(explained)
+            except Exception as error:
+                findings = {'flags': [], 'plan': None, 'error': str(error)}
+            with self.lock:
+                self.shapes[key].update(findings)
+            self.explains.task_done()
+
+    def analyze(self, explained: dict) -> dict:
+        """
+        :param explained:   The output of an executionStats explain.
+        :return:            The flags, the winning plan's stages, and the documents examined and returned.
+        """
+        planner = explained.get('queryPlanner') or {}
+        if not planner:
+            # An aggregation explain nests the query planner in its first stage.
+            cursor_stage = next((stage.get('$cursor') for stage in explained.get('stages', []) if '$cursor' in stage), {})
+            planner = cursor_stage.get('queryPlanner', {})
+            explained = cursor_stage or explained
+        stages = plan_stages(planner.get('winningPlan', {}))
+        execution = explained.get('executionStats', {})
+        examined = execution.get('totalDocsExamined', 0)
+        returned = execution.get('nReturned', 0)
+        flags = []
+        if 'COLLSCAN' in stages:
+            flags.append('COLLSCAN')
+        if examined > self.ratio * max(returned, 1):
+            flags.append('RATIO')
+        if 'SORT' in stages:
+            flags.append('SORT')
+        return {'flags': flags, 'plan': stages, 'docs_examined': examined, 'returned': returned}
+
+    def wait_for_explains(self, timeout: float = None):
+        """Block until every recorded shape has been explained, or for at most timeout seconds."""
+        with self.explains.all_tasks_done:
+            self.explains.all_tasks_done.wait_for(lambda: not self.explains.unfinished_tasks, timeout)
+
+    def finish(self, filename: str, timeout: float = default_explain_timeout):
+        """Give the explains still queued a little while to finish, then write the report."""
+        self.wait_for_explains(timeout)
+        self.write_report(filename)
+
+    def report(self) -> [dict]:
+        """
+        :return:    The query shapes, the ones that took the most time in total first.
+        """
+        with self.lock:
+            shapes = [dict(shape) for shape in self.shapes.values()]
+        for shape in shapes:
+            shape['total_ms'] = round(shape['total_ms'], 3)
+            shape['max_ms'] = round(shape['max_ms'], 3)
+            shape['mean_ms'] = round(shape['total_ms'] / shape['count'], 3)
+        return sorted(shapes, key=lambda shape: shape['total_ms'], reverse=True)
+
+    def write_report(self, filename: str):
+        with open(filename, 'w') as output:
+            json.dump({'threshold_ms': self.threshold_micros / 1000, 'shapes': self.report()}, output, indent=2,
+                      default=str)
+
+
+def format_report(shapes: [dict]) -> str:
+    """The ranked report as text, one query shape per paragraph."""
+    lines = []
+    for rank, shape in enumerate(shapes, start=1):
+        lines.append(f"{rank}. {shape['namespace']} {shape['command']} {json.dumps(shape['filter'])}"
+                     + (f" sort {shape['sort']}" if shape['sort'] else ''))
+        lines.append(f"   {shape['count']} slow, {shape['total_ms']} ms in total, {shape['mean_ms']} ms mean, "
+                     f"{shape['max_ms']} ms max; flags: {', '.join(shape['flags']) or 'none'}; plan: {shape['plan']}")
+        lines.append(f"   from: {', '.join(shape['actions'])}")
+    return '\n'.join(lines)
+
+
+def install(filename: str = None, threshold_ms: float = None) -> SlowQueryRecorder:
+    """
+    Register a SlowQueryRecorder with pymongo for every client made from now on, and write its
+    report at exit.
+    :param filename:        Where to write the JSON report.  Defaults to the ENROLLMENT_SLOW_QUERY_REPORT
+                            environment variable, or slow_queries.json.
+    :param threshold_ms:    Defaults to the ENROLLMENT_SLOW_QUERY_MS environment variable, or 100.
+    :return:                The recorder.
+    """
+    filename = filename or os.environ.get('ENROLLMENT_SLOW_QUERY_REPORT', 'slow_queries.json')
+    recorder = SlowQueryRecorder(threshold_ms)
+    monitoring.register(recorder)
+    atexit.register(recorder.finish, filename)
+    return recorder
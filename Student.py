@@ -1,21 +1,47 @@
 from mongoengine import *
 from Enrollment import Enrollment
 from StudentMajor import StudentMajor
+from enums import ClassStanding
 
 class Student(Document):
     lastName = StringField(db_field='last_name', required=True)
     firstName = StringField(db_field='first_name', required=True)
     eMail = StringField(db_field='e_mail', required=True)
+    # Decides the student's place on waitlists.  Optional: students without one go to the back.
+    classStanding = EnumField(ClassStanding, db_field='class_standing')
 
     studentMajor = ListField(EmbeddedDocumentField('StudentMajor', db_field='student_major', required=True))
     enrollment = ListField(EmbeddedDocumentField('Enrollment', db_field='enrollment', required=True))
 
 
+    # Enrollment and StudentMajor are embedded, so their indexes have to be declared here, on the
+    # arrays inside of students.  These are multikey indexes.  The partial filters keep the students
+    # with no enrollments (or no majors) out of the index altogether.
     meta = {
         'collection': 'students',
         'indexes': [
             {'unique': True, 'fields': ['lastName', 'firstName'], 'name': 'student_uk_01'},
-            {'unique': True, 'fields': ['eMail'], 'name': 'student_uk_02'}
+            {'unique': True, 'fields': ['eMail'], 'name': 'student_uk_02'},
+            {'fields': ['enrollment.sectionNumber', 'enrollment.courseNumber'], 'name': 'student_enrollment_ix_01',
+             'partialFilterExpression': {'enrollment.section_number': {'$exists': True}}},
+            {'fields': ['enrollment.semester', 'enrollment.sectionYear', 'enrollment.abbreviation',
+                        'enrollment.courseNumber'], 'name': 'student_enrollment_ix_02',
+             'partialFilterExpression': {'enrollment.section_year': {'$exists': True}}},
+            {'fields': ['studentMajor.majorName'], 'name': 'student_major_ix_01',
+             'partialFilterExpression': {'studentMajor.major_name': {'$exists': True}}}
+        ],
+        # The student's own enrollments and majors have to be dropped before the student can be.
+        'dependents': [
+            {'name': 'student_enrollment_fk', 'document': 'Student', 'fields': {'id': 'id'},
+             'filter': {'enrollment__exists': True, 'enrollment__ne': []},
+             'description': 'a student is enrolled in sections'},
+            {'name': 'student_major_fk', 'document': 'Student', 'fields': {'id': 'id'},
+             'filter': {'studentMajor__exists': True, 'studentMajor__ne': []},
+             'description': 'a student is declared in a major'},
+            {'name': 'student_waitlist_fk', 'document': 'Waitlist', 'fields': {'student': 'id'},
+             'description': 'a student is on a waitlist', 'cascade': {}},
+            {'name': 'student_archive_fk', 'document': 'EnrollmentArchive', 'fields': {'student': 'id'},
+             'description': 'a student has archived enrollments'}
         ]
     }
 
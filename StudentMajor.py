@@ -10,12 +10,8 @@ class StudentMajor(EmbeddedDocument):
 
     majorEmbedded = ListField(EmbeddedDocumentField('MajorEmbedded', db_field='major_embedded', required=True))
 
-    meta = {
-        'collection': 'studentMajors',
-        'indexes': [
-            {'unique': True, 'fields': ['student', 'majorName'], 'name': 'student_major_uk_01'}
-        ]
-    }
+    # Student majors are embedded in students, so MongoDB never creates indexes declared here.  The
+    # multikey index on students.studentMajor is declared in Student.
 
     def __str__(self):
         return (f'  Major: {self.majorName}\n'
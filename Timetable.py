@@ -0,0 +1,355 @@
+"""
+Meeting times and scheduling conflicts.
+
+A section meets on the days of its schedule, from its startTime for its duration (or, for the
+sections that do not have one, the usual length of a class on that schedule).  The days are kept
+as a bitmask, so MW and MWF are found to share Monday and Wednesday with one AND, and the times are
+minutes since midnight.
+
+IntervalIndex keeps, for every key and every day of the week, the meetings sorted by start time,
+so a new meeting is checked against the ones already there with a binary search and a short walk
+back over the ones that have not ended by the time it starts.  ConflictIndex uses two of them: one
+keyed by (semester, year, building, room), and one keyed by (semester, year, instructor).
+audit_term checks a whole term at once with a sweep over the sorted meetings, which also finds the
+conflicts among sections that are already in the database.
+
+The same intervals make up a student's weekly timetable: student_clashes checks a new section
+against the sections that the student is already enrolled in for the term, and audit_students
+checks every student in a term.
+
+Everything here works on the raw section documents (the dictionaries that as_pymongo() or
+to_mongo() give us), so a whole term can be loaded in one query without building documents.
+"""
+from bisect import bisect_left
+
+from enums import Schedule
+
+MONDAY, TUESDAY, WEDNESDAY, THURSDAY, FRIDAY, SATURDAY = (1 << day for day in range(6))
+DAY_NAMES = {MONDAY: 'M', TUESDAY: 'Tu', WEDNESDAY: 'W', THURSDAY: 'Th', FRIDAY: 'F', SATURDAY: 'S'}
+
+# The days that each schedule meets on.
+SCHEDULE_DAYS = {
+    Schedule.MW: MONDAY | WEDNESDAY,
+    Schedule.TuTh: TUESDAY | THURSDAY,
+    Schedule.MWF: MONDAY | WEDNESDAY | FRIDAY,
+    Schedule.F: FRIDAY,
+    Schedule.S: SATURDAY,
+}
+
+# How many minutes a class on each schedule meets for, when the section does not say.
+DEFAULT_DURATION = {
+    Schedule.MW: 75,
+    Schedule.TuTh: 75,
+    Schedule.MWF: 50,
+    Schedule.F: 165,
+    Schedule.S: 165,
+}
+
+# The section fields that a meeting and its conflict keys are made of: the projection to load with.
+MEETING_FIELDS = {'semester': 1, 'section_year': 1, 'building': 1, 'room': 1, 'instructor': 1, 'schedule': 1,
+                  'startTime': 1, 'duration': 1, 'course_number': 1, 'section_number': 1, 'course_embedded.course': 1}
+
+
+def days_of(bitmask: int) -> [int]:
+    """Split a day bitmask into the individual days, e.g. MONDAY | WEDNESDAY -> [MONDAY, WEDNESDAY]."""
+    return [day for day in DAY_NAMES if bitmask & day]
+
+
+def meeting(section: dict) -> tuple:
+    """
+    When a section meets.
+    :param section: The raw section document.
+    :return:        (day bitmask, start minute, end minute), with the minutes counted from midnight.
+    """
+    schedule = Schedule(section['schedule'])
+    start = section['startTime'].hour * 60 + section['startTime'].minute
+    return SCHEDULE_DAYS[schedule], start, start + (section.get('duration') or DEFAULT_DURATION[schedule])
+
+
+def overlaps(first: tuple, second: tuple) -> bool:
+    """Whether two meetings, as returned by meeting(), share a day and a minute."""
+    return bool(first[0] & second[0]) and first[1] < second[2] and second[1] < first[2]
+
+
+def room_key(section: dict) -> tuple:
+    return section['semester'], section['section_year'], section['building'], section['room']
+
+
+def instructor_key(section: dict) -> tuple:
+    return section['semester'], section['section_year'], section['instructor']
+
+
+class IntervalIndex:
+    """
+    For each key and each day, the [start, end) intervals booked on that day, sorted by start,
+    and alongside them the latest end of each interval and every interval before it.  The intervals
+    that can overlap a new one are the ones that start before it ends: a binary search finds where
+    those stop, and the walk back from there stops as soon as nothing earlier runs past the new
+    start.  The intervals already booked may overlap one another (the database can hold sections
+    that were added before the check, or by hand), and a long one is still found however many
+    shorter ones start after it.
+    """
+    def __init__(self):
+        # (key, day) -> sorted list of (start, end, owner)
+        self.days = {}
+        # (key, day) -> the running maximum of the ends in the list above
+        self.max_ends = {}
+
+    def _update_max_ends(self, slot, position: int):
+        """Recompute the running maximum end of one day's intervals from position on."""
+        intervals = self.days[slot]
+        max_ends = self.max_ends.setdefault(slot, [])
+        del max_ends[position:]
+        latest = max_ends[-1] if max_ends else None
+        for _, end, _ in intervals[position:]:
+            latest = end if latest is None else max(latest, end)
+            max_ends.append(latest)
+
+    def add(self, key, days: int, start: int, end: int, owner):
+        for day in days_of(days):
+            intervals = self.days.setdefault((key, day), [])
+            position = bisect_left(intervals, (start, end, owner))
+            intervals.insert(position, (start, end, owner))
+            self._update_max_ends((key, day), position)
+
+    def remove(self, key, days: int, start: int, end: int, owner):
+        for day in days_of(days):
+            intervals = self.days.get((key, day), [])
+            position = bisect_left(intervals, (start, end, owner))
+            if position < len(intervals) and intervals[position] == (start, end, owner):
+                del intervals[position]
+                self._update_max_ends((key, day), position)
+
+    def conflicts(self, key, days: int, start: int, end: int) -> set:
+        """
+        :return:    The owners of the intervals under key that overlap [start, end) on any of the days.
+        """
+        found = set()
+        for day in days_of(days):
+            intervals = self.days.get((key, day))
+            if not intervals:
+                continue
+            max_ends = self.max_ends[(key, day)]
+            position = bisect_left(intervals, (end,)) - 1
+            while position >= 0 and max_ends[position] > start:
+                if intervals[position][1] > start:
+                    found.add(intervals[position][2])
+                position -= 1
+        return found
+
+
+class ConflictIndex:
+    """
+    The room bookings and instructor bookings of the sections loaded so far.  Load the term (or
+    just the room and instructor) that the new sections are in, then check each new section with
+    conflicts() before add()ing it.
+    """
+    def __init__(self):
+        self.rooms = IntervalIndex()
+        self.instructors = IntervalIndex()
+
+    def add(self, section: dict, owner=None):
+        """
+        :param section: The raw section document.
+        :param owner:   What to report the section as in conflicts.  Defaults to its _id.
+        """
+        days, start, end = meeting(section)
+        owner = section.get('_id') if owner is None else owner
+        self.rooms.add(room_key(section), days, start, end, owner)
+        self.instructors.add(instructor_key(section), days, start, end, owner)
+
+    def remove(self, section: dict, owner=None):
+        """Take back a booking made with add(), with the same section and owner."""
+        days, start, end = meeting(section)
+        owner = section.get('_id') if owner is None else owner
+        self.rooms.remove(room_key(section), days, start, end, owner)
+        self.instructors.remove(instructor_key(section), days, start, end, owner)
+
+    def load(self, sections) -> 'ConflictIndex':
+        """Add every one of an iterable of raw section documents, and return the index."""
+        for section in sections:
+            self.add(section)
+        return self
+
+    def conflicts(self, section: dict) -> [tuple]:
+        """
+        :param section: The raw section document to check.
+        :return:        A list of ('room' or 'instructor', owner) pairs, one for each booking that the
+                        section would collide with.
+        """
+        days, start, end = meeting(section)
+        return ([('room', owner) for owner in self.rooms.conflicts(room_key(section), days, start, end)] +
+                [('instructor', owner) for owner in self.instructors.conflicts(instructor_key(section), days,
+                                                                                 start, end)])
+
+
+def load_conflict_index(collection, semester: str, section_year: int, building: str = None, room: int = None,
+                        instructor: str = None) -> ConflictIndex:
+    """
+    Load a term's bookings from the sections collection in one query.  Give the building and room
+    and the instructor to load only the bookings that a single new section could collide with;
+    those two lookups are backed by section_uk_02 and section_ix_02.
+    :param collection:  The pymongo sections collection.
+    :return:            The loaded ConflictIndex.
+    """
+    query = {'semester': semester, 'section_year': section_year}
+    if building is not None or instructor is not None:
+        query['$or'] = [{'building': building, 'room': room}, {'instructor': instructor}]
+    return ConflictIndex().load(collection.find(query, MEETING_FIELDS))
+
+
+def overlapping_pairs(intervals: [tuple]):
+    """
+    Sweep one day's bookings in start order, keeping only the ones that have not ended yet.
+    :param intervals:   (start, end, owner) tuples, in any order.  Sorted in place.
+    :return:            A generator of (owner, owner) pairs that overlap, each pair in sorted order.
+    """
+    intervals.sort()
+    active = []
+    for start, end, owner in intervals:
+        active = [booking for booking in active if booking[0] > start]
+        for _, other in active:
+            yield tuple(sorted((other, owner)))
+        active.append((end, owner))
+
+
+def audit_term(collection, semester: str, section_year: int) -> [tuple]:
+    """
+    Find every pair of sections in a term that are booked into the same room, or taught by the same
+    instructor, at overlapping times.  Each (key, day) is sorted once and swept, keeping only the
+    meetings that have not ended yet, so this costs O(n log n) plus the number of conflicts.
+    :param collection:  The pymongo sections collection.
+    :return:            A sorted list of ('room' or 'instructor', key, first section, second section)
+                        tuples, one for each conflicting pair (however many days they share), where
+                        the sections are the raw documents.
+    """
+    bookings = {}
+    sections = {}
+    for section in collection.find({'semester': semester, 'section_year': section_year}, MEETING_FIELDS):
+        sections[section['_id']] = section
+        days, start, end = meeting(section)
+        for kind, key in (('room', room_key(section)), ('instructor', instructor_key(section))):
+            for day in days_of(days):
+                bookings.setdefault((kind, key, day), []).append((start, end, section['_id']))
+    pairs = set()
+    for (kind, key, day), intervals in bookings.items():
+        for pair in overlapping_pairs(intervals):
+            pairs.add((kind, key) + pair)
+    return [(kind, key, sections[first], sections[second]) for kind, key, first, second in sorted(pairs)]
+
+
+# The fields of an enrollment that identify its section within a term.  Course numbers are only
+# unique within a department, so the abbreviation is part of it.  A section does not carry the
+# abbreviation itself, only a reference to its course.
+SECTION_KEY_FIELDS = ('abbreviation', 'course_number', 'section_number', 'semester', 'section_year')
+
+
+def section_key(document: dict, abbreviations: dict = None) -> tuple:
+    """
+    The (abbreviation, course number, section number, semester, year) of a raw enrollment, or of a
+    raw section given the abbreviations of the courses.
+    :param abbreviations:   Course _id -> department abbreviation, for a section.  Leave it out for an enrollment.
+    """
+    if abbreviations is None:
+        return tuple(document.get(field) for field in SECTION_KEY_FIELDS)
+    abbreviation = abbreviations.get((document.get('course_embedded') or {}).get('course'))
+    return (abbreviation,) + tuple(document.get(field) for field in SECTION_KEY_FIELDS[1:])
+
+
+def _term_enrollments(enrollments: [dict], semester: str, section_year: int) -> set:
+    return {section_key(enrollment) for enrollment in enrollments
+            if enrollment.get('semester') == semester and enrollment.get('section_year') == section_year}
+
+
+def enrolled_courses_query(enrollments: [dict], semester: str, section_year: int) -> dict:
+    """
+    :param enrollments: A student's raw enrollments, from every term.
+    :return:            The $or query for the courses of the ones in this term, or None if there are none.
+    """
+    courses = {key[:2] for key in _term_enrollments(enrollments, semester, section_year)}
+    if not courses:
+        return None
+    return {'$or': [{'abbreviation': abbreviation, 'course_number': course_number}
+                    for abbreviation, course_number in courses]}
+
+
+def enrolled_sections_query(enrollments: [dict], semester: str, section_year: int, courses: [dict]) -> dict:
+    """
+    :param enrollments: A student's raw enrollments, from every term.
+    :param courses:     The raw courses (with _id, abbreviation and course_number) that
+                        enrolled_courses_query found.
+    :return:            The $or query for the sections behind the ones in this term, or None if there are none.
+    """
+    course_ids = {(course['abbreviation'], course['course_number']): course['_id'] for course in courses}
+    branches = [{'course_embedded.course': course_ids[key[:2]], **dict(zip(SECTION_KEY_FIELDS[1:], key[1:]))}
+                for key in _term_enrollments(enrollments, semester, section_year) if key[:2] in course_ids]
+    return {'$or': branches} if branches else None
+
+
+def enrolled_sections(sections, courses, enrollments: [dict], semester: str, section_year: int) -> [dict]:
+    """
+    Look up the sections behind a student's enrollments in one term: their courses with one $or
+    query, then the sections with another.
+    :param sections:    The pymongo sections collection.
+    :param courses:     The pymongo courses collection.
+    :param enrollments: The student's raw enrollments, from every term.
+    :return:            The raw section documents of the ones in this term.
+    """
+    query = enrolled_courses_query(enrollments, semester, section_year)
+    if query is None:
+        return []
+    found = list(courses.find(query, {'abbreviation': 1, 'course_number': 1}))
+    query = enrolled_sections_query(enrollments, semester, section_year, found)
+    return [] if query is None else list(sections.find(query, MEETING_FIELDS))
+
+
+def student_clashes(sections: [dict], new_section: dict) -> [dict]:
+    """
+    Check the new section against each of the student's sections in its term.  A student has a
+    handful of sections a term, and those may already clash with one another, so each one is
+    compared with the new meeting directly rather than laid out on a grid first.
+    :param sections:    The raw sections that the student is already enrolled in, in the new section's term.
+    :param new_section: The raw section that the student wants to enroll in.
+    :return:            The sections that the new one overlaps, if any.
+    """
+    new_meeting = meeting(new_section)
+    return [section for section in sections
+            if section['_id'] != new_section.get('_id') and overlaps(meeting(section), new_meeting)]
+
+
+def audit_students(students, sections, courses, semester: str, section_year: int) -> [tuple]:
+    """
+    Find every student with two sections at overlapping times in a term.  The term's sections are
+    read in one query (and the abbreviations of the courses in another), the students' enrollments
+    in that term in one aggregation, and each student's week is swept the same way as in audit_term.
+    :param students:    The pymongo students collection.
+    :param sections:    The pymongo sections collection.
+    :param courses:     The pymongo courses collection.
+    :return:            A list of (raw student with _id, last_name and first_name, first section,
+                        second section) tuples, one for each clashing pair.
+    """
+    abbreviations = {course['_id']: course['abbreviation'] for course in courses.find({}, {'abbreviation': 1})}
+    term_sections = {section_key(section, abbreviations): section
+                     for section in sections.find({'semester': semester, 'section_year': section_year},
+                                                  MEETING_FIELDS)}
+    pipeline = [
+        {'$match': {'enrollment': {'$elemMatch': {'semester': semester, 'section_year': section_year}}}},
+        {'$unwind': '$enrollment'},
+        {'$match': {'enrollment.semester': semester, 'enrollment.section_year': section_year}},
+        {'$group': {'_id': '$_id', 'last_name': {'$first': '$last_name'}, 'first_name': {'$first': '$first_name'},
+                    'enrollments': {'$push': '$enrollment'}}}
+    ]
+    by_id = {section['_id']: section for section in term_sections.values()}
+    clashes = []
+    for student in students.aggregate(pipeline, allowDiskUse=True):
+        week = {}
+        for enrollment in student['enrollments']:
+            section = term_sections.get(section_key(enrollment))
+            if section is None:
+                continue
+            days, start, end = meeting(section)
+            for day in days_of(days):
+                week.setdefault(day, []).append((start, end, section['_id']))
+        pairs = {pair for intervals in week.values() for pair in overlapping_pairs(intervals)}
+        clashes.extend((student, by_id[first], by_id[second]) for first, second in sorted(pairs))
+    return clashes
@@ -0,0 +1,30 @@
+from mongoengine import *
+from Enrollment import Enrollment
+
+
+class Waitlist(Document):
+    """One student waiting for a seat in a full section.  The enrollment that the student asked for
+    is kept with the entry, so that the student can be enrolled as soon as a seat frees up."""
+    section = ReferenceField('Section', db_field='section', required=True)
+    student = ReferenceField('Student', db_field='student', required=True)
+    # Higher priorities are promoted first (seniors before freshmen), and then first come, first served.
+    priority = IntField(db_field='priority', required=True)
+    requestedAt = DateTimeField(db_field='requested_at', required=True)
+
+    enrollment = EmbeddedDocumentField('Enrollment', db_field='enrollment', required=True)
+
+    # waitlist_ix_01 is in the exact order of promotion, so the head of each section's queue is
+    # one index lookup away however long the queue gets.
+    meta = {
+        'collection': 'waitlists',
+        'indexes': [
+            {'unique': True, 'fields': ['section', 'student'], 'name': 'waitlist_uk_01'},
+            {'fields': ['section', '-priority', 'requestedAt'], 'name': 'waitlist_ix_01'},
+            {'fields': ['student'], 'name': 'waitlist_ix_02'}
+        ]
+    }
+
+    def __str__(self):
+        return (f'Waiting since: {self.requestedAt}\n'
+                f'   Priority: {self.priority}\n'
+                f'{self.enrollment}')
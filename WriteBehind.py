@@ -0,0 +1,209 @@
+"""
+Write-behind batching for the writes to the students' embedded arrays (enrollments and majors).
+
+During registration the writes arrive as many small conditional updates from many threads, each
+its own round trip.  A WriteBehindQueue collects them and sends them with bulk_write instead,
+whenever batch_size of them are waiting or the oldest has waited max_delay seconds.  Every write
+gets a Future, which resolves to True if the write took effect (the element was pushed, or an
+element was pulled), False if it did not, or the exception if the server rejected it, so the
+callers can still tell the user what happened.
+
+The writes for one student are applied in the order in which they were queued: each bulk_write
+carries at most one write per student, and the rest wait for the next round.  Whether a write took
+effect is what the server says it modified, so writes from outside of the queue cannot confuse it.
+A collection's bulk_write only reports totals, so each round goes out as one MongoClient.bulk_write
+with verbose results, which reports on every write.  That needs MongoDB 8.0; against an older
+server (or mongomock) the writes of a round are sent as single conditional updates instead, which
+still takes them off the callers' threads but saves no round trips.
+
+Opt in with Services.use_write_behind(WriteBehindQueue(...)).  close() (also run at exit) writes
+everything that is still queued before it returns.
+"""
+import atexit
+import threading
+import time
+from concurrent.futures import Future
+
+from pymongo import UpdateOne
+from pymongo.errors import ClientBulkWriteException, InvalidOperation, WriteError
+
+from Student import Student
+
+
+class _Write:
+    """One queued write: a conditional $push, or a $pull, on one of a student's arrays."""
+    def __init__(self, student_id, array: str, element: dict, match: dict, push: bool):
+        self.student_id = student_id
+        self.array = array          # The db_field of the array.
+        self.element = element      # The raw element to push (None for a pull).
+        self.match = match          # The raw values that identify the element.
+        self.push = push
+        self.future = Future()
+        self.queued = time.monotonic()
+        # Both updates modify the student exactly when the write takes effect.
+        if push:
+            self.filter = {'_id': student_id, array: {'$not': {'$elemMatch': match}}}
+            self.update = {'$push': {array: element}}
+        else:
+            self.filter = {'_id': student_id}
+            self.update = {'$pull': {array: match}}
+
+    def operation(self, namespace: str = None) -> UpdateOne:
+        """:param namespace:   The 'database.collection' of the students, for MongoClient.bulk_write."""
+        return UpdateOne(self.filter, self.update, namespace=namespace)
+
+
+class WriteBehindQueue:
+    """
+    A background thread that batches the queued writes into bulk_write calls.
+    """
+    def __init__(self, batch_size: int = 500, max_delay: float = 0.02):
+        """
+        :param batch_size:  Send the writes as soon as this many are waiting.
+        :param max_delay:   Send the writes once the oldest one has waited this many seconds.
+        """
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.pending = []
+        self.condition = threading.Condition()
+        self.closed = False
+        self.batches = 0
+        # False once the server turns out not to support MongoClient.bulk_write.
+        self.client_bulk_write = True
+        self.thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def push_unless_present(self, student_id, array: str, element: dict, match: dict) -> Future:
+        """
+        Queue the same conditional $push as Services.push_unless_present.
+        :param student_id:  The _id of the student.
+        :param array:       The db_field of the array, e.g. 'enrollment'.
+        :param element:     The raw element to append.
+        :param match:       The raw guard values: skip the push if an element already has all of them.
+        :return:            A Future of True if the element was appended.
+        """
+        return self._queue(_Write(student_id, array, element, match, True))
+
+    def pull(self, student_id, array: str, match: dict) -> Future:
+        """
+        Queue a $pull of the elements that have all of the match values.
+        :return:    A Future of True if an element was pulled.
+        """
+        return self._queue(_Write(student_id, array, None, match, False))
+
+    def _queue(self, write: _Write) -> Future:
+        with self.condition:
+            if self.closed:
+                raise RuntimeError('The write-behind queue has been closed.')
+            self.pending.append(write)
+            # The first write starts the worker's max_delay clock; a full batch ends it early.
+            if len(self.pending) == 1 or len(self.pending) >= self.batch_size:
+                self.condition.notify()
+        return write.future
+
+    def flush(self):
+        """Write everything that is queued right now, in this thread."""
+        with self.condition:
+            writes, self.pending = self.pending, []
+        self._write(writes)
+
+    def close(self):
+        """Stop taking writes, write out the ones still queued, and stop the background thread."""
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.closed and len(self.pending) < self.batch_size:
+                    if self.pending:
+                        wait = self.pending[0].queued + self.max_delay - time.monotonic()
+                        if wait <= 0:
+                            break
+                        self.condition.wait(wait)
+                    else:
+                        self.condition.wait()
+                if self.closed:
+                    return
+                writes, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+            self._write(writes)
+
+    def _write(self, writes: [_Write]):
+        """Send the writes in rounds of at most one write per student, keeping each student's order."""
+        while writes:
+            round_writes, later, students = [], [], set()
+            for write in writes:
+                if write.student_id in students:
+                    later.append(write)
+                else:
+                    students.add(write.student_id)
+                    round_writes.append(write)
+            self._write_round(round_writes)
+            writes = later
+
+    def _write_round(self, writes: [_Write]):
+        collection = Student._get_collection()
+        try:
+            results = self._bulk_write(collection, writes) if self.client_bulk_write else None
+            if results is None:
+                results = self._write_each(collection, writes)
+            self.batches += 1
+        except Exception as error:
+            for write in writes:
+                write.future.set_exception(error)
+            return
+        for write, result in zip(writes, results):
+            if isinstance(result, Exception):
+                write.future.set_exception(result)
+            else:
+                write.future.set_result(result)
+
+    def _bulk_write(self, collection, writes: [_Write]) -> list:
+        """
+        Send the round as one MongoClient.bulk_write with verbose results.
+        :return:    For each write, whether it took effect or the WriteError that the server rejected
+                    it with; or None if the server cannot do a client bulk write.
+        """
+        client = collection.database.client
+        # Looked up on the class, as mongomock's client makes up a database for any other attribute.
+        if not hasattr(type(client), 'bulk_write'):
+            self.client_bulk_write = False
+            return None
+        failed = {}
+        try:
+            result = client.bulk_write([write.operation(collection.full_name) for write in writes], ordered=False,
+                                       verbose_results=True)
+        except InvalidOperation:
+            # Raised before anything is sent, when the server is older than MongoDB 8.0.
+            self.client_bulk_write = False
+            return None
+        except ClientBulkWriteException as bwe:
+            if bwe.error is not None or bwe.write_concern_errors:
+                raise
+            for error in bwe.write_errors:
+                failed[error['idx']] = WriteError(error.get('errmsg'), error.get('code'), error)
+            result = bwe.partial_result
+        updates = result.update_results if result is not None else {}
+        return [failed[position] if position in failed
+                else position in updates and updates[position].modified_count > 0
+                for position in range(len(writes))]
+
+    def _write_each(self, collection, writes: [_Write]) -> list:
+        """
+        Send the round as single conditional updates, for servers that cannot report on each write of
+        a bulk write.
+        :return:    For each write, whether it took effect or the WriteError that the server rejected it with.
+        """
+        results = []
+        for write in writes:
+            try:
+                results.append(collection.update_one(write.filter, write.update).modified_count > 0)
+            except WriteError as error:
+                results.append(error)
+        return results
@@ -0,0 +1,896 @@
+"""
+Benchmarks for the enrollment application.  Each benchmark runs against a local mongod by
+default, or against mongomock (pip install mongomock) when --mongomock is given, and uses its
+own scratch database so that it never touches the real data.
+
+Usage:
+    python benchmarks.py constraints [--mongomock] [--uri URI] [--iterations N]
+    python benchmarks.py inserts [--mongomock] [--uri URI] [--students N] [--duplicates FRACTION]
+    python benchmarks.py listings [--mongomock] [--uri URI] [--students N] [--enrollments N]
+    python benchmarks.py concurrent-enrollment [--mongomock] [--uri URI] [--threads N]
+    python benchmarks.py seat-contention [--mongomock] [--uri URI] [--threads N] [--students N] [--capacity N]
+    python benchmarks.py waitlist [--mongomock] [--uri URI] [--threads N] [--waiting N] [--capacity N] [--promotions N]
+    python benchmarks.py section-conflicts [--mongomock] [--uri URI] [--sections N]
+    python benchmarks.py timetable-clashes [--mongomock] [--uri URI] [--students N] [--sections N] [--enrollments N]
+    python benchmarks.py archive [--mongomock] [--uri URI] [--students N] [--years N] [--per-term N] [--batch-size N]
+    python benchmarks.py write-behind [--mongomock] [--uri URI] [--threads N] [--writes N] [--batch-size N] [--max-delay S]
+    python benchmarks.py async-load [--uri URI] [--clients N [N ...]] [--operations N] [--max-concurrency N]
+    python benchmarks.py command-stats [--mongomock] [--uri URI] [--lookups N] [--sample-rate R]
+    python benchmarks.py slow-queries [--uri URI] [--students N] [--lookups N]
+    python benchmarks.py index-advisor [--uri URI] [--students N] [--lookups N]
+    python benchmarks.py suite [--mongomock] [--uri URI] [--scales N [N ...]] [--samples N] [--output FILE]
+    python benchmarks.py diff BEFORE AFTER [--tolerance FRACTION]
+
+The suite runs every add, list and delete path of main.py (through Services, the way main.py
+calls it), plus unique_general and select_general, at each scale of seeded students, and writes
+the ops/sec, the latency percentiles and the database round trips of each operation to a JSON
+file.  diff compares two of those files and exits with 1 if anything got slower.
+"""
+import argparse
+import asyncio
+import bson
+import contextlib
+import io
+import json
+import random
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from unittest import mock
+
+from mongoengine import connect, disconnect
+
+import Advisor
+import Archive
+import CommandStats
+import ConstraintUtilities
+import Listings
+import Services
+import SlowQueries
+import Timetable
+from Services import push_unless_present, ServiceError
+from Section import Section
+from ConstraintUtilities import unique_general, insert_general, select_general, get_constraints, PRECHECK, OPTIMISTIC
+from Department import Department
+from Course import Course
+from Major import Major
+from Student import Student
+from Enrollment import Enrollment
+from LetterGrade import LetterGrade
+from Waitlist import Waitlist
+from WriteBehind import WriteBehindQueue
+from AsyncServices import AsyncEnrollmentService
+from RosterEntry import RosterEntry
+from EnrollmentArchive import EnrollmentArchive
+from enums import Semester, ClassStanding, Building, Schedule
+from Indexes import provision_indexes
+from Archive import enrollment_history
+
+BENCHMARK_DATABASE = 'enrollment_benchmark'
+
+
+def connect_benchmark_db(uri: str, use_mongomock: bool, listeners: list = None):
+    """
+    Connect MongoEngine to the scratch benchmark database and clear it out.
+    :param uri:             The MongoDB connection string of the local mongod.
+    :param use_mongomock:   True to use an in-memory mongomock client instead of a real server.
+    :param listeners:       pymongo event listeners for this client only (ignored by mongomock).
+    :return:                The pymongo database that the benchmark runs against.
+    """
+    disconnect()
+    if use_mongomock:
+        try:
+            import mongomock
+        except ImportError:
+            raise SystemExit('mongomock is not installed.  pip install mongomock or drop --mongomock.')
+        client = connect(BENCHMARK_DATABASE, host='mongodb://localhost', mongo_client_class=mongomock.MongoClient)
+    elif listeners:
+        client = connect(BENCHMARK_DATABASE, host=uri, event_listeners=listeners)
+    else:
+        client = connect(BENCHMARK_DATABASE, host=uri)
+    client.drop_database(BENCHMARK_DATABASE)
+    ConstraintUtilities.invalidate_constraints()
+    return client[BENCHMARK_DATABASE]
+
+
+def calls_per_second(action, iterations: int) -> float:
+    """
+    Time the supplied action.
+    :param action:      A function of no arguments to call.
+    :param iterations:  How many times to call it.
+    :return:            The number of calls per second that we achieved.
+    """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        action()
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed if elapsed else float('inf')
+
+
+def bench_constraints(args):
+    """Compare unique_general with a cold constraint registry (the old behavior, which asked
+    MongoDB for the indexes on every call) against a warm one, and the one count query per
+    index strategy against the single $or query."""
+    connect_benchmark_db(args.uri, args.mongomock)
+    Department(departmentName='Computer Engineering and Computer Science', abbreviation='CECS',
+               chairName='Mehrdad Aliasgari', building='ECS', office=542,
+               description='Computers and things').save()
+    candidate = Department(departmentName='Mathematics', abbreviation='MATH', chairName='Tangan Gao',
+                           building='HSCI', office=154, description='Numbers and things')
+
+    def cold():
+        ConstraintUtilities.invalidate_constraints(Department)
+        unique_general(candidate, batched=False)
+
+    def warm():
+        unique_general(candidate, batched=False)
+
+    def batched():
+        unique_general(candidate)
+
+    before = calls_per_second(cold, args.iterations)
+    after = calls_per_second(warm, args.iterations)
+    single = calls_per_second(batched, args.iterations)
+    print(f'unique_general, uncached:  {before:10.1f} calls/sec')
+    print(f'unique_general, registry:  {after:10.1f} calls/sec')
+    print(f'speedup:                   {after / before:10.2f}x')
+    print(f'one query for all indexes: {single:10.1f} calls/sec')
+
+
+def bench_inserts(args):
+    """A/B the precheck and optimistic insert strategies of insert_general on new students,
+    with a fraction of the inserts deliberately duplicating an existing student."""
+    for strategy in (PRECHECK, OPTIMISTIC):
+        connect_benchmark_db(args.uri, args.mongomock)
+        Student.ensure_indexes()
+        duplicate_every = int(1 / args.duplicates) if args.duplicates else 0
+        rejected = 0
+        start = time.perf_counter()
+        for number in range(args.students):
+            if duplicate_every and number and number % duplicate_every == 0:
+                number -= 1                     # Same names & e-mail as the previous student.
+            student = Student(lastName=f'Last{number}', firstName=f'First{number}',
+                              eMail=f'student{number}@example.edu')
+            if insert_general(student, strategy):
+                rejected += 1
+        elapsed = time.perf_counter() - start
+        print(f'{strategy:>10}: {args.students / elapsed:10.1f} inserts/sec ({rejected} rejected as duplicates)')
+
+
+def bench_listings(args):
+    """Time list_student's work (query, build the text of every student) with hydrated MongoEngine
+    documents against raw documents with a projection, on students that each carry enrollments."""
+    connect_benchmark_db(args.uri, args.mongomock)
+    batch = []
+    for number in range(args.students):
+        student = Student(lastName=f'Last{number}', firstName=f'First{number}', eMail=f'student{number}@example.edu')
+        student.enrollment = [Enrollment(abbreviation='CECS', courseNumber=100 + course, sectionNumber=1,
+                                         semester=Semester.Fall, sectionYear=2026) for course in range(args.enrollments)]
+        batch.append(student.to_mongo())
+        if len(batch) == 1000:
+            Student._get_collection().insert_many(batch)
+            batch = []
+    if batch:
+        Student._get_collection().insert_many(batch)
+
+    timings = {}
+    for raw in (False, True):
+        Listings.raw_listings = raw
+        start = time.perf_counter()
+        for student in Listings.documents(Student.objects()):
+            Listings.display(Student, student)
+        timings[raw] = time.perf_counter() - start
+    Listings.raw_listings = True
+    print(f'{args.students} students with {args.enrollments} enrollments each')
+    print(f'hydrated documents:  {timings[False]:8.3f} sec')
+    print(f'raw with projection: {timings[True]:8.3f} sec')
+    print(f'speedup:             {timings[False] / timings[True]:8.2f}x')
+
+
+def bench_concurrent_enrollment(args):
+    """Enroll one student in many courses at once from many threads, each thread working from its
+    own (stale) copy of the student, the way that concurrent registrations do.  Appending and
+    calling save() loses updates; the conditional $push must keep every one, and must apply
+    exactly one of a burst of identical enrollments."""
+    connect_benchmark_db(args.uri, args.mongomock)
+    jane = Student(lastName='Doe', firstName='Jane', eMail='jane.doe@example.edu').save()
+
+    def enrollment(course_number):
+        return Enrollment(student=jane, abbreviation='CECS', courseNumber=course_number, sectionNumber=1,
+                          semester=Semester.Fall, sectionYear=2026,
+                          letterGrade=LetterGrade(sectionNumber=1, min_satisfactory='C'))
+
+    def with_save(course_number):
+        student = Student.objects(lastName='Doe').first()
+        student.enrollment.append(enrollment(course_number))
+        student.save()
+        return True
+
+    def with_push(course_number):
+        student = Student.objects(lastName='Doe').first()
+        return push_unless_present(student, 'enrollment', enrollment(course_number),
+                                   ['semester', 'sectionYear', 'abbreviation', 'courseNumber'])
+
+    courses = [100 + number for number in range(args.threads * 4)]
+    for name, action in (('append + save()', with_save), ('conditional $push', with_push)):
+        Student.objects(lastName='Doe').update(set__enrollment=[])
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            applied = sum(pool.map(action, courses))
+        elapsed = time.perf_counter() - start
+        kept = len(Student.objects(lastName='Doe').first().enrollment)
+        print(f'{name:>18}: {applied} writes reported, {kept} enrollments kept, {len(courses) - kept} lost, '
+              f'{len(courses) / elapsed:.1f} writes/sec')
+
+    Student.objects(lastName='Doe').update(set__enrollment=[])
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        applied = sum(pool.map(with_push, [100] * args.threads))
+    print(f'{args.threads} identical enrollments at once: {applied} applied (must be 1)')
+
+
+def seed_catalog(capacity: int = None) -> Section:
+    """One department, one course and one section of it, for the benchmarks that enroll students."""
+    Services.add_department('Computer Engineering and Computer Science', 'CECS', 'Mehrdad Aliasgari', 'ECS', 542,
+                            'Computers and things')
+    Services.add_course('CECS', 'Database Fundamentals', 323, 'Relational and NoSQL databases', 3)
+    return Services.add_section('CECS', 323, 1, 'Fall', 2026, 'ECS', 416, 'MW', Services.parse_start_time('08:00'),
+                                'David Brown', capacity)
+
+
+def seed_students(count: int):
+    """count students named Last0/First0 ... with no majors or enrollments, inserted in bulk."""
+    batch = []
+    for number in range(count):
+        batch.append(Student(lastName=f'Last{number}', firstName=f'First{number}',
+                             eMail=f'student{number}@example.edu').to_mongo())
+        if len(batch) == 1000:
+            Student._get_collection().insert_many(batch)
+            batch = []
+    if batch:
+        Student._get_collection().insert_many(batch)
+
+
+def bench_seat_contention(args):
+    """Have many threads enroll different students into the same section at once, and check that
+    the section ends up with exactly capacity students: never more, and no seat leaked."""
+    connect_benchmark_db(args.uri, args.mongomock)
+    section = seed_catalog(args.capacity)
+    seed_students(args.students)
+    students = list(Student.objects())
+
+    def register(student):
+        try:
+            Services.enroll(student, 'CECS', 323, 1, 'Fall', 2026, min_satisfactory='C')
+            return True
+        except ServiceError:
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        enrolled = sum(pool.map(register, students))
+    elapsed = time.perf_counter() - start
+    seats_taken = Section.objects(pk=section.pk).first().enrolledCount
+    actually_enrolled = Student.objects(enrollment__sectionNumber=1).count()
+    print(f'{len(students)} students, {args.threads} threads, capacity {args.capacity}')
+    print(f'enrolled: {enrolled}, seats taken: {seats_taken}, students holding the section: {actually_enrolled}')
+    print(f'oversubscribed: {seats_taken > args.capacity or actually_enrolled > args.capacity}, '
+          f'leaked seats: {seats_taken - actually_enrolled}')
+    print(f'{len(students) / elapsed:.1f} reservation attempts/sec')
+
+
+def bench_waitlist(args):
+    """Fill a section, put a long waitlist behind it, and then have many threads drop enrolled
+    students at once.  Every drop promotes the head of the waitlist.  Checks that the students
+    promoted are exactly the ones at the front of the queue, and that nobody is promoted twice."""
+    connect_benchmark_db(args.uri, args.mongomock)
+    Waitlist.ensure_indexes()
+    section = seed_catalog(args.capacity)
+    seed_students(args.capacity + args.waiting)
+    students = list(Student.objects().order_by('id'))
+    for student in students[:args.capacity]:
+        Services.enroll(student, 'CECS', 323, 1, 'Fall', 2026, min_satisfactory='C')
+
+    # Build the waitlist in bulk: a random class standing for each student, one second apart.
+    random.seed(args.seed)
+    requested = datetime(2026, 4, 1)
+    entries = []
+    for number, student in enumerate(students[args.capacity:]):
+        standing = random.choice(list(ClassStanding))
+        enrollment = Enrollment(student=student, abbreviation='CECS', courseNumber=323, sectionNumber=1,
+                                semester='Fall', sectionYear=2026,
+                                letterGrade=LetterGrade(sectionNumber=1, min_satisfactory='C'))
+        entries.append(Waitlist(section=section, student=student,
+                                priority=Services.CLASS_STANDING_PRIORITY[standing],
+                                requestedAt=requested + timedelta(seconds=number), enrollment=enrollment).to_mongo())
+    Waitlist._get_collection().insert_many(entries)
+    queue_order = [entry['student'] for entry in sorted(entries, key=lambda entry: (-entry['priority'],
+                                                                                    entry['requested_at']))]
+
+    promotions = min(args.promotions, args.waiting)
+    enrolled = deque(student.pk for student in students[:args.capacity])
+    promoted = []
+    lock = threading.Lock()
+
+    def drop_one(_):
+        with lock:
+            if len(promoted) >= promotions or not enrolled:
+                return
+            student_id = enrolled.popleft()
+        student = Student.objects(pk=student_id).first()
+        new_student = Services.drop_enrollment(student, 'CECS', 323, 1)
+        with lock:
+            if new_student is not None:
+                promoted.append(new_student)
+                enrolled.append(new_student)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        # Each call frees at most one seat; keep going until we have the promotions we asked for.
+        while len(promoted) < promotions and enrolled:
+            list(pool.map(drop_one, range(args.threads)))
+    elapsed = time.perf_counter() - start
+
+    seats_taken = Section.objects(pk=section.pk).first().enrolledCount
+    holding = Student.objects(enrollment__sectionNumber=1).count()
+    print(f'{args.waiting} waiting, capacity {args.capacity}, {args.threads} threads')
+    print(f'{len(promoted)} promotions in {elapsed:.2f} seconds: {len(promoted) / elapsed:.1f} promotions/sec')
+    print(f'promoted twice: {len(promoted) - len(set(promoted))}')
+    print(f'promoted in priority order: {set(promoted) == set(queue_order[:len(promoted)])}')
+    print(f'seats taken: {seats_taken}, students holding the section: {holding}, '
+          f'still waiting: {Waitlist.objects(section=section).count()}')
+
+
+def random_sections(count: int, seed: int) -> [dict]:
+    """
+    count raw Fall 2026 section documents at random times, in random rooms, with random instructors.
+    They overlap one another freely, but no two share a room or an instructor at the very same
+    schedule and start time, so they all get past section_uk_02 and section_uk_03.
+    """
+    random.seed(seed)
+    sections = []
+    rooms, instructors = set(), set()
+    while len(sections) < count:
+        number = len(sections)
+        section = {'semester': 'Fall', 'section_year': 2026, 'course_number': 100 + number % 600,
+                   'section_number': number, 'building': random.choice(list(Building)).value,
+                   'room': random.randint(1, 60), 'instructor': f'Instructor {random.randint(1, count // 4 + 1)}',
+                   'schedule': random.choice(list(Schedule)).value,
+                   'startTime': datetime(1900, 1, 1, random.randint(8, 19), random.choice((0, 30))),
+                   'duration': random.choice((None, 50, 75, 110))}
+        room = (section['building'], section['room'], section['schedule'], section['startTime'])
+        instructor = (section['schedule'], section['startTime'], section['instructor'])
+        if room in rooms or instructor in instructors:
+            continue
+        rooms.add(room)
+        instructors.add(instructor)
+        sections.append(section)
+    return sections
+
+
+def bench_section_conflicts(args):
+    """Check a term's worth of new sections for conflicts, one at a time, with the interval index
+    and with a linear scan of the sections accepted so far, and then audit the term in the database."""
+    connect_benchmark_db(args.uri, args.mongomock)
+    sections = random_sections(args.sections, args.seed)
+
+    start = time.perf_counter()
+    bookings = Timetable.ConflictIndex()
+    accepted = []
+    for number, section in enumerate(sections):
+        if not bookings.conflicts(section):
+            bookings.add(section, number)
+            accepted.append(section)
+    indexed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scanned = []
+    for section in sections:
+        meeting = Timetable.meeting(section)
+        if not any(overlaps_booking(section, meeting, other) for other in scanned):
+            scanned.append(section)
+    linear = time.perf_counter() - start
+    print(f'{len(sections)} sections, {len(accepted)} accepted without a conflict')
+    print(f'interval index: {len(sections) / indexed:.0f} checks/sec')
+    print(f'linear scan:    {len(sections) / linear:.0f} checks/sec (accepted {len(scanned)})')
+
+    # Now put every section in, conflicts and all, and let the audit find them.
+    Section._get_collection().insert_many([dict(section) for section in sections])
+    start = time.perf_counter()
+    conflicts = Timetable.audit_term(Section._get_collection(), 'Fall', 2026)
+    print(f'audit of {len(sections)} sections: {len(conflicts)} conflicting pairs in '
+          f'{time.perf_counter() - start:.2f} seconds')
+
+
+def overlaps_booking(section: dict, meeting: tuple, other: dict) -> bool:
+    """The linear scan's check: does other share a room or an instructor with section, at an overlapping time."""
+    shared = (Timetable.room_key(section) == Timetable.room_key(other) or
+              Timetable.instructor_key(section) == Timetable.instructor_key(other))
+    return shared and Timetable.overlaps(meeting, Timetable.meeting(other))
+
+
+def bench_timetable_clashes(args):
+    """Enroll many students into random sections of one term, then time the enrollment time clash
+    check for one student and the scan of every student in the term."""
+    connect_benchmark_db(args.uri, args.mongomock)
+    Section.ensure_indexes()
+    sections = random_sections(args.sections, args.seed)
+    Section._get_collection().insert_many(sections)
+    batch = []
+    for number in range(args.students):
+        enrollments = [Enrollment(abbreviation='CECS', courseNumber=section['course_number'],
+                                  sectionNumber=section['section_number'], semester='Fall', sectionYear=2026,
+                                  letterGrade=LetterGrade(sectionNumber=section['section_number'],
+                                                          min_satisfactory='C')).to_mongo()
+                       for section in random.sample(sections, args.enrollments)]
+        batch.append(Student(lastName=f'Last{number}', firstName=f'First{number}',
+                             eMail=f'student{number}@example.edu').to_mongo())
+        batch[-1][Student.enrollment.db_field] = enrollments
+        if len(batch) == 1000:
+            Student._get_collection().insert_many(batch)
+            batch = []
+    if batch:
+        Student._get_collection().insert_many(batch)
+
+    students = list(Student.objects().only('id').limit(args.checks))
+    candidates = list(Section.objects().limit(args.checks))
+    start = time.perf_counter()
+    clashing = sum(1 for student, section in zip(students, candidates) if Services.timetable_clashes(student, section))
+    elapsed = time.perf_counter() - start
+    print(f'{len(students)} enrollment checks: {len(students) / elapsed:.0f} checks/sec, {clashing} would clash')
+
+    start = time.perf_counter()
+    clashes = Timetable.audit_students(Student._get_collection(), Section._get_collection(),
+                                      Course._get_collection(), 'Fall', 2026)
+    elapsed = time.perf_counter() - start
+    print(f'scan of {args.students} students with {args.enrollments} sections each: '
+          f'{len({student["_id"] for student, _, _ in clashes})} students with {len(clashes)} clashes '
+          f'in {elapsed:.2f} seconds')
+
+
+def bench_archive(args):
+    """Give every student years of enrollment history, then compare the size of the student
+    documents and the time to load a student by name before and after the archive migration."""
+    connect_benchmark_db(args.uri, args.mongomock)
+    Student.ensure_indexes()
+    EnrollmentArchive.ensure_indexes()
+    terms = [(semester, year) for year in range(2026 - args.years + 1, 2027) for semester in ('Spring', 'Fall')]
+    batch = []
+    for number in range(args.students):
+        history = [Enrollment(abbreviation='CECS', courseNumber=100 + course, sectionNumber=course + 1,
+                              semester=semester, sectionYear=year,
+                              letterGrade=LetterGrade(sectionNumber=course + 1, min_satisfactory='C')).to_mongo()
+                   for semester, year in terms for course in range(args.per_term)]
+        batch.append(Student(lastName=f'Last{number}', firstName=f'First{number}',
+                             eMail=f'student{number}@example.edu').to_mongo())
+        batch[-1][Student.enrollment.db_field] = history
+        if len(batch) == 1000:
+            Student._get_collection().insert_many(batch)
+            batch = []
+    if batch:
+        Student._get_collection().insert_many(batch)
+
+    def measure(label):
+        sample = list(Student._get_collection().find().limit(100))
+        size = sum(len(bson.encode(student)) for student in sample) / len(sample)
+        numbers = [random.randrange(args.students) for _ in range(args.lookups)]
+        start = time.perf_counter()
+        for number in numbers:
+            Student.objects(lastName=f'Last{number}', firstName=f'First{number}').first()
+        elapsed = time.perf_counter() - start
+        print(f'{label}: {size / 1024:.1f} KB per student, {elapsed / args.lookups * 1000:.2f} ms per lookup')
+
+    random.seed(args.seed)
+    measure('before')
+    start = time.perf_counter()
+    migrated = Archive.migrate(('Fall', 2026), args.batch_size)
+    print(f'migrated {migrated} students in {time.perf_counter() - start:.2f} seconds '
+          f'(batch size {args.batch_size})')
+    measure('after ')
+    student = Student.objects(lastName='Last0', firstName='First0').first()
+    print(f'history of one student: {len(Archive.enrollment_history(student))} enrollments '
+          f'({len(student.enrollment)} still embedded)')
+
+
+def percentile(values: [float], fraction: float) -> float:
+    """The value below which the given fraction of the (sorted) values fall."""
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def bench_write_behind(args):
+    """Many threads enrolling students (just the conditional $push) at once, one write per round
+    trip versus through the write-behind queue.  Reports the throughput and the latency that each
+    caller sees, and checks that every write landed exactly once."""
+    def run(label, queue):
+        connect_benchmark_db(args.uri, args.mongomock)
+        seed_students(args.students)
+        students = list(Student.objects().only('id'))
+        Services.use_write_behind(queue)
+        latencies = []
+        lock = threading.Lock()
+
+        def write(number):
+            student = students[number % len(students)]
+            enrollment = Enrollment(student=student, abbreviation='CECS', courseNumber=100 + number // len(students),
+                                    sectionNumber=1, semester='Fall', sectionYear=2026,
+                                    letterGrade=LetterGrade(sectionNumber=1, min_satisfactory='C'))
+            start = time.perf_counter()
+            pushed = push_unless_present(student, 'enrollment', enrollment,
+                                         ['semester', 'sectionYear', 'abbreviation', 'courseNumber'])
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+            return pushed
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            pushed = sum(pool.map(write, range(args.writes)))
+        elapsed = time.perf_counter() - start
+        Services.use_write_behind(None)
+        if queue is not None:
+            queue.close()
+        stored = sum(len(student.get(Student.enrollment.db_field, []))
+                     for student in Student._get_collection().find({}, {Student.enrollment.db_field: 1}))
+        latencies.sort()
+        print(f'{label}: {args.writes / elapsed:.0f} writes/sec, latency p50 {percentile(latencies, .5) * 1000:.2f} ms, '
+              f'p95 {percentile(latencies, .95) * 1000:.2f} ms, p99 {percentile(latencies, .99) * 1000:.2f} ms; '
+              f'{pushed} reported, {stored} stored'
+              + (f', {queue.batches} bulk writes' if queue is not None else ''))
+
+    run('per call    ', None)
+    run('write-behind', WriteBehindQueue(args.batch_size, args.max_delay))
+
+
+def bench_async_load(args):
+    """Many concurrent clients on one event loop, each looking a student up, enrolling them and
+    dropping them again through the asyncio service layer.  Shows how the throughput scales with
+    the number of clients."""
+    if args.mongomock:
+        raise SystemExit('mongomock has no async client; run this benchmark against a local mongod.')
+    connect_benchmark_db(args.uri, False)
+    for model in (Student, Section, RosterEntry, Waitlist):
+        model.ensure_indexes()
+    seed_catalog()
+    seed_students(args.students)
+
+    async def load(clients: int) -> float:
+        service = AsyncEnrollmentService(args.uri, BENCHMARK_DATABASE, max_concurrency=args.max_concurrency)
+
+        async def client(number: int):
+            # Each client has students of its own, so that two clients never enroll the same student.
+            for operation in range(args.operations):
+                student_number = (number + operation * clients) % args.students
+                student = await service.find_one(Student, lastName=f'Last{student_number}',
+                                                 firstName=f'First{student_number}')
+                await service.enroll(student.pk, 'CECS', 323, 1, 'Fall', 2026, min_satisfactory='C')
+                await service.drop(student.pk, 'CECS', 323, 1, 'Fall', 2026)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client(number) for number in range(clients)))
+        elapsed = time.perf_counter() - start
+        await service.close()
+        return elapsed
+
+    for clients in args.clients:
+        elapsed = asyncio.run(load(clients))
+        operations = clients * args.operations
+        print(f'{clients:5d} clients: {operations / elapsed:8.1f} lookup+enroll+drop cycles/sec '
+              f'({operations} cycles in {elapsed:.2f} seconds)')
+
+
+class _FakeEvent:
+    """Just enough of a pymongo command event to drive a listener without a server."""
+    def __init__(self, request_id: int):
+        self.command_name = 'find'
+        self.database_name = BENCHMARK_DATABASE
+        self.command = {'find': 'students', 'filter': {}}
+        self.connection_id = ('localhost', 27017)
+        self.request_id = request_id
+        self.duration_micros = 200 + request_id % 5000
+
+
+def bench_command_stats(args):
+    """The cost of the CommandStats listener: first on its own, driven with fake events, and then on
+    real lookups with no listener, with every command recorded, and sampled."""
+    events = [_FakeEvent(number) for number in range(args.lookups)]
+    for rate in (1.0, args.sample_rate):
+        stats = CommandStats.CommandStats(rate)
+        start = time.perf_counter()
+        with CommandStats.action('benchmark'):
+            for event in events:
+                stats.started(event)
+                stats.succeeded(event)
+        elapsed = time.perf_counter() - start
+        print(f'listener alone, sample rate {rate}: {elapsed / len(events) * 1e6:.2f} microseconds per command')
+
+    results = {}
+    for label, listeners in (('no listener', None), ('recording all', [CommandStats.CommandStats(1.0)]),
+                             (f'sampling {args.sample_rate}', [CommandStats.CommandStats(args.sample_rate)])):
+        connect_benchmark_db(args.uri, args.mongomock, listeners)
+        seed_students(1000)
+        Student.ensure_indexes()
+        students = Student._get_collection()
+        with CommandStats.action('benchmark'):
+            results[label] = calls_per_second(
+                lambda: students.find_one({'last_name': f'Last{random.randrange(1000)}'}), args.lookups)
+        overhead = (results['no listener'] / results[label] - 1) * 100
+        print(f'{label:15s}: {results[label]:8.0f} lookups/sec ({overhead:+.1f}% time per lookup)')
+        if listeners:
+            for row in listeners[0].snapshot()[:3]:
+                print(f"    {row['collection']}.{row['command']} [{row['action']}]: {row['count']} recorded, "
+                      f"p50 {row['p50_ms']} ms, p95 {row['p95_ms']} ms, p99 {row['p99_ms']} ms")
+
+
+def bench_slow_queries(args):
+    """The cost of the SlowQueryRecorder on commands under the threshold, driven with fake events, and
+    then what it finds in a mix of indexed and unindexed student lookups against a real mongod (explain
+    is not something that mongomock does)."""
+    events = [_FakeEvent(number) for number in range(args.lookups)]
+    recorder = SlowQueries.SlowQueryRecorder(threshold_ms=1000)
+    start = time.perf_counter()
+    for event in events:
+        recorder.started(event)
+        recorder.succeeded(event)
+    elapsed = time.perf_counter() - start
+    print(f'listener alone, under the threshold: {elapsed / len(events) * 1e6:.2f} microseconds per command')
+
+    # A threshold of 0 records every query, so that each shape is explained.
+    recorder = SlowQueries.SlowQueryRecorder(threshold_ms=0)
+    connect_benchmark_db(args.uri, False, [recorder])
+    seed_students(args.students)
+    Student.ensure_indexes()
+    students = Student._get_collection()
+    queries = (
+        ('by name', lambda number: students.find_one({'last_name': f'Last{number}', 'first_name': f'First{number}'})),
+        ('by first name', lambda number: students.find_one({'first_name': f'First{number}'})),
+        ('sorted by e-mail', lambda number: list(students.find({'last_name': {'$gte': f'Last{number}'}})
+                                                 .sort('e_mail', 1).limit(10))),
+    )
+    for label, query in queries:
+        with CommandStats.action(label):
+            for _ in range(args.lookups // len(queries)):
+                query(random.randrange(args.students))
+    recorder.wait_for_explains(SlowQueries.default_explain_timeout)
+    print(SlowQueries.format_report(recorder.report()))
+
+
+def bench_index_advisor(args):
+    """Record an unindexed student lookup and a sorted one, take the advisor's proposals, and time
+    the lookups again once the proposed indexes exist.  Needs a real mongod, for the explains."""
+    recorder = SlowQueries.SlowQueryRecorder(threshold_ms=0)
+    connect_benchmark_db(args.uri, False, [recorder])
+    seed_students(args.students)
+    Student.ensure_indexes()
+    students = Student._get_collection()
+
+    def lookups():
+        number = random.randrange(args.students)
+        students.find_one({'first_name': f'First{number}'})
+        list(students.find({'e_mail': {'$gte': f'student{number}'}}).sort('first_name', 1).limit(10))
+
+    before = calls_per_second(lookups, args.lookups)
+    recorder.wait_for_explains(SlowQueries.default_explain_timeout)
+    proposals = Advisor.advise(recorder.report(), min_benefit=1)
+    print(Advisor.format_proposals(proposals))
+    for line in Advisor.apply(proposals, dry_run=False):
+        print(line)
+    after = calls_per_second(lookups, args.lookups)
+    print(f'before: {before:8.1f} lookup pairs/sec, after: {after:8.1f} lookup pairs/sec ({after / before:.1f}x)')
+
+
+# The scales of the suite, in students.
+SUITE_SCALES = [1000, 10000, 100000, 1000000]
+
+
+def _first_page(cls, sort: [str]) -> [str]:
+    """What main.py's list_* functions do before the user pages on: one page, as text."""
+    return [Listings.display(cls, document) for document in Listings.Pager(cls, sort).next_page()]
+
+
+def _select_student(number: int) -> Student:
+    """select_general on the student name constraint, with the menu choice and the names typed in for it."""
+    choice = [constraint['name'] for constraint in get_constraints(Student)].index('student_uk_01') + 1
+    answers = iter([str(choice), f'Last{number}', f'First{number}'])
+    with mock.patch('builtins.input', lambda prompt='': next(answers)), contextlib.redirect_stdout(io.StringIO()):
+        return select_general(Student)
+
+
+def _student(number: int) -> Student:
+    return Services.find_student(f'Last{number}', f'First{number}')
+
+
+# The operations of the suite, in the order that they run: (name, function of the sample number, divisor).
+# Each runs samples // divisor times (at least 3).  The deletes remove what the adds put in, sample
+# for sample, so they must run as many times; only the whole-collection listing runs fewer.
+SUITE_OPERATIONS = [
+    ('unique_general', lambda number: unique_general(Student(lastName=f'Last{number}', firstName=f'New{number}',
+                                                             eMail=f'new{number}@example.edu')), 1),
+    ('select_general', _select_student, 1),
+    ('add_department', lambda number: Services.add_department(
+        f'Department {number}', f'D{number}', f'Chair {number}', 'EN2', 1000 + number, 'Benchmark department'), 1),
+    ('add_course', lambda number: Services.add_course(f'D{number}', f'Course {number}', 100, 'Benchmark course', 3), 1),
+    ('add_section', lambda number: Services.add_section(
+        'CECS', 323, number + 2, 'Fall', 2026, 'EN3', number + 1, 'TuTh', Services.parse_start_time('10:00'),
+        f'Instructor {number}'), 1),
+    ('add_major', lambda number: Services.add_major(f'Major {number}', 'CECS', 'Benchmark major'), 1),
+    ('add_student', lambda number: Services.add_student(f'BenchLast{number}', f'BenchFirst{number}',
+                                                        f'bench{number}@example.edu'), 1),
+    ('add_student_major', lambda number: Services.add_student_major(_student(number), 'Computer Science',
+                                                                    datetime(2026, 1, 15)), 1),
+    ('add_enrollment', lambda number: Services.enroll(_student(number), 'CECS', 323, 1, 'Fall', 2026,
+                                                      min_satisfactory='C'), 1),
+    ('list_department', lambda number: _first_page(Department, ['abbreviation']), 1),
+    ('list_course', lambda number: _first_page(Course, ['abbreviation', 'courseNumber']), 1),
+    ('list_section', lambda number: _first_page(Section, ['courseNumber', 'sectionNumber']), 1),
+    ('list_major', lambda number: _first_page(Major, ['majorName']), 1),
+    ('list_student', lambda number: _first_page(Student, ['lastName', 'firstName']), 1),
+    ('list_student_major', lambda number: [str(major) for major in _student(number).studentMajor], 1),
+    ('list_enrollment', lambda number: enrollment_history(_student(number)), 1),
+    ('list_section_enrollment', lambda number: list(Listings.enrollments_by_section()), 20),
+    ('delete_enrollment', lambda number: Services.drop_enrollment(_student(number), 'CECS', 323, 1), 1),
+    ('delete_student_major', lambda number: Services.delete_student_major(_student(number), 'Computer Science'), 1),
+    ('delete_section', lambda number: Services.delete_section('CECS', 323, number + 2), 1),
+    ('delete_course', lambda number: Services.delete_course(f'D{number}', 100), 1),
+    ('delete_department', lambda number: Services.delete_department(f'D{number}'), 1),
+    ('delete_major', lambda number: Services.delete_major(f'Major {number}'), 1),
+    ('delete_student', lambda number: Services.delete_student(f'BenchLast{number}', f'BenchFirst{number}'), 1),
+]
+
+
+def bench_suite(args):
+    """Every add, list and delete path, at each scale.  The round trips are counted with a
+    CommandStats listener on the benchmark client, so mongomock (which has no listeners) does not
+    report them."""
+    results = {'started': datetime.now().isoformat(timespec='seconds'), 'mongomock': args.mongomock,
+               'samples': args.samples, 'scales': {}}
+    for scale in args.scales:
+        stats = CommandStats.CommandStats()
+        connect_benchmark_db(args.uri, args.mongomock, [stats])
+        provision_indexes()
+        seed_catalog()
+        Services.add_major('Computer Science', 'CECS', 'Computers and things')
+        seed_students(scale)
+        # The sections added take a room each, so there can be no more of them than there are rooms.
+        samples = min(args.samples, scale, 999)
+        rows = {}
+        print(f'{scale} students, {samples} samples per operation')
+        for name, operation, divisor in SUITE_OPERATIONS:
+            count = max(3, samples // divisor)
+            latencies = []
+            with CommandStats.action(name):
+                for number in range(count):
+                    start = time.perf_counter()
+                    operation(number)
+                    latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            commands = sum(row['count'] for row in stats.snapshot() if row['action'] == name)
+            rows[name] = {'samples': count, 'ops_per_sec': round(count / sum(latencies), 1),
+                          'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+                          'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+                          'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+                          'round_trips': None if args.mongomock else round(commands / count, 2)}
+            row = rows[name]
+            print(f"    {name:24s} {row['ops_per_sec']:10.1f} ops/sec  p50 {row['p50_ms']:8.3f} ms  "
+                  f"p95 {row['p95_ms']:8.3f} ms  p99 {row['p99_ms']:8.3f} ms  round trips {row['round_trips']}")
+        results['scales'][str(scale)] = rows
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2)
+    print(f'Results written to {args.output}.')
+
+
+def bench_diff(args):
+    """Compare two suite result files, operation by operation, and exit with 1 on any regression:
+    ops/sec or p95 worse by more than the tolerance, or more round trips."""
+    with open(args.before) as before_file, open(args.after) as after_file:
+        before, after = json.load(before_file)['scales'], json.load(after_file)['scales']
+    regressions = 0
+    for scale in sorted(set(before) & set(after), key=int):
+        print(f'{scale} students')
+        for name in [name for name in after[scale] if name in before[scale]]:
+            old, new = before[scale][name], after[scale][name]
+            throughput = new['ops_per_sec'] / old['ops_per_sec'] - 1
+            p95 = new['p95_ms'] / old['p95_ms'] - 1 if old['p95_ms'] else 0
+            worse = throughput < -args.tolerance or p95 > args.tolerance
+            if old['round_trips'] is not None and new['round_trips'] is not None:
+                worse = worse or new['round_trips'] > old['round_trips']
+            regressions += worse
+            print(f"    {name:24s} ops/sec {throughput:+7.1%}  p95 {p95:+7.1%}  "
+                  f"round trips {old['round_trips']} -> {new['round_trips']}{'  REGRESSION' if worse else ''}")
+    print(f'{regressions} regressions.')
+    if regressions:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Enrollment benchmarks')
+    parser.add_argument('--uri', default='mongodb://localhost:27017', help='local mongod to benchmark against')
+    parser.add_argument('--mongomock', action='store_true', help='use mongomock instead of a mongod')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    constraints = subparsers.add_parser('constraints', help='constraint registry for unique_general')
+    constraints.add_argument('--iterations', type=int, default=2000)
+    constraints.set_defaults(run=bench_constraints)
+    inserts = subparsers.add_parser('inserts', help='precheck vs optimistic insert_general')
+    inserts.add_argument('--students', type=int, default=5000)
+    inserts.add_argument('--duplicates', type=float, default=0.05, help='fraction of duplicate inserts')
+    inserts.set_defaults(run=bench_inserts)
+    listings = subparsers.add_parser('listings', help='hydrated vs raw read-only listings')
+    listings.add_argument('--students', type=int, default=100000)
+    listings.add_argument('--enrollments', type=int, default=8, help='enrollments per student')
+    listings.set_defaults(run=bench_listings)
+    concurrent = subparsers.add_parser('concurrent-enrollment', help='lost updates: save() vs conditional $push')
+    concurrent.add_argument('--threads', type=int, default=16)
+    concurrent.set_defaults(run=bench_concurrent_enrollment)
+    contention = subparsers.add_parser('seat-contention', help='registration rush on a single section')
+    contention.add_argument('--threads', type=int, default=32)
+    contention.add_argument('--students', type=int, default=2000)
+    contention.add_argument('--capacity', type=int, default=40)
+    contention.set_defaults(run=bench_seat_contention)
+    waitlist = subparsers.add_parser('waitlist', help='promotion from a long waitlist as seats free up')
+    waitlist.add_argument('--threads', type=int, default=16)
+    waitlist.add_argument('--waiting', type=int, default=50000, help='students on the waitlist')
+    waitlist.add_argument('--capacity', type=int, default=40)
+    waitlist.add_argument('--promotions', type=int, default=2000)
+    waitlist.add_argument('--seed', type=int, default=14)
+    waitlist.set_defaults(run=bench_waitlist)
+    conflicts = subparsers.add_parser('section-conflicts', help='room and instructor overlap detection')
+    conflicts.add_argument('--sections', type=int, default=20000)
+    conflicts.add_argument('--seed', type=int, default=16)
+    conflicts.set_defaults(run=bench_section_conflicts)
+    clashes = subparsers.add_parser('timetable-clashes', help='student timetable clash check and term scan')
+    clashes.add_argument('--students', type=int, default=50000)
+    clashes.add_argument('--sections', type=int, default=400)
+    clashes.add_argument('--enrollments', type=int, default=5, help='sections per student')
+    clashes.add_argument('--checks', type=int, default=2000, help='single enrollment checks to time')
+    clashes.add_argument('--seed', type=int, default=17)
+    clashes.set_defaults(run=bench_timetable_clashes)
+    archive = subparsers.add_parser('archive', help='student document size and load time, before and after archiving')
+    archive.add_argument('--students', type=int, default=20000)
+    archive.add_argument('--years', type=int, default=6, help='years of history per student')
+    archive.add_argument('--per-term', type=int, default=5, help='enrollments per term')
+    archive.add_argument('--batch-size', type=int, default=500)
+    archive.add_argument('--lookups', type=int, default=2000)
+    archive.add_argument('--seed', type=int, default=18)
+    archive.set_defaults(run=bench_archive)
+    write_behind = subparsers.add_parser('write-behind', help='per call writes vs the write-behind queue')
+    write_behind.add_argument('--threads', type=int, default=64)
+    write_behind.add_argument('--writes', type=int, default=50000)
+    write_behind.add_argument('--students', type=int, default=10000)
+    write_behind.add_argument('--batch-size', type=int, default=500)
+    write_behind.add_argument('--max-delay', type=float, default=0.02, help='seconds')
+    write_behind.set_defaults(run=bench_write_behind)
+    async_load = subparsers.add_parser('async-load', help='asyncio service layer under concurrent clients')
+    async_load.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16, 64, 256])
+    async_load.add_argument('--operations', type=int, default=50, help='cycles per client')
+    async_load.add_argument('--students', type=int, default=10000)
+    async_load.add_argument('--max-concurrency', type=int, default=None)
+    async_load.set_defaults(run=bench_async_load)
+    command_stats = subparsers.add_parser('command-stats', help='overhead of the command latency listener')
+    command_stats.add_argument('--lookups', type=int, default=20000)
+    command_stats.add_argument('--sample-rate', type=float, default=0.1)
+    command_stats.set_defaults(run=bench_command_stats)
+    slow_queries = subparsers.add_parser('slow-queries', help='slow query shapes and their explain plans')
+    slow_queries.add_argument('--students', type=int, default=20000)
+    slow_queries.add_argument('--lookups', type=int, default=3000)
+    slow_queries.set_defaults(run=bench_slow_queries)
+    index_advisor = subparsers.add_parser('index-advisor', help='indexes proposed from the recorded query shapes')
+    index_advisor.add_argument('--students', type=int, default=20000)
+    index_advisor.add_argument('--lookups', type=int, default=500)
+    index_advisor.set_defaults(run=bench_index_advisor)
+    suite = subparsers.add_parser('suite', help='every add, list and delete path at scale, saved as JSON')
+    suite.add_argument('--scales', type=int, nargs='+', default=SUITE_SCALES, help='numbers of students')
+    suite.add_argument('--samples', type=int, default=200, help='timed calls per operation (at most 999)')
+    suite.add_argument('--output', default='benchmark_results.json')
+    suite.set_defaults(run=bench_suite)
+    diff = subparsers.add_parser('diff', help='compare two suite result files')
+    diff.add_argument('before')
+    diff.add_argument('after')
+    diff.add_argument('--tolerance', type=float, default=0.1, help='the slowdown to ignore, as a fraction')
+    diff.set_defaults(run=bench_diff)
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == '__main__':
+    main()
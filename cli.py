@@ -0,0 +1,448 @@
+"""
+Non-interactive command line for the enrollment application.  Every operation from the menus is a
+subcommand, so it can be scripted:
+
+    python cli.py add-student --last-name Doe --first-name Jane --email jane.doe@example.edu
+    python cli.py enroll --last-name Doe --first-name Jane --abbreviation CECS --course-number 323 \
+        --section-number 1 --semester Fall --year 2026 --letter-grade C
+    python cli.py list-sections --semester Fall --year 2026
+
+The batch subcommand reads a file with one of those commands per line (without the leading
+"python cli.py"; blank lines and lines starting with # are skipped) and runs them back-to-back
+over one connection:
+
+    python cli.py batch commands.txt [--stop-on-error]
+"""
+import argparse
+import os
+import shlex
+import sys
+import time
+from datetime import datetime
+
+from mongoengine import connect
+
+import Services
+import Rosters
+import Timetable
+import CommandStats
+import SlowQueries
+from Archive import enrollment_history
+from Services import ServiceError, SectionFull
+from Indexes import provision_indexes
+from Listings import documents, display, sections_by_course
+from Department import Department
+from Course import Course
+from Section import Section
+from Major import Major
+from Student import Student
+from enums import Semester
+
+# The values that --semester takes, so that argparse turns down any other.
+SEMESTERS = [semester.value for semester in Semester]
+
+
+def _date(text: str) -> datetime:
+    return datetime.strptime(text, '%Y-%m-%d')
+
+
+def add_department(args):
+    Services.add_department(args.name, args.abbreviation, args.chair, args.building, args.office, args.description)
+    return 'Department added successfully!'
+
+
+def add_course(args):
+    Services.add_course(args.abbreviation, args.name, args.number, args.description, args.units)
+    return 'Course added successfully!'
+
+
+def add_section(args):
+    Services.add_section(args.abbreviation, args.course_number, args.section_number, args.semester, args.year,
+                         args.building, args.room, args.schedule, Services.parse_start_time(args.start_time),
+                         args.instructor, args.capacity, args.duration)
+    return 'Section added successfully!'
+
+
+def add_major(args):
+    Services.add_major(args.name, args.abbreviation, args.description)
+    return 'Major added successfully!'
+
+
+def add_student(args):
+    Services.add_student(args.last_name, args.first_name, args.email, args.class_standing)
+    return 'Student added successfully!'
+
+
+def declare_major(args):
+    Services.add_student_major(Services.find_student(args.last_name, args.first_name), args.major, args.date)
+    return 'Student added to major successfully!'
+
+
+def enroll(args):
+    try:
+        Services.enroll(Services.find_student(args.last_name, args.first_name), args.abbreviation,
+                        args.course_number, args.section_number, args.semester, args.year, args.pass_fail,
+                        args.letter_grade)
+    except SectionFull as full:
+        if not args.waitlist:
+            raise
+        entry = Services.join_waitlist(full.student, full.section, full.enrollment)
+        return f'The section is full; student is number {Services.waitlist_position(entry)} on the waitlist.'
+    return 'Student has been enrolled successfully!'
+
+
+def drop(args):
+    promoted = Services.drop_enrollment(Services.find_student(args.last_name, args.first_name), args.abbreviation,
+                                        args.course_number, args.section_number, args.semester, args.year)
+    if promoted:
+        return (f'Enrollment is deleted from Student successfully.  '
+                f'The seat went to student {promoted} from the waitlist.')
+    return 'Enrollment is deleted from Student successfully.'
+
+
+def undeclare_major(args):
+    Services.delete_student_major(Services.find_student(args.last_name, args.first_name), args.major)
+    return 'Major is deleted from the student successfully.'
+
+
+def delete_department(args):
+    Services.delete_department(args.abbreviation)
+    return 'Department deleted successfully.'
+
+
+def delete_course(args):
+    Services.delete_course(args.abbreviation, args.number)
+    return 'Course deleted successfully.'
+
+
+def delete_section(args):
+    Services.delete_section(args.abbreviation, args.course_number, args.section_number, args.semester, args.year,
+                            cascade=args.cascade)
+    return 'Section deleted successfully.'
+
+
+def delete_major(args):
+    Services.delete_major(args.name, args.cascade)
+    return 'Major deleted successfully.'
+
+
+def delete_student(args):
+    Services.delete_student(args.last_name, args.first_name)
+    return 'Student deleted successfully.'
+
+
+def _listing(cls, queryset):
+    for document in documents(queryset):
+        print(display(cls, document))
+        print('------------------------------------------------')
+
+
+def list_departments(args):
+    _listing(Department, Department.objects().order_by('abbreviation'))
+
+
+def list_courses(args):
+    queryset = Course.objects().order_by('abbreviation', 'courseNumber')
+    if args.abbreviation:
+        queryset = queryset.filter(abbreviation=args.abbreviation)
+    _listing(Course, queryset)
+
+
+def list_sections(args):
+    if not (args.semester or args.year):
+        for course_number, sections in sections_by_course():
+            for section in sections:
+                print(display(Section, section))
+                print('------------------------------------------------')
+        return
+    queryset = Section.objects().order_by('courseNumber', 'sectionNumber')
+    if args.semester:
+        queryset = queryset.filter(semester=args.semester)
+    if args.year:
+        queryset = queryset.filter(sectionYear=args.year)
+    _listing(Section, queryset)
+
+
+def list_majors(args):
+    _listing(Major, Major.objects().order_by('majorName'))
+
+
+def list_students(args):
+    _listing(Student, Student.objects().order_by('lastName', 'firstName'))
+
+
+def roster(args):
+    section = Services.find_precise_section(args.abbreviation, args.course_number, args.section_number,
+                                            args.semester, args.year)
+    if args.csv:
+        return f'{Rosters.export_roster(section, args.csv)} students written to {args.csv}.'
+    for entry in Rosters.roster(section):
+        print(f"{entry.get('last_name')}, {entry.get('first_name')} <{entry.get('e_mail')}>")
+    return f'{Rosters.enrolled_count(section)} students enrolled.'
+
+
+def audit_term(args):
+    conflicts = Timetable.audit_term(Section._get_collection(), args.semester, args.year)
+    for kind, key, first, second in conflicts:
+        print(f"{kind} {' '.join(str(part) for part in key[2:])}: "
+              f"{first['course_number']}-{first['section_number']} {first['schedule']} {first['startTime']:%H:%M} "
+              f"overlaps {second['course_number']}-{second['section_number']} {second['schedule']} "
+              f"{second['startTime']:%H:%M}")
+    return f'{len(conflicts)} conflicts in {args.semester} {args.year}.'
+
+
+def timetable_clashes(args):
+    clashes = Timetable.audit_students(Student._get_collection(), Section._get_collection(), Course._get_collection(),
+                                       args.semester, args.year)
+    for student, first, second in clashes:
+        print(f"{student.get('last_name')}, {student.get('first_name')}: "
+              f"{first['course_number']}-{first['section_number']} {first['schedule']} {first['startTime']:%H:%M} "
+              f"overlaps {second['course_number']}-{second['section_number']} {second['schedule']} "
+              f"{second['startTime']:%H:%M}")
+    return f'{len(clashes)} timetable clashes in {args.semester} {args.year}.'
+
+
+def transcript(args):
+    student = Services.find_student(args.last_name, args.first_name)
+    for enrollment in enrollment_history(student):
+        print(enrollment)
+    return f'{student.firstName} {student.lastName}'
+
+
+def check_rosters(args):
+    if args.rebuild:
+        return f'Rebuilt the rosters: {Rosters.rebuild_rosters()} enrollments.'
+    problems = Rosters.check_rosters()
+    for pair in problems['missing']:
+        print(f'not on the roster: section {pair[0]}, student {pair[1]}')
+    for pair in problems['extra']:
+        print(f'on the roster but not enrolled: section {pair[0]}, student {pair[1]}')
+    for section_id, (counted, size) in problems['miscounted'].items():
+        print(f'section {section_id}: enrolled count {counted}, roster has {size}')
+    if any(problems.values()):
+        raise ServiceError('The rosters do not match the enrollments; run check-rosters --rebuild to fix them.')
+    return 'The rosters match the enrollments.'
+
+
+def run_batch(args):
+    """
+    Run every command in a batch file over the connection that we already have.
+    :return:    A summary of how many commands ran and how many of them failed.
+    """
+    parser = build_parser()
+    executed = failed = 0
+    start = time.perf_counter()
+    with open(args.filename) as commands:
+        for line_number, line in enumerate(commands, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                command = parser.parse_args(shlex.split(line))
+                if command.run is run_batch:
+                    raise ServiceError('Batch files cannot run other batch files.')
+                with CommandStats.action(command.command):
+                    result = command.run(command)
+                executed += 1
+                if result and not args.quiet:
+                    print(f'{line_number}: {result}')
+            except SystemExit:
+                # argparse has already explained what was wrong with the command.
+                failed += 1
+                print(f'{line_number}: could not parse: {line}', file=sys.stderr)
+            except Exception as error:
+                # One bad command (a ServiceError, a validation error, ...) should not stop the batch.
+                failed += 1
+                print(f'{line_number}: {error}', file=sys.stderr)
+            if failed and args.stop_on_error:
+                break
+    elapsed = time.perf_counter() - start
+    return f'{executed} commands succeeded, {failed} failed in {elapsed:.2f} seconds.'
+
+
+def _student_arguments(parser):
+    parser.add_argument('--last-name', required=True)
+    parser.add_argument('--first-name', required=True)
+
+
+def _section_arguments(parser):
+    parser.add_argument('--abbreviation', required=True)
+    parser.add_argument('--course-number', type=int, required=True)
+    parser.add_argument('--section-number', type=int, required=True)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Enrollment application, non-interactive.')
+    parser.add_argument('--uri', default=os.environ.get('MONGO_URI', 'mongodb://localhost:27017/Enrollment'))
+    parser.add_argument('--command-stats', metavar='FILE',
+                        help='record per command latency histograms and write them to FILE at exit')
+    parser.add_argument('--sample-rate', type=float, help='the fraction of the commands to record (default 1)')
+    parser.add_argument('--slow-queries', metavar='FILE',
+                        help='explain the queries slower than --slow-ms and write the ranked shapes to FILE at exit')
+    parser.add_argument('--slow-ms', type=float, help='the slow query threshold in milliseconds (default 100)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('add-department')
+    command.add_argument('--name', required=True)
+    command.add_argument('--abbreviation', required=True)
+    command.add_argument('--chair', required=True)
+    command.add_argument('--building', required=True)
+    command.add_argument('--office', type=int, required=True)
+    command.add_argument('--description', required=True)
+    command.set_defaults(run=add_department)
+
+    command = commands.add_parser('add-course')
+    command.add_argument('--abbreviation', required=True)
+    command.add_argument('--name', required=True)
+    command.add_argument('--number', type=int, required=True)
+    command.add_argument('--description', required=True)
+    command.add_argument('--units', type=int, required=True)
+    command.set_defaults(run=add_course)
+
+    command = commands.add_parser('add-section')
+    _section_arguments(command)
+    command.add_argument('--semester', choices=SEMESTERS, required=True)
+    command.add_argument('--year', type=int, required=True)
+    command.add_argument('--building', required=True)
+    command.add_argument('--room', type=int, required=True)
+    command.add_argument('--schedule', required=True)
+    command.add_argument('--start-time', required=True, help='HH:MM')
+    command.add_argument('--instructor', required=True)
+    command.add_argument('--capacity', type=int, help='number of seats; leave out for no cap')
+    command.add_argument('--duration', type=int, help='minutes; leave out for the usual length of the schedule')
+    command.set_defaults(run=add_section)
+
+    command = commands.add_parser('add-major')
+    command.add_argument('--name', required=True)
+    command.add_argument('--abbreviation', required=True)
+    command.add_argument('--description', required=True)
+    command.set_defaults(run=add_major)
+
+    command = commands.add_parser('add-student')
+    _student_arguments(command)
+    command.add_argument('--email', required=True)
+    command.add_argument('--class-standing', choices=['Freshman', 'Sophomore', 'Junior', 'Senior'])
+    command.set_defaults(run=add_student)
+
+    command = commands.add_parser('declare-major')
+    _student_arguments(command)
+    command.add_argument('--major', required=True)
+    command.add_argument('--date', type=_date, required=True, help='YYYY-MM-DD')
+    command.set_defaults(run=declare_major)
+
+    command = commands.add_parser('enroll')
+    _student_arguments(command)
+    _section_arguments(command)
+    command.add_argument('--semester', choices=SEMESTERS, required=True)
+    command.add_argument('--year', type=int, required=True)
+    grading = command.add_mutually_exclusive_group(required=True)
+    grading.add_argument('--pass-fail', type=_date, metavar='APPLICATION_DATE', help='YYYY-MM-DD')
+    grading.add_argument('--letter-grade', metavar='MIN_SATISFACTORY', choices=['A', 'B', 'C'])
+    command.add_argument('--waitlist', action='store_true', help='join the waitlist if the section is full')
+    command.set_defaults(run=enroll)
+
+    command = commands.add_parser('drop')
+    _student_arguments(command)
+    _section_arguments(command)
+    command.add_argument('--semester', choices=SEMESTERS,
+                         help='needed when the student has this section in more than one term')
+    command.add_argument('--year', type=int)
+    command.set_defaults(run=drop)
+
+    command = commands.add_parser('undeclare-major')
+    _student_arguments(command)
+    command.add_argument('--major', required=True)
+    command.set_defaults(run=undeclare_major)
+
+    command = commands.add_parser('delete-department')
+    command.add_argument('--abbreviation', required=True)
+    command.set_defaults(run=delete_department)
+
+    command = commands.add_parser('delete-course')
+    command.add_argument('--abbreviation', required=True)
+    command.add_argument('--number', type=int, required=True)
+    command.set_defaults(run=delete_course)
+
+    command = commands.add_parser('delete-section')
+    _section_arguments(command)
+    command.add_argument('--semester', choices=SEMESTERS,
+                         help='needed when the course has this section number in more than one term')
+    command.add_argument('--year', type=int)
+    command.add_argument('--cascade', action='store_true',
+                         help="also drop the section's enrollments, roster entries and waitlist")
+    command.set_defaults(run=delete_section)
+
+    command = commands.add_parser('delete-major')
+    command.add_argument('--name', required=True)
+    command.add_argument('--cascade', action='store_true', help='also take the major off the students who declared it')
+    command.set_defaults(run=delete_major)
+
+    command = commands.add_parser('delete-student')
+    _student_arguments(command)
+    command.set_defaults(run=delete_student)
+
+    commands.add_parser('list-departments').set_defaults(run=list_departments)
+    command = commands.add_parser('list-courses')
+    command.add_argument('--abbreviation')
+    command.set_defaults(run=list_courses)
+    command = commands.add_parser('list-sections')
+    command.add_argument('--semester', choices=SEMESTERS)
+    command.add_argument('--year', type=int)
+    command.set_defaults(run=list_sections)
+    commands.add_parser('list-majors').set_defaults(run=list_majors)
+    commands.add_parser('list-students').set_defaults(run=list_students)
+
+    command = commands.add_parser('roster')
+    _section_arguments(command)
+    command.add_argument('--semester', choices=SEMESTERS, required=True)
+    command.add_argument('--year', type=int, required=True)
+    command.add_argument('--csv', metavar='FILE', help='write the roster to a CSV file instead')
+    command.set_defaults(run=roster)
+
+    command = commands.add_parser('audit-term', help='find the room and instructor conflicts in a term')
+    command.add_argument('--semester', choices=SEMESTERS, required=True)
+    command.add_argument('--year', type=int, required=True)
+    command.set_defaults(run=audit_term)
+
+    command = commands.add_parser('timetable-clashes', help='find the students with overlapping sections in a term')
+    command.add_argument('--semester', choices=SEMESTERS, required=True)
+    command.add_argument('--year', type=int, required=True)
+    command.set_defaults(run=timetable_clashes)
+
+    command = commands.add_parser('transcript', help="every enrollment of a student, archived or current")
+    _student_arguments(command)
+    command.set_defaults(run=transcript)
+
+    command = commands.add_parser('check-rosters')
+    command.add_argument('--rebuild', action='store_true', help='rebuild the rosters from the students')
+    command.set_defaults(run=check_rosters)
+
+    command = commands.add_parser('batch')
+    command.add_argument('filename')
+    command.add_argument('--stop-on-error', action='store_true')
+    command.add_argument('--quiet', action='store_true', help='only report the failures')
+    command.set_defaults(run=run_batch)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command_stats:
+        CommandStats.install(args.command_stats, args.sample_rate)
+    if args.slow_queries:
+        SlowQueries.install(args.slow_queries, args.slow_ms)
+    connect(host=args.uri)
+    provision_indexes()
+    try:
+        with CommandStats.action(args.command):
+            result = args.run(args)
+    except ServiceError as error:
+        print(error, file=sys.stderr)
+        return 1
+    if result:
+        print(result)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -36,4 +36,10 @@ class Semester(Enum):
 class MinimumSatisfactory(Enum):
     A = 'A'
     B = 'B'
-    C = 'C'
\ No newline at end of file
+    C = 'C'
+
+class ClassStanding(Enum):
+    Freshman = 'Freshman'
+    Sophomore = 'Sophomore'
+    Junior = 'Junior'
+    Senior = 'Senior'
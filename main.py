@@ -1,25 +1,26 @@
-from datetime import datetime, time
-from ConstraintUtilities import select_general, unique_general, prompt_for_date
+from ConstraintUtilities import select_general, prompt_for_date, prompt_for_optional_int
 from Utilities import Utilities
 from Department import Department
 from Course import Course
 from Section import Section
 from Student import Student
 from Major import Major
-from StudentMajor import StudentMajor
-from Enrollment import Enrollment
-from PassFail import PassFail
-from LetterGrade import LetterGrade
-from embeded import DepartmentEmbedded, MajorEmbedded, CourseEmbedded
-from enums import MinimumSatisfactory
+import Services
+from Services import ServiceError, ConstraintViolation, SectionFull, HasDependents
 from CommandLogger import CommandLogger, log
+import CommandStats
+import SlowQueries
 from pymongo import monitoring
 from Menu import Menu
 from Option import Option
 from menu_definitions import menu_main, add_select, list_select, delete_select
+from Indexes import provision_indexes, verify_query_plans
+from Listings import enrollments_by_section, display, Pager
+from Archive import enrollment_history
 from pymongo.errors import DuplicateKeyError
 from pymongo.errors import WriteError
 import io
+import os
 
 
 def check_unique(collection, new_document, column_list) -> bool:
@@ -130,7 +131,20 @@ def menu_loop(menu: Menu):
     while action != menu.last_action():
         action = menu.menu_prompt()
         print('next action: ', action)
-        exec(action)
+        with CommandStats.action(action):
+            exec(action)
+
+
+def dump_command_stats():
+    command_stats.dump(command_stats_file)
+    print(f'Command statistics written to {command_stats_file}.')
+
+
+def report_slow_queries():
+    slow_queries.wait_for_explains(SlowQueries.default_explain_timeout)
+    print(SlowQueries.format_report(slow_queries.report()) or 'No slow queries so far.')
+    slow_queries.write_report(slow_queries_file)
+    print(f'Slow query report written to {slow_queries_file}.')
 
 
 def add():
@@ -191,7 +205,6 @@ def prompt_for_enum(prompt: str, cls, attribute_name: str):
 
 def add_department():
     success = False
-    new_department = None
     while not success:
         department_name = input('Enter department name (50 character max): ')
         abbreviation = input('Enter abbreviation name (6 character max): ')
@@ -200,41 +213,22 @@ def add_department():
         office = int(input('Enter office: '))
         description = input('Enter description (80 character max): ')
 
-        major_embedded = []
-        course_embedded = []
-
-        new_department = Department(
-            departmentName=department_name,
-            abbreviation=abbreviation,
-            chairName=chair_name,
-            building=building,
-            office=office,
-            description=description,
-            majorEmbedded=major_embedded,
-            courseEmbedded=course_embedded
-        )
-
-        violated_constraints = unique_general(new_department)
-        if violated_constraints:
-            for violated_constraint in violated_constraints:
-                print('Your input values violated constraint: ', violated_constraint)
-            print('Try again')
-        else:
+        try:
+            Services.add_department(department_name, abbreviation, chair_name, building, office, description)
+            print('------------------------------')
+            print('Department added successfully!')
+            print('------------------------------')
             success = True
-            try:
-                new_department.save()
-                print('------------------------------')
-                print('Department added successfully!')
-                print('------------------------------')
-                success = True
-            except Exception as e:
-                print('Error storing the new department:')
-                print(Utilities.print_exception(e))
+        except ConstraintViolation as cv:
+            print(cv)
+            print('Try again')
+        except Exception as e:
+            print('Error storing the new department:')
+            print(Utilities.print_exception(e))
 
 
 def add_course():
     success = False
-    new_course = None
     while not success:
         abbreviation = input('Enter the department abbreviation (6 character max):')
         course_name = input('Enter course name (50 character max): ')
@@ -242,59 +236,26 @@ def add_course():
         description = input('Enter description of the course (500 character max): ')
         units = int(input('Enter the units (Range: 1-5): '))
 
-        department = Department.objects(abbreviation=abbreviation).first()
-        if not department:
-            print('Department with abbreviation', abbreviation, 'not found.')
-            continue
-
-        department_name = department.departmentName
-        department_abbreviation = department.abbreviation
-
-        department_embedded = DepartmentEmbedded(
-            department=department,
-            departmentName=department_name,
-            abbreviation=department_abbreviation
-        )
-
-        new_course = Course(
-            abbreviation=abbreviation,
-            courseName=course_name,
-            courseNumber=course_number,
-            description=description,
-            units=units,
-            departmentEmbedded=department_embedded
-        )
-
-        new_course_embedded = CourseEmbedded(
-            course=new_course,
-            courseNumber=course_number,
-            courseName=course_name
-        )
-
-        violated_constraints = unique_general(new_course)
-        if violated_constraints:
-            for violated_constraint in violated_constraints:
-                print('Your input values violated constraint: ', violated_constraint)
+        try:
+            Services.add_course(abbreviation, course_name, course_number, description, units)
+            success = True
+            print('------------------------------')
+            print('Course added successfully!')
+            print('------------------------------')
+        except ConstraintViolation as cv:
+            print(cv)
             print('Try again')
-        else:
-            success = False
-            try:
-                new_course.save()
-                department.update(push__courseEmbedded=new_course_embedded)
-                success = True
-                print('------------------------------')
-                print('Course added successfully!')
-                print('------------------------------')
-            except Exception as e:
-                print('Errors storing the new course:', e)
+        except ServiceError as se:
+            print(se)
+        except Exception as e:
+            print('Errors storing the new course:', e)
 
 
 def add_section():
     success = False
-    new_section = None
     while not success:
         abbreviation = input('Enter department abbreviation: ')
-        course_number = input('Enter course number (Range 100-699): ')
+        course_number = int(input('Enter course number (Range 100-699): '))
         section_number = int(input('Enter section number: '))
         semester = input('Enter semester(Fall, Spring, Summer I, Summer II, Summer III, Winter): ')
         section_year = int(input('Enter section year: '))
@@ -303,193 +264,95 @@ def add_section():
         schedule = input('Enter schedule (MW, MWF, TuTh, F, S): ')
         start_time_input = input('Enter start time (HH:MM) format between 8:00 and 19:30: ')
         try:
-            start_time = datetime.strptime(start_time_input, '%H:%M')
-            if not (time(8, 0) <= start_time.time() <= time(19, 30)):
-                raise ValueError("Start time must be between 8:00 and 19:30.")
-        except ValueError as ve:
-            print("Invalid input:", ve)
+            start_time = Services.parse_start_time(start_time_input)
+        except ServiceError as se:
+            print(se)
             continue
 
         instructor = input('Enter instructor name: ')
+        capacity = prompt_for_optional_int('Enter capacity (number of seats, or leave blank for no limit): ')
+        duration = prompt_for_optional_int('Enter duration in minutes '
+                                           '(leave blank for the usual length of the schedule): ')
 
-        department = Department.objects(abbreviation=abbreviation).first()
-        if not department:
-            print('Department with abbreviation', abbreviation, 'not found.')
-            continue
-
-        course = Course.objects(courseNumber=course_number).first()
-        if not course:
-            print('Course with number', course_number, 'not found in department', abbreviation)
-            continue
-
-        course_embedded = CourseEmbedded(
-            course=course,
-            courseName=course.courseName,
-            courseNumber=course.courseNumber
-        )
-
-        new_section = Section(
-            courseNumber=course_number,
-            sectionNumber=section_number,
-            semester=semester,
-            sectionYear=section_year,
-            building=building,
-            roomNumber=room_number,
-            schedule=schedule,
-            startTime=start_time,
-            instructor=instructor,
-            course=course_embedded
-        )
-
-        violated_constraints = unique_general(new_section)
-        if violated_constraints:
-            for violated_constraint in violated_constraints:
-                print('Your input values violated constraint: ', violated_constraint)
-            print('Try again')
-        else:
+        try:
+            Services.add_section(abbreviation, course_number, section_number, semester, section_year, building,
+                                 room_number, schedule, start_time, instructor, capacity, duration)
+            print('------------------------------')
+            print('Section added successfully!')
+            print('------------------------------')
             success = True
-            try:
-                new_section.save()
-                success = False
-                print('------------------------------')
-                print('Section added successfully!')
-                print('------------------------------')
-                success = True
-            except Exception as e:
-                print('Errors storing the new section:')
-                print(Utilities.print_exception(e))
+        except ConstraintViolation as cv:
+            print(cv)
+            print('Try again')
+        except ServiceError as se:
+            print(se)
+        except Exception as e:
+            print('Errors storing the new section:')
+            print(Utilities.print_exception(e))
 
 
 def add_major():
     success = False
-    new_major = None
     while not success:
         major_name = input('Enter major name: ')
         abbreviation = input('Enter the department abbreviation: ')
         description = input('Enter description (maximum 500): ')
 
-        department = Department.objects(abbreviation=abbreviation).first()
-        if not department:
-            print('Department with abbreviation', abbreviation, 'not found.')
-            continue
-
-        department_name = department.departmentName
-        department_abbreviation = department.abbreviation
-
-        department_embedded = DepartmentEmbedded(
-            department=department,
-            departmentName=department_name,
-            abbreviation=department_abbreviation
-        )
-
-        new_major = Major(
-            majorName=major_name,
-            description=description,
-            departmentEmbedded=department_embedded
-        )
-
-        new_major_embedded = MajorEmbedded(
-            major=new_major,
-            majorName=major_name
-        )
-
-        violated_constraints = unique_general(new_major)
-        if violated_constraints:
-            for violated_constraint in violated_constraints:
-                print('Your input values violated constraint: ', violated_constraint)
+        try:
+            Services.add_major(major_name, abbreviation, description)
+            print('------------------------------')
+            print('Major added successfully!')
+            print('------------------------------')
+            success = True
+        except ConstraintViolation as cv:
+            print(cv)
             print('Try again')
-        else:
-            success = False
-            try:
-                new_major.save()
-                department.update(push__majorEmbedded=new_major_embedded)
-                print('------------------------------')
-                print('Major added successfully!')
-                print('------------------------------')
-                success = True
-            except Exception as e:
-                print('Error storing the new major:', e)
-                print(Utilities.print_exception(e))
+        except ServiceError as se:
+            print(se)
+        except Exception as e:
+            print('Error storing the new major:', e)
+            print(Utilities.print_exception(e))
 
 
 def add_student():
     success = False
-    new_student = None
     while not success:
         last_name = input("Enter student's last name: ")
         first_name = input("Enter Student's first name: ")
         e_mail = input('Enter email: ')
+        class_standing = input('Enter class standing (Freshman, Sophomore, Junior, Senior) or leave blank: ')
 
-        student_major = []
-        enrollment = []
-
-        new_student = Student(
-            lastName=last_name,
-            firstName=first_name,
-            eMail=e_mail,
-            studentMajor=student_major,
-            enrollment=enrollment
-        )
-
-        violated_constraints = unique_general(new_student)
-        if violated_constraints:
-            for violated_constraint in violated_constraints:
-                print('Your input values violated constraint: ', violated_constraint)
-            print('Try again')
-        else:
+        try:
+            Services.add_student(last_name, first_name, e_mail, class_standing or None)
+            print('------------------------------')
+            print('Student added successfully!')
+            print('------------------------------')
             success = True
-            try:
-                new_student.save()
-                success = False
-                print('------------------------------')
-                print('Student added successfully!')
-                print('------------------------------')
-                success = True
-
-            except Exception as e:
-                print('Errors storing the new student:')
-                print(Utilities.print_exception(e))
+        except ConstraintViolation as cv:
+            print(cv)
+            print('Try again')
+        except Exception as e:
+            print('Errors storing the new student:')
+            print(Utilities.print_exception(e))
 
 
 def add_student_major():
     success = False
-    new_student_major = None
     while not success:
         student = select_Student()
         major_name = input("Enter major name: ")
         declaration_date = prompt_for_date("Enter declaration date (MM-DD-YYYY): ")
 
-        major = Major.objects(majorName=major_name).first()
-        if not major:
-            print("major not found.")
-            continue
-
-        for student_major in student.studentMajor:
-            if student_major.majorName == major_name:
-                print('------------------------------')
-                print(f'Student is already majored in {student_major.majorName}. Try again.')
-                print('------------------------------')
-                return
-        major_embedded = MajorEmbedded(
-            major=major,
-            majorName=major_name
-        )
-
-        new_student_major = StudentMajor(
-            student=student,
-            majorName=major_name,
-            declarationDate=declaration_date,
-            majorEmbedded=[major_embedded]
-        )
-
         try:
-            student.studentMajor.append(new_student_major)
-            student.save()
-            success = False
+            Services.add_student_major(student, major_name, declaration_date)
             print('------------------------------')
             print('Student added to major successfully!')
             print('------------------------------')
             success = True
+        except ServiceError as se:
+            print('------------------------------')
+            print(se, 'Try again.')
+            print('------------------------------')
         except Exception as e:
             print('Errors storing a student to major:')
             print(Utilities.print_exception(e))
@@ -498,134 +361,108 @@ def add_student_major():
 def add_enrollment():
     """Enroll a student into a section"""
     success = False
-    new_enrollment = None
     while not success:
         student = select_Student()
         abbreviation = input('Enter department abbreviation: ')
-        course_number = input('Enter course number: ')
-        section_number = input('Enter section number: ')
+        course_number = int(input('Enter course number: '))
+        section_number = int(input('Enter section number: '))
         semester = input('Enter semester: ')
         section_year = int(input("Enter section year: "))
 
-        department = Department.objects(abbreviation=abbreviation).first()
-        if not department:
-            print('Department with abbreviation', abbreviation, 'not found.')
-            continue
+        application_date = None
+        min_satisfactory = None
+        pass_fail_choice = input('Enter pass/fail (P) or letter grade (L): ').upper()
+        if pass_fail_choice == 'P':
+            application_date = prompt_for_date('Enter application date: ')
+        elif pass_fail_choice == 'L':
+            min_satisfactory = input('Enter minimum satisfactory grade: ')
 
-        section = Section.objects(sectionNumber=section_number).first()
-        if not section:
+        try:
+            Services.enroll(student, abbreviation, course_number, section_number, semester, section_year,
+                            application_date, min_satisfactory)
             print('------------------------------')
-            print('Section not found.')
+            print('Student has been enrolled successfully!')
             print('------------------------------')
-            continue
+            success = True
+        except SectionFull as sf:
+            print('------------------------------')
+            print(sf)
+            print('------------------------------')
+            if input('Join the waitlist? (Y/N) --> ').upper() == 'Y':
+                try:
+                    entry = Services.join_waitlist(sf.student, sf.section, sf.enrollment)
+                    print(f'Student is number {Services.waitlist_position(entry)} on the waitlist.')
+                    success = True
+                except ServiceError as se:
+                    print(se)
+        except ServiceError as se:
+            print('------------------------------')
+            print(se)
+            print('------------------------------')
+        except Exception as e:
+            print('Error enrolling student:')
+            print(e)
 
-        for enrollment in student.enrollment:
-            if enrollment.course_number == course_number:
-                print('------------------------------')
-                print('Student is already enrolled in the same course. Try again.')
-                print('------------------------------')
-                break
+
+def page_through(pager: Pager, show):
+    """
+    Show one page of a listing at a time, and let the user move forward and back through the pages.
+    :param pager:   The Pager over the documents to list.
+    :param show:    The function that prints one document from the page.
+    :return:        None
+    """
+    page = pager.next_page()
+    if not page:
+        print('Nothing to list.')
+        return
+    while True:
+        for document in page:
+            show(document)
+        choice = input('(N)ext page, (P)revious page, (Q)uit --> ').upper()
+        if choice == 'Q':
+            return
+        new_page = pager.previous_page() if choice == 'P' else pager.next_page()
+        if new_page:
+            page = new_page
         else:
-            section = Section.objects(sectionNumber=section_number, courseNumber=course_number).first()
-            if not section:
-                print('------------------------------')
-                print('The specified section does not belong to the selected course. Try again.')
-                print('------------------------------')
-                continue
-
-            pass_fail_choice = input('Enter pass/fail (P) or letter grade (L): ').upper()
-            if pass_fail_choice not in ['P', 'L']:
-                print('------------------------------')
-                print('Invalid. Please enter P for pass/fail or L for letter grade.')
-                print('------------------------------')
-                continue
-
-            if pass_fail_choice == 'P':
-                application_date = prompt_for_date('Enter application date: ')
-
-                pass_fail = PassFail(
-                    sectionNumber=section_number,
-                    applicationDate=application_date
-                )
-                letter_grade = None
-
-            else:
-                min_satisfactory = input('Enter minimum satisfactory grade: ')
-                if not any(min_satisfactory == ms.value for ms in MinimumSatisfactory):
-                    print('------------------------------')
-                    print('Invalid choice for minimum satisfactory grade.')
-                    print('------------------------------')
-                    continue
-
-                letter_grade = LetterGrade(
-                    sectionNumber=section_number,
-                    min_satisfactory=min_satisfactory
-                )
-                pass_fail = None
-
-            new_enrollment = Enrollment(
-                student=student,
-                abbreviation=abbreviation,
-                courseNumber=course_number,
-                sectionNumber=section_number,
-                semester=semester,
-                sectionYear=section_year,
-                passFail=pass_fail,
-                letterGrade=letter_grade
-            )
-
-            try:
-                student.enrollment.append(new_enrollment)
-                student.save()
-
-                print('------------------------------')
-                print('Student has been enrolled successfully!')
-                print('------------------------------')
-                success = True
-            except Exception as e:
-                print('Error enrolling student:')
-                print(e)
+            print('There are no more pages in that direction.')
 
 
 def list_department():
-    departments = Department.objects()
-    for department in departments:
+    def show(department):
         print("------------------------------------------------ ")
-        print(department)
+        print(display(Department, department))
         print("------------------------------------------------ ")
+    page_through(Pager(Department, ['abbreviation']), show)
 
 
 def list_course():
-    courses = Course.objects()
-    for course in courses:
+    def show(course):
         print("--------List of courses in Department-----------")
-        print(course)
+        print(display(Course, course))
         print("------------------------------------------------")
+    page_through(Pager(Course, ['abbreviation', 'courseNumber']), show)
 
 
 def list_section():
-    courses = Course.objects()
-    for course in courses:
-        sections = Section.objects(courseNumber=course.courseNumber)
-        for section in sections:
-            print(f"\n----- List of Sections in the selected Course -------")
-            print(section)
-            print("------------------------------------------------------")
+    def show(section):
+        print(f"\n----- List of Sections in the selected Course -------")
+        print(display(Section, section))
+        print("------------------------------------------------------")
+    page_through(Pager(Section, ['courseNumber', 'sectionNumber']), show)
 
 
 def list_major():
-    majors = Major.objects()
-    for major in majors:
+    def show(major):
         print("----------------List of majors in Department------------")
-        print(major)
+        print(display(Major, major))
         print("--------------------------------------------------------")
+    page_through(Pager(Major, ['majorName']), show)
 
 
 def list_student():
-    students = Student.objects()
     print("---------List of students---------------------------------")
-    for student in students:
-        print(student)
+    page_through(Pager(Student, ['lastName', 'firstName']), lambda student: print(display(Student, student)))
     print("--------------------------------------------------------")
 
 def list_student_major():
@@ -666,7 +503,8 @@ def list_enrollment():
     print(f"\n----- List of enrollments of a student ----------- \n"
           f"{student.firstName} {student.lastName} is enrolled in: ")
 
-    enrollments = student.enrollment
+    # The enrollments of past terms may have been archived; this puts them back in with the current ones.
+    enrollments = enrollment_history(student)
 
     if enrollments:
         for enrollment in enrollments:
@@ -677,17 +515,36 @@ def list_enrollment():
     print("------------------------------------------------ ")
 
 
+def list_section_enrollment():
+    for (semester, year, abbreviation, course_number, section_number), enrollments in enrollments_by_section():
+        print(f"\n----- Students enrolled in {abbreviation} {course_number} section {section_number}, "
+              f"{semester} {year} -----")
+        for enrollment in enrollments:
+            print(f"    {enrollment.get('last_name')}, {enrollment.get('first_name')} ({enrollment.get('e_mail')})")
+        print("------------------------------------------------ ")
+
+
+def confirm_cascade(error: HasDependents, question: str) -> bool:
+    """
+    Show why a delete was refused and, if whatever is in the way can be removed along with it, ask
+    whether to do that.  Raises the error again when nothing can be cascaded, for the caller to report.
+    :return:    True if the user wants the delete to go ahead with the cascades.
+    """
+    if not error.cascadable:
+        raise error
+    print('-------------------------------')
+    print(error)
+    print('-------------------------------')
+    return input(question).upper() == 'Y'
+
+
 def delete_department():
     department_abbreviation = input("Enter the abbreviation of the department to delete: ")
-    department = Department.objects(abbreviation=department_abbreviation).first()
-    if not department:
-        print("Department not found.")
-        return
-    courses_in_department = Course.objects(abbreviation=department_abbreviation)
-    if courses_in_department:
-        print("This department cannot be deleted since courses are found in this department.")
+    try:
+        Services.delete_department(department_abbreviation)
+    except ServiceError as se:
+        print(se)
         return
-    department.delete()
     print('--------------------------------')
     print("Department deleted successfully.")
     print('--------------------------------')
@@ -695,23 +552,12 @@ def delete_department():
 
 def delete_course():
     department_abbreviation = input("Enter the department abbreviation: ")
-    department = Department.objects(abbreviation=department_abbreviation).first()
-    if not department:
-        print("Department not found.")
+    course_number = int(input("Enter the course number to delete: "))
+    try:
+        Services.delete_course(department_abbreviation, course_number)
+    except ServiceError as se:
+        print(se)
         return
-
-    course_number = input("Enter the course number to delete: ")
-    course = Course.objects(courseNumber=course_number).first()
-    if not course:
-        print("Course not found.")
-        return
-
-    sections_with_course = Section.objects(courseNumber=course_number)
-    if sections_with_course:
-        print("This course cannot be deleted since sections are found in this course.")
-        return
-
-    course.delete()
     print('------------------------------')
     print(" Course deleted successfully.")
     print('------------------------------')
@@ -719,32 +565,25 @@ def delete_course():
 
 def delete_section():
     department_abbreviation = input("Enter the department abbreviation: ")
-    department = Department.objects(abbreviation=department_abbreviation).first()
-    if not department:
-        print("Department not found.")
-        return
-
-    course_number = input("Enter the course number: ")
-    course = Course.objects(courseNumber=course_number).first()
-    if not course:
-        print('-------------------------------')
-        print("Course not found.")
-        print('-------------------------------')
-        return
-
-    section_number = input("Enter the section number to delete: ")
-    section = Section.objects(sectionNumber=section_number).first()
-    if not section:
+    course_number = int(input("Enter the course number: "))
+    section_number = int(input("Enter the section number to delete: "))
+    semester = input("Enter the semester (leave blank if the course has only one section with that number): ")
+    section_year = input("Enter the section year (leave blank if the course has only one section with that number): ")
+    semester = semester or None
+    section_year = int(section_year) if section_year else None
+    try:
+        try:
+            Services.delete_section(department_abbreviation, course_number, section_number, semester, section_year)
+        except HasDependents as hd:
+            if not confirm_cascade(hd, "Drop the section's enrollments, roster and waitlist as well? (Y/N) --> "):
+                return
+            Services.delete_section(department_abbreviation, course_number, section_number, semester, section_year,
+                                    cascade=True)
+    except ServiceError as se:
         print('-------------------------------')
-        print("Section not found.")
+        print(se)
         print('-------------------------------')
         return
-
-    if Student.objects(enrollment__sectionNumber=section_number).first():
-        print("This section cannot be deleted since a student is enrolled in this section.")
-        return
-
-    section.delete()
     print('-------------------------------')
     print(" Section deleted successfully.")
     print('------------------------------')
@@ -752,23 +591,18 @@ def delete_section():
 
 def delete_major():
     major_name = input("Enter the name of the major to delete: ")
-
-    major = Major.objects(majorName=major_name).first()
-    if not major:
+    try:
+        try:
+            Services.delete_major(major_name)
+        except HasDependents as hd:
+            if not confirm_cascade(hd, 'Take the major off those students as well? (Y/N) --> '):
+                return
+            Services.delete_major(major_name, cascade=True)
+    except ServiceError as se:
         print('-------------------------------')
-        print("Major not found.")
+        print(se)
         print('-------------------------------')
         return
-
-    students = Student.objects()
-
-    for student in students:
-        for student_major in student.studentMajor:
-            if student_major.majorName == major_name:
-                print("This major cannot be deleted since a student is declared in this major.")
-                return
-
-    major.delete()
     print('-------------------------------')
     print(" Major deleted successfully.")
     print('-------------------------------')
@@ -777,25 +611,13 @@ def delete_major():
 def delete_student():
     last_name = input("Enter student\'s last name: ")
     first_name = input("Enter student\'s first name: ")
-
-    student = Student.objects(lastName=last_name, firstName=first_name).first()
-    if not student:
+    try:
+        Services.delete_student(last_name, first_name)
+    except ServiceError as se:
         print('-------------------------------')
-        print("Student not found.")
+        print(se)
         print('-------------------------------')
         return
-
-    for enrollment in student.enrollment:
-        if enrollment.student == student:
-            print("This student cannot be deleted since a student is enrolled in sections.")
-            return
-
-    for student_major in student.studentMajor:
-        if student_major.student == student:
-            print("This student cannot be deleted since a student is declared in a major.")
-            return
-
-    student.delete()
     print('-------------------------------')
     print(" Student deleted successfully.")
     print('-------------------------------')
@@ -804,46 +626,15 @@ def delete_student():
 def delete_student_major():
     last_name = input("Enter student\'s last name: ")
     first_name = input("Enter student\'s first name: ")
-    student = Student.objects(lastName=last_name, firstName=first_name).first()
-    if not student:
-        print('-------------------------------')
-        print("Student not found.")
-        print('-------------------------------')
-        return
-
-    major_name = input(f"Enter the major name to delete from student: ")
-    major_associated = False
-    for major in student.studentMajor:
-        if major.majorName == major_name:
-            major_associated = True
-            break
-
-    if not major_associated:
+    try:
+        student = Services.find_student(last_name, first_name)
+        major_name = input(f"Enter the major name to delete from student: ")
+        Services.delete_student_major(student, major_name)
+    except ServiceError as se:
         print('-------------------------------')
-        print("Major specified is not associated with the student.")
+        print(se)
         print('-------------------------------')
         return
-
-    major = Major.objects(majorName=major_name).first()
-    if not major:
-        print('-------------------------------')
-        print("Major not found.")
-        print('-------------------------------')
-        return
-
-    student_major_to_delete = None
-    for student_major in student.studentMajor:
-        if str(student_major.majorName).strip() == str(major_name).strip():
-            student_major_to_delete = student_major
-            break
-
-    if not student_major_to_delete:
-        print('-------------------------------')
-        print("Major not found from student.")
-        print('-------------------------------')
-        return
-
-    student.update(pull__studentMajor=student_major_to_delete)
     print('-----------------------------------------------')
     print(f"Major is deleted from the student successfully.")
     print('-----------------------------------------------')
@@ -852,61 +643,42 @@ def delete_student_major():
 def delete_enrollment():
     last_name = input("Enter student\'s last name: ")
     first_name = input("Enter student\'s first name: ")
-    student = Student.objects(lastName=last_name, firstName=first_name).first()
-    if not student:
+    try:
+        student = Services.find_student(last_name, first_name)
+        department_abbreviation = input("Enter the department abbreviation: ")
+        course_number = int(input("Enter the course number: "))
+        section_number = int(input("Enter the section number to delete: "))
+        semester = input("Enter the semester (leave blank unless the student took this section in more than "
+                         "one term): ") or None
+        section_year = prompt_for_optional_int("Enter the section year (leave blank for any): ")
+        promoted = Services.drop_enrollment(student, department_abbreviation, course_number, section_number,
+                                            semester, section_year)
+    except ServiceError as se:
         print('-------------------------------')
-        print("Student not found.")
+        print(se)
         print('-------------------------------')
         return
-
-    department_abbreviation = input("Enter the department abbreviation: ")
-    department = Department.objects(abbreviation=department_abbreviation).first()
-    if not department:
-        print("Department not found.")
-        return
-
-    course_number = input("Enter the course number: ")
-    course = Course.objects(courseNumber=course_number).first()
-    if not course:
-        print('-------------------------------')
-        print("Course not found.")
-        print('-------------------------------')
-        return
-
-    section_number = input("Enter the section number to delete: ")
-
-    section = Section.objects(sectionNumber=section_number).first()
-    if not section:
-        print('-------------------------------')
-        print("Section not found.")
-        print('-------------------------------')
-        return
-
-    enrollment_to_delete = None
-    for enrollment in student.enrollment:
-        if str(enrollment.sectionNumber).strip() == str(section_number).strip():
-            enrollment_to_delete = enrollment
-            break
-
-    if not enrollment_to_delete:
-        print('-------------------------------')
-        print("Enrollment not found.")
-        print('-------------------------------')
-        return
-
-    student.update(pull__enrollment=enrollment_to_delete)
     print('------------------------------')
     print(f"Enrollment is deleted from Student successfully.")
+    if promoted:
+        print(f'The seat went to {Student.objects(id=promoted).first()} from the waitlist.')
     print('------------------------------')
 
 
 if __name__ == '__main__':
     print('Starting in main.')
     monitoring.register(CommandLogger())
+    command_stats_file = os.environ.get('ENROLLMENT_COMMAND_STATS', 'command_stats.json')
+    command_stats = CommandStats.install(command_stats_file)
+    slow_queries_file = os.environ.get('ENROLLMENT_SLOW_QUERY_REPORT', 'slow_queries.json')
+    slow_queries = SlowQueries.install(slow_queries_file)
     db = Utilities.startup()
+    provision_indexes()
+    verify_query_plans()
     main_action: str = ''
     while main_action != menu_main.last_action():
         main_action = menu_main.menu_prompt()
         print('next action: ', main_action)
-        exec(main_action)
+        with CommandStats.action(main_action):
+            exec(main_action)
     log.info('All done for now.')
@@ -13,6 +13,8 @@ menu_main = Menu('main', 'Please select one of the following options:', [
     Option("Add", "add()"),
     Option("List", "list()"),
     Option("Delete", "delete()"),
+    Option("Dump command statistics", "dump_command_stats()"),
+    Option("Report slow queries", "report_slow_queries()"),
     Option("Exit this application", "pass")
 ])
 
@@ -35,6 +37,7 @@ list_select = Menu('list', 'Please indicate what you want to list:', [
     Option("List all Student", "list_student()"),
     Option("List all Student to Major", "list_student_major()"),
     Option("List all Enrollment by Student", "list_enrollment()"),
+    Option("List all Enrollment by Section", "list_section_enrollment()"),
     Option("Exit", "pass")
 ])
 
@@ -0,0 +1,132 @@
+"""
+Shared fixtures.  The services run against an in-memory mongomock client, the same one that
+benchmarks.py --mongomock uses, so the tests need no MongoDB server.
+"""
+import os
+import sys
+import types
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import Option
+except ImportError:
+    # Menu imports the Option class of the menus, which is not part of this tree.  Nothing that
+    # the tests reach uses it, so a bare stand-in lets the services import.
+    class Option:
+        def __init__(self, prompt: str, action: str):
+            self.prompt = prompt
+            self.action = action
+
+    sys.modules['Option'] = types.SimpleNamespace(Option=Option)
+
+
+@pytest.fixture
+def db():
+    """A fresh mongomock database that MongoEngine is connected to, and empty caches."""
+    mongomock = pytest.importorskip('mongomock')
+    from mongoengine import connect, disconnect
+    import ConstraintUtilities
+    import ReferenceCache
+
+    disconnect()
+    client = connect('enrollment_tests', host='mongodb://localhost', mongo_client_class=mongomock.MongoClient,
+                     uuidRepresentation='standard')
+    ConstraintUtilities.invalidate_constraints()
+    ReferenceCache.invalidate_all()
+    yield client['enrollment_tests']
+    client.drop_database('enrollment_tests')
+    ReferenceCache.invalidate_all()
+    disconnect()
+
+
+@pytest.fixture
+def bulk_updates(db, monkeypatch):
+    """
+    mongomock's bulk_write does not take the UpdateOne of pymongo 4.9 and later, so apply each
+    update on its own instead.  Only for code that does not read the result of its bulk_write.
+    """
+    collection_class = type(db['students'])
+
+    def bulk_write(collection, requests, ordered=True, **kwargs):
+        for request in requests:
+            collection.update_one(request._filter, request._doc, upsert=bool(request._upsert))
+    monkeypatch.setattr(collection_class, 'bulk_write', bulk_write)
+
+
+def meeting_time(hour: int, minute: int = 0) -> datetime:
+    return datetime(1900, 1, 1, hour, minute)
+
+
+@pytest.fixture
+def twins(db):
+    """
+    Two departments that both have a course 323 with a section 1 in Fall 2026, at different times
+    and in different rooms: the case where a key without the department picks the wrong section.
+    :return:    A dictionary of the departments, courses and sections, keyed by abbreviation.
+    """
+    import Services
+
+    catalog = {'departments': {}, 'courses': {}, 'sections': {}}
+    for abbreviation, name, room, hour in (('CECS', 'Computer Engineering', 300, 10),
+                                           ('MATH', 'Mathematics', 301, 13)):
+        catalog['departments'][abbreviation] = Services.add_department(f'{name} Department', abbreviation,
+                                                                       f'Chair of {abbreviation}', 'ECS', room, name)
+        catalog['courses'][abbreviation] = Services.add_course(abbreviation, f'{name} 323', 323, 'A course.', 3)
+        catalog['sections'][abbreviation] = Services.add_section(abbreviation, 323, 1, 'Fall', 2026, 'ECS', room,
+                                                                 'MW', meeting_time(hour), f'Professor {abbreviation}',
+                                                                 capacity=30)
+    return catalog
+
+
+class _AsyncCursor:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    async def to_list(self, length=None):
+        return list(self.cursor)
+
+
+class _AsyncCollection:
+    """The async collection calls that AsyncServices makes, answered by a mongomock collection."""
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, *args, **kwargs):
+        return _AsyncCursor(self.collection.find(*args, **kwargs))
+
+    def __getattr__(self, name):
+        method = getattr(self.collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+class _AsyncDatabase:
+    def __init__(self, database):
+        self.database = database
+
+    def __getitem__(self, name):
+        return _AsyncCollection(self.database[name])
+
+
+class _AsyncClient:
+    def __init__(self, database):
+        self.database = _AsyncDatabase(database)
+
+    def __getitem__(self, name):
+        return self.database
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def async_service(db):
+    """An AsyncEnrollmentService over the same mongomock database as the synchronous services."""
+    from AsyncServices import AsyncEnrollmentService
+    return AsyncEnrollmentService(database=db.name, client=_AsyncClient(db))
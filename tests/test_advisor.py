@@ -0,0 +1,65 @@
+"""
+The index advisor: which declared indexes serve a query shape, partial ones included, and what it
+proposes for the shapes that none serves.
+"""
+import Advisor
+from SlowQueries import field_roles, strip_values
+from Student import Student
+
+
+def shape(collection: str, query: dict, sort: list = ()) -> dict:
+    """A shape as a SlowQueries report has it, that ran ten times and was never explained."""
+    equality, ranges = field_roles(query)
+    return {'collection': collection, 'command': 'find', 'filter': strip_values(query), 'equality': equality,
+            'range': ranges, 'sort': [list(key) for key in sort], 'count': 10, 'plan': None}
+
+
+def test_declared_indexes_carry_the_partial_filter():
+    indexes = {index['name']: index for index in Advisor.declared_indexes(Student)}
+    assert indexes['_id_']['partial_filter'] is None
+    assert indexes['student_uk_01']['partial_filter'] is None
+    assert indexes['student_enrollment_ix_01']['partial_filter'] == {'enrollment.section_number': {'$exists': True}}
+
+
+def test_implies():
+    exists = {'enrollment.section_number': {'$exists': True}}
+    assert Advisor.implies({'enrollment.section_number': '?'}, exists)
+    assert Advisor.implies({'enrollment.section_number': {'$gte': '?'}}, exists)
+    assert Advisor.implies({'$and': [{'last_name': '?'}, {'enrollment.section_number': {'$in': ['?']}}]}, exists)
+    assert not Advisor.implies({}, exists)
+    assert not Advisor.implies({'enrollment.section_number': {'$ne': '?'}}, exists)
+    assert not Advisor.implies({'enrollment.section_number': {'$exists': '?'}}, exists)
+    assert not Advisor.implies({'$or': [{'enrollment.section_number': '?'}, {'last_name': '?'}]}, exists)
+    assert not Advisor.implies({'enrollment.section_number': '?'}, {'$or': [exists]})
+
+
+def test_partial_index_serves_only_the_shapes_that_imply_its_filter():
+    keys = [('enrollment.section_number', 1), ('enrollment.course_number', 1)]
+    partial = {'enrollment.section_number': {'$exists': True}}
+    assert Advisor.serves(keys, shape('students', {'enrollment.section_number': 1}), partial)
+    sorted_only = shape('students', {}, sort=[('enrollment.section_number', 1)])
+    assert Advisor.serves(keys, sorted_only)
+    assert not Advisor.serves(keys, sorted_only, partial)
+    either = shape('students', {'$or': [{'enrollment.section_number': 1}, {'enrollment.course_number': 323}]})
+    assert not Advisor.serves(keys, either, partial)
+
+
+def test_id_index_serves_only_bounded_ranges():
+    assert Advisor.serves([('_id', 1)], shape('students', {'_id': {'$gt': 5}}))
+    assert not Advisor.serves([('_id', 1)], shape('students', {'_id': {'$nin': [1, 2]}}))
+    assert not Advisor.serves([('_id', 1)], shape('students', {'_id': {'$ne': 1}}))
+
+
+def test_advise_proposes_a_full_index_where_only_a_partial_one_matches(db):
+    proposals = Advisor.advise([shape('students', {}, sort=[('enrollment.section_number', 1)])])
+    assert [proposal['keys'] for proposal in proposals] == [[('enrollment.section_number', 1)]]
+    assert proposals[0]['fields'] == ['enrollment.sectionNumber']
+
+
+def test_advise_does_not_propose_an_index_that_is_declared(db):
+    assert Advisor.advise([shape('students', {'_id': {'$nin': [1, 2]}})]) == []
+    assert Advisor.advise([shape('students', {'e_mail': {'$ne': 'someone@example.com'}})]) == []
+
+
+def test_hot_queries_are_served_by_the_declared_indexes(db):
+    assert Advisor.advise(Advisor.hot_query_shapes()) == []
@@ -0,0 +1,59 @@
+import pytest
+
+import Archive
+import Services
+from conftest import meeting_time
+from EnrollmentArchive import EnrollmentArchive
+from Student import Student
+
+TERMS = [('Fall', 2025), ('Spring', 2026), ('Fall', 2026)]
+
+
+@pytest.fixture
+def history(twins, bulk_updates):
+    """Jane took CECS 323-1 in Fall 2025 and MATH 323-1 in Spring 2026, and is in CECS 323-1 now."""
+    for abbreviation, (semester, year) in zip(['CECS', 'MATH'], TERMS[:2]):
+        Services.add_section(abbreviation, 323, 1, semester, year, 'ECS', 300, 'MW', meeting_time(10),
+                             'Professor Lee')
+    jane = Services.add_student('Doe', 'Jane', 'jane.doe@example.edu')
+    for abbreviation, (semester, year) in zip(['CECS', 'MATH', 'CECS'], TERMS):
+        Services.enroll(jane, abbreviation, 323, 1, semester, year, None, 'C')
+    return jane
+
+
+def terms(enrollments) -> [tuple]:
+    return [(enrollment.abbreviation, enrollment.semester.value, enrollment.sectionYear) for enrollment in enrollments]
+
+
+def test_parse_term_and_term_order():
+    assert Archive.parse_term(' Summer II 2026 ') == ('Summer II', 2026)
+    ordered = sorted([('Fall', 2025), ('Spring', 2026), ('Winter', 2026), ('Fall', 2026)],
+                     key=lambda term: Archive.term_order(*term))
+    assert ordered == [('Fall', 2025), ('Winter', 2026), ('Spring', 2026), ('Fall', 2026)]
+
+
+def test_closed_terms_move_into_yearly_buckets(history):
+    assert Archive.migrate(('Fall', 2026)) == 1
+    assert terms(Student.objects(pk=history.pk).first().enrollment) == [('CECS', 'Fall', 2026)]
+    buckets = {bucket.year: terms(bucket.enrollment) for bucket in EnrollmentArchive.objects(student=history)}
+    assert buckets == {2025: [('CECS', 'Fall', 2025)], 2026: [('MATH', 'Spring', 2026)]}
+
+
+def test_running_the_migration_again_changes_nothing(history):
+    Archive.migrate(('Fall', 2026))
+    assert Archive.migrate(('Fall', 2026)) == 0
+    assert sum(len(bucket.enrollment) for bucket in EnrollmentArchive.objects(student=history)) == 2
+
+
+def test_the_history_puts_both_halves_back_together_in_order(history):
+    Archive.migrate(('Spring', 2026))
+    student = Student.objects(pk=history.pk).first()
+    assert len(student.enrollment) == 2
+    assert terms(Archive.enrollment_history(student)) == [('CECS', 'Fall', 2025), ('MATH', 'Spring', 2026),
+                                                         ('CECS', 'Fall', 2026)]
+
+
+def test_the_current_term_is_required(db, monkeypatch):
+    monkeypatch.delenv('ENROLLMENT_CURRENT_TERM', raising=False)
+    with pytest.raises(ValueError):
+        Archive.migrate()
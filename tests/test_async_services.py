@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+import Services
+from conftest import meeting_time
+from RosterEntry import RosterEntry
+from Section import Section
+from Student import Student
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_enroll_picks_the_section_of_the_right_department(twins, async_service):
+    jane = Services.add_student('Doe', 'Jane', 'jane.doe@example.edu')
+    run(async_service.enroll(jane.pk, 'MATH', 323, 1, 'Fall', 2026, min_satisfactory='C'))
+    math, cecs = twins['sections']['MATH'], twins['sections']['CECS']
+    assert Section.objects(pk=math.pk).first().enrolledCount == 1
+    assert Section.objects(pk=cecs.pk).first().enrolledCount == 0
+    assert RosterEntry.objects(section=math, student=jane).count() == 1
+    assert [enrollment.abbreviation for enrollment in Student.objects(pk=jane.pk).first().enrollment] == ['MATH']
+
+
+def test_enroll_twice_is_refused_and_keeps_one_seat(twins, async_service):
+    jane = Services.add_student('Doe', 'Jane', 'jane.doe@example.edu')
+    run(async_service.enroll(jane.pk, 'CECS', 323, 1, 'Fall', 2026, min_satisfactory='C'))
+    with pytest.raises(Services.ServiceError):
+        run(async_service.enroll(jane.pk, 'CECS', 323, 1, 'Fall', 2026, min_satisfactory='C'))
+    assert Section.objects(pk=twins['sections']['CECS'].pk).first().enrolledCount == 1
+
+
+def test_drop_releases_the_seat_of_the_right_department(twins, async_service):
+    jane = Services.add_student('Doe', 'Jane', 'jane.doe@example.edu')
+    john = Services.add_student('Roe', 'John', 'john.roe@example.edu')
+    Services.enroll(jane, 'CECS', 323, 1, 'Fall', 2026, None, 'C')
+    Services.enroll(john, 'MATH', 323, 1, 'Fall', 2026, None, 'C')
+    with pytest.raises(Services.ServiceError):
+        run(async_service.drop(jane.pk, 'MATH', 323, 1))
+    run(async_service.drop(jane.pk, 'CECS', 323, 1, 'Fall', 2026))
+    assert Section.objects(pk=twins['sections']['CECS'].pk).first().enrolledCount == 0
+    assert Section.objects(pk=twins['sections']['MATH'].pk).first().enrolledCount == 1
+    assert RosterEntry.objects(student=john).count() == 1
+
+
+def test_drop_promotes_from_the_waitlist(twins, async_service):
+    Section.objects(pk=twins['sections']['CECS'].pk).update(set__capacity=1)
+    jane = Services.add_student('Doe', 'Jane', 'jane.doe@example.edu')
+    john = Services.add_student('Roe', 'John', 'john.roe@example.edu')
+    run(async_service.enroll(jane.pk, 'CECS', 323, 1, 'Fall', 2026, min_satisfactory='C'))
+    with pytest.raises(Services.SectionFull) as full:
+        run(async_service.enroll(john.pk, 'CECS', 323, 1, 'Fall', 2026, min_satisfactory='C'))
+    Services.join_waitlist(john, Services.find_precise_section('CECS', 323, 1, 'Fall', 2026),
+                           full.value.enrollment)
+    assert run(async_service.drop(jane.pk, 'CECS', 323, 1)) == john.pk
+    assert Section.objects(pk=twins['sections']['CECS'].pk).first().enrolledCount == 1
+
+
+def test_enroll_checks_the_timetable_of_the_right_department(twins, async_service):
+    Services.add_course('CECS', 'Capstone', 491, 'A course.', 3)
+    Services.add_section('CECS', 491, 1, 'Fall', 2026, 'ECS', 302, 'MW', meeting_time(13), 'Professor Lee',
+                         capacity=30)
+    jane = Services.add_student('Doe', 'Jane', 'jane.doe@example.edu')
+    run(async_service.enroll(jane.pk, 'CECS', 323, 1, 'Fall', 2026, min_satisfactory='C'))
+    run(async_service.enroll(jane.pk, 'CECS', 491, 1, 'Fall', 2026, min_satisfactory='C'))
+    with pytest.raises(Services.TimetableClash):
+        run(async_service.enroll(jane.pk, 'MATH', 323, 1, 'Fall', 2026, min_satisfactory='C'))
@@ -0,0 +1,88 @@
+import csv
+import json
+
+import BulkImport
+from Department import Department
+from Section import Section
+from Student import Student
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='') as output:
+        writer = csv.DictWriter(output, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def write_jsonl(path, rows):
+    with open(path, 'w') as output:
+        output.writelines(json.dumps(row) + '\n' for row in rows)
+    return str(path)
+
+
+def department(abbreviation, office, **values):
+    row = {'departmentName': f'Department of {abbreviation}', 'abbreviation': abbreviation,
+           'chairName': f'Chair of {abbreviation}', 'building': 'ECS', 'office': office,
+           'description': 'A department.'}
+    row.update(values)
+    return row
+
+
+def section(abbreviation, section_number, room, start, instructor):
+    return {'abbreviation': abbreviation, 'courseNumber': 323, 'sectionNumber': section_number, 'semester': 'Fall',
+            'sectionYear': 2026, 'building': 'ECS', 'roomNumber': room, 'schedule': 'TuTh', 'startTime': start,
+            'instructor': instructor, 'capacity': 30}
+
+
+def test_rejected_rows_are_reported_and_the_rest_inserted(db, tmp_path):
+    filename = write_csv(tmp_path / 'department.csv', [
+        department('CECS', 300),
+        department('CECS', 301, departmentName='Another name', chairName='Another chair'),
+        department('MATH', 'three hundred'),
+        department('PHYS', 300),
+        department('MATH', 302),
+    ])
+    report = BulkImport.import_file('department', filename, batch_size=2)
+    assert report.inserted == 2
+    assert [error['row'] for error in report.errors] == [2, 3, 4]
+    assert 'department_uk_01' in report.errors[0]['error'] and 'department_uk_04' in report.errors[2]['error']
+    assert sorted(Department.objects.distinct('abbreviation')) == ['CECS', 'MATH']
+
+
+def test_sections_are_checked_for_courses_and_conflicts(twins, tmp_path):
+    filename = write_csv(tmp_path / 'section.csv', [
+        section('CECS', 2, 310, '08:00', 'Professor A'),
+        section('MATH', 2, 310, '08:30', 'Professor B'),
+        section('MATH', 2, 311, '08:30', 'Professor A'),
+        section('PHYS', 1, 312, '08:00', 'Professor C'),
+        section('MATH', 2, 312, '08:00', 'Professor C'),
+    ])
+    report = BulkImport.import_file('section', filename)
+    assert report.inserted == 2
+    assert [error['row'] for error in report.errors] == [2, 3, 4]
+    assert 'same room' in report.errors[0]['error'] and 'same instructor' in report.errors[1]['error']
+    assert 'PHYS 323 not found' in report.errors[2]['error']
+    assert Section.objects(sectionNumber=2).count() == 2
+
+
+def test_an_enrollment_has_to_name_a_section_of_its_own_department(twins, tmp_path):
+    from Course import Course
+    import Services
+
+    Services.add_course('MATH', 'Number Theory', 491, 'A course.', 3)
+    enrollment = {'courseNumber': 323, 'sectionNumber': 1, 'semester': 'Fall', 'sectionYear': 2026,
+                  'minSatisfactory': 'C'}
+    filename = write_jsonl(tmp_path / 'student.jsonl', [
+        {'lastName': 'Doe', 'firstName': 'Jane', 'eMail': 'jane@example.edu',
+         'enrollment': [dict(enrollment, abbreviation='MATH')]},
+        {'lastName': 'Roe', 'firstName': 'John', 'eMail': 'john@example.edu',
+         'enrollment': [dict(enrollment, abbreviation='MATH', courseNumber=491)]},
+        {'lastName': 'Poe', 'firstName': 'Ann', 'eMail': 'ann@example.edu',
+         'enrollment': [dict(enrollment, abbreviation='MATH', sectionYear=2027)]},
+    ])
+    report = BulkImport.import_file('student', filename)
+    assert report.inserted == 1
+    assert [error['row'] for error in report.errors] == [2, 3]
+    assert [enrollment.abbreviation for enrollment in Student.objects(lastName='Doe').first().enrollment] == ['MATH']
+    assert Course.objects(abbreviation='MATH', courseNumber=491).count() == 1
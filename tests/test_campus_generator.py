@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from CampusGenerator import CampusGenerator, FIRST_COURSE_NUMBER
+
+
+def campus(**knobs):
+    return CampusGenerator(seed=7, departments=4, courses=24, department_skew=0.0,
+                           terms=[('Fall', 2026), ('Spring', 2027)], **knobs)
+
+
+def test_each_department_numbers_its_own_courses():
+    generator = campus()
+    keys = [(course.abbreviation, course.courseNumber) for course in generator.courses]
+    assert len(keys) == len(set(keys))
+    assert {abbreviation for abbreviation, number in keys if number == FIRST_COURSE_NUMBER} == \
+        {department.abbreviation for department in generator.departments}
+
+
+def test_a_department_can_have_no_more_than_600_courses():
+    with pytest.raises(ValueError):
+        CampusGenerator(departments=1, courses=601)
+    assert len(CampusGenerator(departments=2, courses=1000, department_skew=0.0).courses) == 1000
+
+
+def test_no_two_sections_share_a_room_or_an_instructor_at_one_time():
+    generator = campus()
+    rooms, instructors, sections = set(), set(), set()
+    for section, course in zip(generator.sections, generator.section_courses):
+        term = (section.semester, section.sectionYear, section.schedule, section.startTime)
+        rooms.add(term + (section.building, section.roomNumber))
+        instructors.add(term + (section.instructor,))
+        sections.add((course.id, section.sectionNumber, section.semester, section.sectionYear))
+        assert section.to_mongo()['course_embedded']['course'] == course.id
+        assert section.courseNumber == course.courseNumber
+    assert len(rooms) == len(instructors) == len(sections) == len(generator.sections)
+
+
+def test_students_never_take_one_slot_or_one_course_twice_in_a_term():
+    generator = campus()
+    for student in generator.students(200):
+        terms = {}
+        for index, application_date, grade in student['enrollments']:
+            section = generator.sections[index]
+            slots, courses = terms.setdefault((section.semester, section.sectionYear), (set(), set()))
+            assert generator.section_slots[index] not in slots
+            assert generator.section_courses[index].id not in courses
+            slots.add(generator.section_slots[index])
+            courses.add(generator.section_courses[index].id)
+    assert all(seats >= 0 for seats in generator.seats_left)
+
+
+def test_the_same_seed_gives_the_same_campus():
+    first, second = campus(), campus()
+    assert [section.id for section in first.sections] == [section.id for section in second.sections]
+    assert list(first.students(50)) == list(second.students(50))
+
+
+def test_imported_enrollments_name_sections_of_their_own_department(tmp_path):
+    campus().write_jsonl(str(tmp_path), 200)
+    keys = ('abbreviation', 'courseNumber', 'sectionNumber', 'semester', 'sectionYear')
+    with open(tmp_path / 'section.jsonl') as rows:
+        sections = {tuple(row[key] for key in keys) for row in map(json.loads, rows)}
+    with open(tmp_path / 'student.jsonl') as rows:
+        enrollments = [tuple(enrollment[key] for key in keys)
+                       for row in map(json.loads, rows) for enrollment in row['enrollment']]
+    assert enrollments and set(enrollments) <= sections
+    assert len({key[1:] for key in sections}) < len(sections)
@@ -0,0 +1,21 @@
+import pytest
+
+import cli
+
+
+def test_an_unknown_semester_is_turned_down_by_argparse(capsys):
+    with pytest.raises(SystemExit):
+        cli.build_parser().parse_args(['audit-term', '--semester', 'Autumn', '--year', '2026'])
+    assert 'invalid choice' in capsys.readouterr().err
+    assert cli.build_parser().parse_args(['audit-term', '--semester', 'Summer I', '--year', '2026']).semester \
+        == 'Summer I'
+
+
+def test_drop_takes_an_optional_term():
+    args = cli.build_parser().parse_args(['drop', '--last-name', 'Doe', '--first-name', 'Jane', '--abbreviation',
+                                          'CECS', '--course-number', '323', '--section-number', '1',
+                                          '--semester', 'Spring', '--year', '2027'])
+    assert (args.semester, args.year) == ('Spring', 2027)
+    args = cli.build_parser().parse_args(['drop', '--last-name', 'Doe', '--first-name', 'Jane', '--abbreviation',
+                                          'CECS', '--course-number', '323', '--section-number', '1'])
+    assert (args.semester, args.year) == (None, None)
@@ -0,0 +1,80 @@
+import ConstraintUtilities
+from Department import Department
+
+
+def department(**values):
+    columns = dict(departmentName='Computer Engineering', abbreviation='CECS', chairName='Chair of CECS',
+                   building='ECS', office=300, description='A department.', majorEmbedded=[], courseEmbedded=[])
+    columns.update(values)
+    return Department(**columns)
+
+
+def test_the_registry_asks_mongodb_once_per_class(db, monkeypatch):
+    collection = Department._get_collection()
+    calls = []
+    index_information = collection.index_information
+    monkeypatch.setattr(type(collection), 'index_information',
+                        lambda self: calls.append(self.name) or index_information())
+    first = ConstraintUtilities.get_constraints(Department)
+    assert ConstraintUtilities.get_constraints(Department) is first
+    assert ConstraintUtilities.get_column_attributes(Department)['chair_name'] == 'chairName'
+    assert calls == ['departments']
+    assert {constraint['name'] for constraint in first} >= {'_id_', 'department_uk_01', 'department_uk_04'}
+    ConstraintUtilities.invalidate_constraints(Department)
+    ConstraintUtilities.get_constraints(Department)
+    assert calls == ['departments', 'departments']
+
+
+def test_changing_the_declared_indexes_rebuilds_the_entry(db, monkeypatch):
+    first = ConstraintUtilities.get_constraints(Department)
+    monkeypatch.setitem(Department._meta, 'index_specs', Department._meta['index_specs'][:1])
+    assert ConstraintUtilities.get_constraints(Department) is not first
+
+
+def test_one_query_finds_every_violated_constraint(db, monkeypatch):
+    department().save()
+    duplicate = department(departmentName='Computer Science', chairName='Chair of CECS', office=301)
+    collection = Department._get_collection()
+    queries = []
+    find = collection.find
+    monkeypatch.setattr(collection, 'find', lambda *args, **kwargs: queries.append(args[0]) or find(*args, **kwargs))
+    violated = ConstraintUtilities.unique_general(duplicate)
+    assert [constraint['name'] for constraint in violated] == ['department_uk_01', 'department_uk_03']
+    assert len(queries) == 1 and len(queries[0]['$or']) == len(ConstraintUtilities.get_constraints(Department))
+    monkeypatch.undo()
+    assert ConstraintUtilities.unique_general(duplicate, batched=False) == violated
+
+
+def test_a_new_instance_violates_nothing(db):
+    department().save()
+    assert ConstraintUtilities.unique_general(department(departmentName='Mathematics', abbreviation='MATH',
+                                                         chairName='Chair of MATH', office=301)) == []
+
+
+def test_an_optimistic_insert_names_the_constraint_the_server_tripped_over(db, monkeypatch):
+    from pymongo.errors import DuplicateKeyError
+
+    assert ConstraintUtilities.insert_general(department(), ConstraintUtilities.OPTIMISTIC) == []
+
+    # mongomock leaves the details out of its duplicate key errors, so answer the way the server does.
+    def insert_one(collection, document, *args, **kwargs):
+        raise DuplicateKeyError('E11000 duplicate key error', 11000, {'keyValue': {'abbreviation': 'CECS'}})
+    # MongoEngine inserts through a copy of the collection with its write concern, so patch the class.
+    monkeypatch.setattr(type(Department._get_collection()), 'insert_one', insert_one)
+    violated = ConstraintUtilities.insert_general(department(departmentName='Computer Science', office=301),
+                                                  ConstraintUtilities.OPTIMISTIC)
+    assert [constraint['name'] for constraint in violated] == ['department_uk_01']
+    assert Department.objects.count() == 1
+
+
+def test_a_duplicate_key_error_maps_to_its_constraint(db):
+    from pymongo.errors import DuplicateKeyError
+
+    by_key = DuplicateKeyError('E11000 duplicate key error', 11000,
+                               {'keyValue': {'building': 'ECS', 'office': 300}})
+    assert ConstraintUtilities.constraint_from_duplicate_key(Department, by_key)['name'] == 'department_uk_04'
+    by_name = DuplicateKeyError('E11000', 11000, {'errmsg': 'E11000 duplicate key error collection: '
+                                                            'test.departments index: department_uk_02 dup key'})
+    assert ConstraintUtilities.constraint_from_duplicate_key(Department, by_name)['name'] == 'department_uk_02'
+    assert ConstraintUtilities.constraint_from_duplicate_key(Department, DuplicateKeyError('E11000', 11000, {})) \
+        is None
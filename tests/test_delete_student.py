@@ -0,0 +1,34 @@
+import pytest
+
+import Services
+from EnrollmentArchive import EnrollmentArchive
+from Student import Student
+from Waitlist import Waitlist
+
+
+def test_waitlist_entries_go_with_the_student(twins):
+    jane = Services.add_student('Doe', 'Jane', 'jane.doe@example.edu')
+    enrollment = Services.build_enrollment(jane, 'CECS', 323, 1, 'Fall', 2026, None, 'C')
+    Services.join_waitlist(jane, twins['sections']['CECS'], enrollment)
+    Services.delete_student('Doe', 'Jane')
+    assert Student.objects(pk=jane.pk).count() == 0
+    assert Waitlist.objects(student=jane.pk).count() == 0
+
+
+def test_archived_enrollments_block_the_delete(twins):
+    jane = Services.add_student('Doe', 'Jane', 'jane.doe@example.edu')
+    history = Services.build_enrollment(jane, 'CECS', 323, 1, 'Fall', 2025, None, 'C')
+    EnrollmentArchive(student=jane, year=2025, enrollment=[history]).save()
+    with pytest.raises(Services.HasDependents) as refused:
+        Services.delete_student('Doe', 'Jane')
+    assert not refused.value.cascadable
+    assert Student.objects(pk=jane.pk).count() == 1
+    assert EnrollmentArchive.objects(student=jane.pk).count() == 1
+
+
+def test_an_enrolled_student_is_not_deleted(twins):
+    jane = Services.add_student('Doe', 'Jane', 'jane.doe@example.edu')
+    Services.enroll(jane, 'CECS', 323, 1, 'Fall', 2026, None, 'C')
+    with pytest.raises(Services.ServiceError):
+        Services.delete_student('Doe', 'Jane')
+    assert Student.objects(pk=jane.pk).count() == 1
@@ -0,0 +1,38 @@
+import pytest
+
+import Services
+from conftest import meeting_time
+from Section import Section
+from Student import Student
+
+
+@pytest.fixture
+def two_terms(twins):
+    """Jane is in CECS 323-1 in Fall 2026, and again in the section with the same number in Spring 2027."""
+    spring = Services.add_section('CECS', 323, 1, 'Spring', 2027, 'ECS', 300, 'MW', meeting_time(10),
+                                  'Professor CECS', capacity=30)
+    jane = Services.add_student('Doe', 'Jane', 'jane.doe@example.edu')
+    Services.enroll(jane, 'CECS', 323, 1, 'Fall', 2026, None, 'C')
+    Services.enroll(jane, 'CECS', 323, 1, 'Spring', 2027, None, 'C')
+    return jane, twins['sections']['CECS'], spring
+
+
+def test_a_section_in_two_terms_needs_the_term(two_terms):
+    jane, fall, spring = two_terms
+    with pytest.raises(Services.ServiceError, match='more than one term'):
+        Services.drop_enrollment(Student.objects(pk=jane.pk).first(), 'CECS', 323, 1)
+
+
+def test_the_term_picks_the_enrollment_and_the_seat(two_terms):
+    jane, fall, spring = two_terms
+    Services.drop_enrollment(Student.objects(pk=jane.pk).first(), 'CECS', 323, 1, 'Spring', 2027)
+    assert [(enrollment.semester.value, enrollment.sectionYear)
+            for enrollment in Student.objects(pk=jane.pk).first().enrollment] == [('Fall', 2026)]
+    assert Section.objects(pk=spring.pk).first().enrolledCount == 0
+    assert Section.objects(pk=fall.pk).first().enrolledCount == 1
+
+
+def test_another_departments_section_is_not_dropped(two_terms):
+    jane, fall, spring = two_terms
+    with pytest.raises(Services.ServiceError, match='Enrollment not found'):
+        Services.drop_enrollment(Student.objects(pk=jane.pk).first(), 'MATH', 323, 1, 'Fall', 2026)
@@ -0,0 +1,43 @@
+import pytest
+
+import Services
+from conftest import meeting_time
+from Student import Student
+
+
+def test_an_enrollment_is_pushed_without_rewriting_the_student(twins):
+    jane = Services.add_student('Doe', 'Jane', 'jane.doe@example.edu')
+    # Someone else changes the student after we read it; a save() of our copy would undo that.
+    Student._get_collection().update_one({'_id': jane.pk}, {'$set': {'e_mail': 'jane@example.edu'}})
+    Services.enroll(jane, 'CECS', 323, 1, 'Fall', 2026, None, 'C')
+    stored = Student.objects(pk=jane.pk).first()
+    assert stored.eMail == 'jane@example.edu'
+    assert [enrollment.abbreviation for enrollment in stored.enrollment] == ['CECS']
+
+
+def test_one_course_per_term_but_the_same_number_in_another_department(twins):
+    Services.add_section('CECS', 323, 2, 'Fall', 2026, 'ECS', 300, 'TuTh', meeting_time(8), 'Professor Lee')
+    jane = Services.add_student('Doe', 'Jane', 'jane.doe@example.edu')
+    Services.enroll(jane, 'CECS', 323, 1, 'Fall', 2026, None, 'C')
+    with pytest.raises(Services.ServiceError):
+        Services.enroll(jane, 'CECS', 323, 2, 'Fall', 2026, None, 'C')
+    Services.enroll(jane, 'MATH', 323, 1, 'Fall', 2026, None, 'C')
+    assert [(enrollment.abbreviation, enrollment.sectionNumber)
+            for enrollment in Student.objects(pk=jane.pk).first().enrollment] == [('CECS', 1), ('MATH', 1)]
+
+
+def test_a_major_is_declared_once(twins):
+    Services.add_major('Computer Science', 'CECS', 'A major.')
+    jane = Services.add_student('Doe', 'Jane', 'jane.doe@example.edu')
+    Services.add_student_major(jane, 'Computer Science', meeting_time(9))
+    with pytest.raises(Services.ServiceError, match='already majored'):
+        Services.add_student_major(jane, 'Computer Science', meeting_time(10))
+    assert len(Student.objects(pk=jane.pk).first().studentMajor) == 1
+
+
+def test_pull_from_reports_whether_anything_was_pulled(twins):
+    jane = Services.add_student('Doe', 'Jane', 'jane.doe@example.edu')
+    Services.enroll(jane, 'CECS', 323, 1, 'Fall', 2026, None, 'C')
+    match = {'abbreviation': 'CECS', 'course_number': 323}
+    assert Services.pull_from(jane, 'enrollment', match) is True
+    assert Services.pull_from(jane, 'enrollment', match) is False
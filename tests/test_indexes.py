@@ -0,0 +1,29 @@
+from mongoengine.queryset import transform
+
+import Indexes
+from Student import Student
+
+
+def test_provisioning_builds_the_multikey_indexes_on_the_arrays(db):
+    Indexes.provision_indexes()
+    indexes = Student._get_collection().index_information()
+    assert indexes['student_enrollment_ix_01']['key'] == [('enrollment.section_number', 1),
+                                                          ('enrollment.course_number', 1)]
+    assert indexes['student_enrollment_ix_01']['partialFilterExpression'] == \
+        {'enrollment.section_number': {'$exists': True}}
+    assert indexes['student_major_ix_01']['key'] == [('studentMajor.major_name', 1)]
+
+
+def test_every_hot_query_leads_with_the_columns_of_a_declared_index():
+    for description, model, filters in Indexes.HOT_QUERIES:
+        columns = set(transform.query(model, **filters))
+        prefixes = [[column for column, _ in spec['fields']][:len(columns)]
+                    for spec in model._meta['index_specs']]
+        assert any(set(prefix) == columns for prefix in prefixes), description
+
+
+def test_plan_stages_walks_every_nesting():
+    plan = {'stage': 'FETCH', 'inputStage': {'stage': 'OR', 'inputStages': [{'stage': 'IXSCAN'},
+                                                                            {'stage': 'COLLSCAN'}]},
+            'queryPlan': {'stage': 'SORT', 'inputStage': {'stage': 'IXSCAN'}}}
+    assert sorted(Indexes.plan_stages(plan)) == ['COLLSCAN', 'FETCH', 'IXSCAN', 'IXSCAN', 'OR', 'SORT']
@@ -0,0 +1,48 @@
+import pytest
+
+import Listings
+import Services
+from Listings import Pager, attribute_value
+from Student import Student
+
+
+@pytest.fixture
+def students(db):
+    """Seven students, with three who share the last name Lee, so the sort keys tie."""
+    names = [('Lee', 'Ann'), ('Chen', 'Bo'), ('Lee', 'Cy'), ('Diaz', 'Di'), ('Lee', 'Ed'), ('Abe', 'Fay'),
+             ('Moss', 'Gus')]
+    return [Services.add_student(last, first, f'{first}.{last}@example.edu'.lower()) for last, first in names]
+
+
+def names(page) -> [tuple]:
+    return [(attribute_value(Student, document, 'lastName'), attribute_value(Student, document, 'firstName'))
+            for document in page]
+
+
+@pytest.mark.parametrize('raw', [True, False])
+def test_pages_cover_every_student_once_in_order(students, monkeypatch, raw):
+    monkeypatch.setattr(Listings, 'raw_listings', raw)
+    pager = Pager(Student, ['lastName'], page_size=3)
+    assert pager.sort == ['lastName', 'id']
+    pages = [pager.next_page(), pager.next_page(), pager.next_page()]
+    assert pager.next_page() == []
+    seen = [name for page in pages for name in names(page)]
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert len(set(seen)) == len(students)
+    assert [last for last, _ in seen] == sorted(last for last, _ in seen)
+
+
+def test_previous_page_goes_back_and_unique_keys_need_no_tie_breaker(students):
+    pager = Pager(Student, ['lastName', 'firstName'], page_size=2)
+    assert pager.sort == ['lastName', 'firstName']
+    first, second = names(pager.next_page()), names(pager.next_page())
+    assert first == [('Abe', 'Fay'), ('Chen', 'Bo')] and second == [('Diaz', 'Di'), ('Lee', 'Ann')]
+    assert names(pager.previous_page()) == first
+    assert pager.previous_page() == []
+
+
+def test_a_student_added_before_the_page_does_not_shift_it(students):
+    pager = Pager(Student, ['lastName', 'firstName'], page_size=2)
+    pager.next_page()
+    Services.add_student('Aaron', 'Al', 'al.aaron@example.edu')
+    assert names(pager.next_page()) == [('Diaz', 'Di'), ('Lee', 'Ann')]
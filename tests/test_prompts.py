@@ -0,0 +1,17 @@
+from ConstraintUtilities import prompt_for_optional_int
+
+
+def answers(monkeypatch, *entries):
+    entries = iter(entries)
+    monkeypatch.setattr('builtins.input', lambda prompt='': next(entries))
+
+
+def test_a_blank_entry_means_none(monkeypatch):
+    answers(monkeypatch, '')
+    assert prompt_for_optional_int('Capacity: ') is None
+
+
+def test_other_bad_entries_are_prompted_again(monkeypatch, capsys):
+    answers(monkeypatch, 'thirty', '3.5', ' 30 ')
+    assert prompt_for_optional_int('Capacity: ') == 30
+    assert capsys.readouterr().out.count('not a whole number') == 2
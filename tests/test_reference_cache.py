@@ -0,0 +1,49 @@
+import ReferenceCache
+from ReferenceCache import ReferenceCache as Cache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_the_default_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ReferenceCache.time, 'monotonic', clock)
+    loads = []
+    cache = Cache('test', lambda key: loads.append(key) or f'entity {len(loads)}')
+    assert cache.ttl == ReferenceCache.DEFAULT_TTL
+    assert cache.get('CECS') == cache.get('CECS') == 'entity 1'
+    clock.now += ReferenceCache.DEFAULT_TTL
+    assert cache.get('CECS') == 'entity 2'
+    assert cache.stats() == {'name': 'test', 'entries': 1, 'hits': 1, 'misses': 2}
+
+
+def test_misses_are_not_cached_and_the_least_recent_entry_goes_first():
+    entities = {}
+    cache = Cache('test', entities.get, max_entries=2)
+    assert cache.get('CECS') is None
+    entities.update(CECS='cecs', MATH='math', PHYS='phys')
+    assert cache.get('CECS') == 'cecs'
+    cache.get('MATH')
+    cache.get('CECS')
+    cache.get('PHYS')
+    assert list(cache.entries) == ['CECS', 'PHYS']
+
+
+def test_a_rename_by_another_process_is_seen_once_the_entry_expires(db, monkeypatch):
+    import Services
+    from Department import Department
+
+    clock = Clock()
+    monkeypatch.setattr(ReferenceCache.time, 'monotonic', clock)
+    Services.add_department('Computer Engineering Department', 'CECS', 'Chair of CECS', 'ECS', 300, 'A department.')
+    assert ReferenceCache.get_department('CECS').chairName == 'Chair of CECS'
+    # Another process writes straight to the collection, so no signal reaches this cache.
+    Department._get_collection().update_one({'abbreviation': 'CECS'}, {'$set': {'chair_name': 'New Chair'}})
+    assert ReferenceCache.get_department('CECS').chairName == 'Chair of CECS'
+    clock.now += ReferenceCache.DEFAULT_TTL
+    assert ReferenceCache.get_department('CECS').chairName == 'New Chair'
@@ -0,0 +1,69 @@
+import pytest
+
+import Services
+from conftest import meeting_time
+from Course import Course
+from RosterEntry import RosterEntry
+from Section import Section
+from Student import Student
+
+
+def enroll(last_name: str, abbreviation: str):
+    student = Services.add_student(last_name, 'Pat', f'{last_name.lower()}@example.edu')
+    Services.enroll(student, abbreviation, 323, 1, 'Fall', 2026, None, 'C')
+    return student
+
+
+def test_an_enrolled_section_is_not_deleted(twins):
+    enroll('Doe', 'CECS')
+    with pytest.raises(Services.HasDependents) as refused:
+        Services.delete_section('CECS', 323, 1)
+    assert refused.value.cascadable
+    assert Section.objects(pk=twins['sections']['CECS'].pk).count() == 1
+
+
+def test_an_enrollment_without_a_roster_entry_still_blocks(twins):
+    student = enroll('Doe', 'CECS')
+    RosterEntry.objects(student=student).delete()
+    with pytest.raises(Services.HasDependents):
+        Services.delete_section('CECS', 323, 1)
+
+
+def test_cascade_only_pulls_the_sections_own_enrollments(twins):
+    cecs = enroll('Doe', 'CECS')
+    math = enroll('Roe', 'MATH')
+    Services.delete_section('CECS', 323, 1, cascade=True)
+    assert Section.objects(pk=twins['sections']['CECS'].pk).count() == 0
+    assert Student.objects(pk=cecs.pk).first().enrollment == []
+    assert [enrollment.abbreviation for enrollment in Student.objects(pk=math.pk).first().enrollment] == ['MATH']
+    assert RosterEntry.objects(student=cecs).count() == 0
+    assert RosterEntry.objects(student=math).count() == 1
+
+
+def test_another_departments_section_does_not_block_a_course(twins):
+    Services.add_course('CECS', 'Computer Engineering 324', 324, 'A course.', 3)
+    Services.add_course('MATH', 'Mathematics 324', 324, 'A course.', 3)
+    Services.add_section('MATH', 324, 1, 'Fall', 2026, 'ECS', 301, 'TuTh', meeting_time(13), 'Professor MATH')
+    Services.delete_course('CECS', 324)
+    assert Course.objects(abbreviation='CECS', courseNumber=324).count() == 0
+    with pytest.raises(Services.HasDependents):
+        Services.delete_course('MATH', 324)
+
+
+def test_major_cascade_takes_it_off_the_students(twins):
+    Services.add_major('Computer Science', 'CECS', 'A major.')
+    student = Services.add_student('Doe', 'Jane', 'jane.doe@example.edu')
+    Services.add_student_major(student, 'Computer Science', meeting_time(9))
+    with pytest.raises(Services.HasDependents):
+        Services.delete_major('Computer Science')
+    Services.delete_major('Computer Science', cascade=True)
+    assert Student.objects(pk=student.pk).first().studentMajor == []
+
+
+def test_a_department_with_courses_is_kept_and_cannot_cascade(twins):
+    with pytest.raises(Services.HasDependents) as refused:
+        Services.delete_department('CECS')
+    assert not refused.value.cascadable
+    Services.add_department('Physics Department', 'PHYS', 'Chair of PHYS', 'ECS', 302, 'Physics')
+    Services.delete_department('PHYS')
+    assert sorted(department.abbreviation for department in Services.Department.objects) == ['CECS', 'MATH']
@@ -0,0 +1,42 @@
+import Rosters
+import Services
+from RosterEntry import RosterEntry
+from Section import Section
+
+
+def enroll_jane(twins):
+    jane = Services.add_student('Doe', 'Jane', 'jane.doe@example.edu')
+    Services.enroll(jane, 'CECS', 323, 1, 'Fall', 2026, None, 'C')
+    return jane
+
+
+def test_roster_follows_the_enrollment(twins):
+    jane = enroll_jane(twins)
+    entries = list(Rosters.roster(twins['sections']['CECS']))
+    assert [entry['student'] for entry in entries] == [jane.pk]
+    assert list(Rosters.roster(twins['sections']['MATH'])) == []
+    assert Rosters.enrolled_count(twins['sections']['CECS']) == 1
+
+
+def test_check_rosters_tells_departments_apart(twins):
+    enroll_jane(twins)
+    assert Rosters.check_rosters() == {'missing': [], 'extra': [], 'miscounted': {}}
+
+
+def test_rebuild_keeps_the_entry_in_the_right_department(twins):
+    jane = enroll_jane(twins)
+    assert Rosters.rebuild_rosters() == 1
+    cecs, math = twins['sections']['CECS'], twins['sections']['MATH']
+    assert RosterEntry.objects(section=cecs, student=jane).count() == 1
+    assert RosterEntry.objects(section=math).count() == 0
+    assert Section.objects(pk=cecs.pk).first().enrolledCount == 1
+    assert Section.objects(pk=math.pk).first().enrolledCount == 0
+    Services.delete_section('MATH', 323, 1)
+
+
+def test_check_rosters_reports_a_missing_entry(twins):
+    jane = enroll_jane(twins)
+    RosterEntry.objects(student=jane).delete()
+    report = Rosters.check_rosters()
+    assert report['missing'] == [(twins['sections']['CECS'].pk, jane.pk)]
+    assert report['extra'] == []
@@ -0,0 +1,47 @@
+import pytest
+
+import Rosters
+import Services
+from conftest import meeting_time
+from RosterEntry import RosterEntry
+from Section import Section
+from Student import Student
+
+
+def students(count: int) -> [Student]:
+    return [Services.add_student(f'Student {number}', 'Pat', f'student{number}@example.edu')
+            for number in range(count)]
+
+
+@pytest.fixture
+def small_section(twins):
+    return Services.add_section('CECS', 323, 2, 'Fall', 2026, 'ECS', 300, 'TuTh', meeting_time(8), 'Professor Lee',
+                                capacity=2)
+
+
+def test_reserve_seat_stops_at_capacity(small_section):
+    assert [Services.reserve_seat(small_section) for _ in range(3)] == [True, True, False]
+    Services.release_seat(small_section)
+    assert Services.reserve_seat(small_section)
+
+
+def test_a_section_without_a_capacity_has_no_limit(twins):
+    section = Services.add_section('CECS', 323, 2, 'Fall', 2026, 'ECS', 300, 'TuTh', meeting_time(8), 'Professor Lee')
+    assert all(Services.reserve_seat(section) for _ in range(50))
+
+
+def test_release_seat_never_goes_below_zero(small_section):
+    Services.release_seat(small_section)
+    assert Section.objects(pk=small_section.pk).first().enrolledCount == 0
+
+
+def test_a_full_section_turns_the_student_away_untouched(small_section):
+    first, second, third = students(3)
+    for student in (first, second):
+        Services.enroll(student, 'CECS', 323, 2, 'Fall', 2026, None, 'C')
+    with pytest.raises(Services.SectionFull):
+        Services.enroll(third, 'CECS', 323, 2, 'Fall', 2026, None, 'C')
+    assert Student.objects(pk=third.pk).first().enrollment == []
+    assert RosterEntry.objects(section=small_section).count() == 2
+    assert Rosters.check_rosters()['miscounted'] == {}
+
@@ -0,0 +1,71 @@
+import threading
+import types
+
+import CommandStats
+import SlowQueries
+
+
+def test_strip_values_keeps_the_shape_and_drops_the_values():
+    query = {'last_name': 'Doe', 'age': {'$gte': 18, '$lt': 30}, 'tags': ['a', 'b'],
+             '$or': [{'first_name': 'Jane'}, {'e_mail': {'$exists': True}}]}
+    assert SlowQueries.strip_values(query) == {'$or': [{'first_name': '?'}, {'e_mail': {'$exists': '?'}}],
+                                               'age': {'$gte': '?', '$lt': '?'}, 'last_name': '?', 'tags': ['?']}
+    assert SlowQueries.strip_values({'a': 1, 'b': 2}) == SlowQueries.strip_values({'b': 3, 'a': 4})
+
+
+def test_field_roles_folds_in_the_branches_of_an_or():
+    query = {'semester': 'Fall', 'section_year': {'$gte': 2025},
+             '$or': [{'course_number': 323}, {'course_number': {'$gt': 400}, 'room': 300}]}
+    assert SlowQueries.field_roles(query) == (['semester', 'course_number', 'room'], ['section_year'])
+
+
+class Explainer:
+    """A client whose explains report the action that they were sent under, and can be held up."""
+    def __init__(self):
+        self.actions = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __getitem__(self, database):
+        return types.SimpleNamespace(command=self.command)
+
+    def command(self, command):
+        self.actions.append(CommandStats.current_action.get())
+        self.release.wait()
+        return {'queryPlanner': {'winningPlan': {'stage': 'COLLSCAN'}},
+                'executionStats': {'totalDocsExamined': 100, 'nReturned': 1}}
+
+
+def events(recorder, micros: int, request_id: int = 1):
+    command = {'find': 'students', 'filter': {'first_name': 'Jane'}, 'lsid': {'id': 1}}
+    event = types.SimpleNamespace(command_name='find', command=command, database_name='test', connection_id='c',
+                                  request_id=request_id, duration_micros=micros)
+    with CommandStats.action('list_student()'):
+        recorder.started(event)
+    recorder.succeeded(event)
+
+
+def test_a_slow_query_is_explained_under_its_own_action():
+    client = Explainer()
+    recorder = SlowQueries.SlowQueryRecorder(threshold_ms=5, client=client)
+    events(recorder, 1000, request_id=1)
+    events(recorder, 9000, request_id=2)
+    events(recorder, 7000, request_id=3)
+    recorder.wait_for_explains(5)
+    [shape] = recorder.report()
+    assert (shape['count'], shape['actions'], shape['flags']) == (2, ['list_student()'], ['COLLSCAN', 'RATIO'])
+    assert shape['filter'] == {'first_name': '?'} and shape['equality'] == ['first_name']
+    assert client.actions == [SlowQueries.EXPLAIN_ACTION]
+    assert recorder.in_flight == {}
+
+
+def test_waiting_for_the_explains_gives_up_after_the_timeout():
+    client = Explainer()
+    client.release.clear()
+    recorder = SlowQueries.SlowQueryRecorder(threshold_ms=0, client=client)
+    events(recorder, 10)
+    recorder.wait_for_explains(0.05)
+    assert recorder.report()[0]['plan'] is None
+    client.release.set()
+    recorder.wait_for_explains(5)
+    assert recorder.report()[0]['plan'] == ['COLLSCAN']
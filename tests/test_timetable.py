@@ -0,0 +1,93 @@
+from datetime import datetime
+
+import Services
+import Timetable
+from conftest import meeting_time
+from Course import Course
+from Section import Section
+from Student import Student
+from Timetable import ConflictIndex, IntervalIndex, MONDAY, WEDNESDAY, student_clashes
+
+
+def section(_id, hour, minute=0, duration=None, room=101, instructor='Brown', schedule='MW'):
+    return {'_id': _id, 'semester': 'Fall', 'section_year': 2024, 'building': 'ECS', 'room': room,
+            'instructor': instructor, 'schedule': schedule, 'startTime': datetime(2024, 1, 1, hour, minute),
+            'duration': duration}
+
+
+def test_finds_a_long_booking_that_is_not_the_immediate_predecessor():
+    index = IntervalIndex()
+    index.add('room', MONDAY, 480, 720, 'long')      # 8:00 - 12:00
+    index.add('room', MONDAY, 540, 570, 'short')     # 9:00 - 9:30, overlapping the long one already
+    assert index.conflicts('room', MONDAY, 600, 630) == {'long'}
+
+
+def test_conflicts_with_overlapping_rows_already_loaded():
+    index = ConflictIndex().load([
+        section('a', 8, duration=240),
+        section('b', 9, duration=30, instructor='Smith'),
+        section('c', 10, duration=15, instructor='Jones'),
+    ])
+    conflicts = index.conflicts(section('new', 11, instructor='Lee'))
+    assert conflicts == [('room', 'a')]
+
+
+def test_adjacent_meetings_do_not_conflict():
+    index = IntervalIndex()
+    index.add('room', MONDAY | WEDNESDAY, 480, 555, 'first')
+    assert index.conflicts('room', WEDNESDAY, 555, 630) == set()
+    assert index.conflicts('room', WEDNESDAY, 554, 630) == {'first'}
+
+
+def test_remove_keeps_the_running_end():
+    index = IntervalIndex()
+    index.add('room', MONDAY, 480, 720, 'long')
+    index.add('room', MONDAY, 540, 570, 'short')
+    index.remove('room', MONDAY, 480, 720, 'long')
+    assert index.conflicts('room', MONDAY, 600, 630) == set()
+    assert index.conflicts('room', MONDAY, 560, 630) == {'short'}
+
+
+def test_student_clashes_with_sections_that_already_overlap():
+    enrolled = [section('long', 8, duration=240, room=1), section('short', 9, duration=30, room=2),
+                section('friday', 11, room=3, schedule='F')]
+    clashes = student_clashes(enrolled, section('new', 11, room=4))
+    assert [clash['_id'] for clash in clashes] == ['long']
+
+
+def test_remove_frees_a_rejected_booking():
+    index = ConflictIndex()
+    rejected = section('x', 9, duration=60)
+    index.add(rejected, 'row 1')
+    assert index.conflicts(section('y', 9, minute=30, instructor='Lee')) == [('room', 'row 1')]
+    index.remove(rejected, 'row 1')
+    assert index.conflicts(section('y', 9, minute=30, instructor='Lee')) == []
+
+
+
+def enroll_beside_math(twins):
+    """Enroll a student in CECS 323-1 and in CECS 491-1, which meets when MATH 323-1 does (elsewhere)."""
+    Services.add_course('CECS', 'Capstone', 491, 'A course.', 3)
+    Services.add_section('CECS', 491, 1, 'Fall', 2026, 'ECS', 302, 'MW', meeting_time(13), 'Professor Lee',
+                         capacity=30)
+    jane = Services.add_student('Doe', 'Jane', 'jane.doe@example.edu')
+    Services.enroll(jane, 'CECS', 323, 1, 'Fall', 2026, None, 'C')
+    Services.enroll(jane, 'CECS', 491, 1, 'Fall', 2026, None, 'C')
+    return jane
+
+
+def test_enrollments_resolve_to_the_section_of_their_own_department(twins):
+    jane = enroll_beside_math(twins)
+    assert [enrollment.courseNumber for enrollment in Student.objects(pk=jane.pk).first().enrollment] == [323, 491]
+
+
+def test_a_real_clash_is_still_found(twins):
+    jane = enroll_beside_math(twins)
+    clashes = Services.timetable_clashes(jane, twins['sections']['MATH'])
+    assert [clash['course_number'] for clash in clashes] == [491]
+
+
+def test_audit_students_does_not_mix_up_departments(twins):
+    enroll_beside_math(twins)
+    assert Timetable.audit_students(Student._get_collection(), Section._get_collection(), Course._get_collection(),
+                                    'Fall', 2026) == []
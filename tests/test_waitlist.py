@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import Services
+from conftest import meeting_time
+from RosterEntry import RosterEntry
+from Section import Section
+from Student import Student
+from Waitlist import Waitlist
+
+
+@pytest.fixture
+def full_section(twins):
+    """A CECS 323 section with one seat, taken by a sophomore."""
+    section = Services.add_section('CECS', 323, 2, 'Fall', 2026, 'ECS', 300, 'TuTh', meeting_time(8),
+                                   'Professor Lee', capacity=1)
+    holder = Services.add_student('Holder', 'Sam', 'sam@example.edu', 'Sophomore')
+    Services.enroll(holder, 'CECS', 323, 2, 'Fall', 2026, None, 'C')
+    return section, holder
+
+
+def wait(section, last_name: str, class_standing: str = None) -> Student:
+    student = Services.add_student(last_name, 'Pat', f'{last_name.lower()}@example.edu', class_standing)
+    with pytest.raises(Services.SectionFull) as full:
+        Services.enroll(student, 'CECS', 323, 2, 'Fall', 2026, None, 'C')
+    entry = Services.join_waitlist(full.value.student, full.value.section, full.value.enrollment)
+    # MongoDB keeps milliseconds, so space the requests out to keep first come, first served certain.
+    entry.update(requestedAt=datetime(2026, 8, 1) + timedelta(minutes=Waitlist.objects.count()))
+    return student
+
+
+def test_seniors_go_first_then_first_come_first_served(full_section):
+    section, holder = full_section
+    early = wait(section, 'Early', 'Freshman')
+    late = wait(section, 'Late', 'Freshman')
+    senior = wait(section, 'Senior', 'Senior')
+    positions = {entry.student.pk: Services.waitlist_position(entry) for entry in Waitlist.objects(section=section)}
+    assert positions == {senior.pk: 1, early.pk: 2, late.pk: 3}
+
+
+def test_a_drop_promotes_the_head_of_the_line(full_section):
+    section, holder = full_section
+    freshman = wait(section, 'Freshman', 'Freshman')
+    senior = wait(section, 'Senior', 'Senior')
+    promoted = Services.drop_enrollment(Student.objects(pk=holder.pk).first(), 'CECS', 323, 2)
+    assert promoted == senior.pk
+    assert [enrollment.sectionNumber for enrollment in Student.objects(pk=senior.pk).first().enrollment] == [2]
+    assert [entry.student.pk for entry in Waitlist.objects(section=section)] == [freshman.pk]
+    assert RosterEntry.objects(section=section, student=senior).count() == 1
+    assert Section.objects(pk=section.pk).first().enrolledCount == 1
+
+
+def test_a_student_whose_timetable_now_clashes_is_skipped(full_section):
+    section, holder = full_section
+    senior = wait(section, 'Senior', 'Senior')
+    junior = wait(section, 'Junior', 'Junior')
+    Services.add_section('MATH', 323, 2, 'Fall', 2026, 'ECS', 301, 'TuTh', meeting_time(8), 'Professor Moss')
+    Services.enroll(senior, 'MATH', 323, 2, 'Fall', 2026, None, 'C')
+    assert Services.drop_enrollment(Student.objects(pk=holder.pk).first(), 'CECS', 323, 2) == junior.pk
+    assert Waitlist.objects(section=section).count() == 0
+
+
+def test_joining_twice_is_refused(full_section):
+    section, holder = full_section
+    student = wait(section, 'Waiting')
+    entry = Waitlist.objects(student=student).first()
+    with pytest.raises(Services.ServiceError, match='already on the waitlist'):
+        Services.join_waitlist(student, section, entry.enrollment)
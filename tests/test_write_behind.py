@@ -0,0 +1,106 @@
+import time
+import types
+
+import pytest
+
+pytest.importorskip('pymongo')
+pytest.importorskip('mongoengine')
+
+from WriteBehind import WriteBehindQueue
+
+
+def test_single_write_resolves_within_max_delay():
+    queue = WriteBehindQueue(batch_size=500, max_delay=0.05)
+
+    def write(writes):
+        for pending in writes:
+            pending.future.set_result(True)
+    queue._write = write
+    try:
+        started = time.monotonic()
+        future = queue.pull('student', 'enrollment', {'section_number': 1})
+        assert future.result(timeout=1) is True
+        assert time.monotonic() - started < queue.max_delay + 0.5
+    finally:
+        queue.close()
+
+
+def queued(queue, *writes):
+    """Queue the writes, send them in this thread, and return what each of them came to."""
+    futures = [write(queue) for write in writes]
+    queue.flush()
+    return [future.result(timeout=1) for future in futures]
+
+
+def test_results_come_from_what_the_server_modified(db):
+    from Student import Student
+
+    student = Student(lastName='Doe', firstName='Jane', eMail='jane.doe@example.edu').save()
+    queue = WriteBehindQueue(max_delay=60)
+    try:
+        element = {'abbreviation': 'CECS', 'course_number': 323, 'section_number': 1}
+        match = {'abbreviation': 'CECS', 'course_number': 323}
+        assert queued(queue,
+                      lambda q: q.push_unless_present(student.pk, 'enrollment', element, match),
+                      lambda q: q.push_unless_present(student.pk, 'enrollment', element, match),
+                      lambda q: q.pull(student.pk, 'enrollment', match),
+                      lambda q: q.pull(student.pk, 'enrollment', match)) == [True, False, True, False]
+        # A write from outside of the queue is what the server sees, not what the queue last read.
+        Student._get_collection().update_one({'_id': student.pk}, {'$push': {'enrollment': element}})
+        assert queued(queue, lambda q: q.push_unless_present(student.pk, 'enrollment', element, match)) == [False]
+    finally:
+        queue.close()
+
+
+class _UpdateResult:
+    def __init__(self, modified_count):
+        self.modified_count = modified_count
+
+
+class _Client:
+    """A MongoClient.bulk_write that answers with the given verbose results, or raises the given error."""
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.models = None
+
+    def bulk_write(self, models, ordered=True, verbose_results=False):
+        self.models = models
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return types.SimpleNamespace(update_results=self.outcome)
+
+
+def collection_of(client):
+    return types.SimpleNamespace(database=types.SimpleNamespace(client=client), full_name='test.student')
+
+
+def test_client_bulk_write_reports_each_write():
+    from pymongo.errors import ClientBulkWriteException, WriteError
+    from WriteBehind import _Write
+
+    queue = WriteBehindQueue(max_delay=60)
+    try:
+        writes = [_Write(number, 'enrollment', None, {'section_number': 1}, False) for number in range(3)]
+        client = _Client({0: _UpdateResult(1), 2: _UpdateResult(0)})
+        assert queue._bulk_write(collection_of(client), writes) == [True, False, False]
+        assert all(model._namespace == 'test.student' for model in client.models)
+
+        error = ClientBulkWriteException({'anySuccessful': True, 'updateResults': {0: _UpdateResult(1)},
+                                          'writeErrors': [{'idx': 1, 'code': 2, 'errmsg': 'bad'}]}, True)
+        results = queue._bulk_write(collection_of(_Client(error)), writes[:2])
+        assert results[0] is True and isinstance(results[1], WriteError)
+    finally:
+        queue.close()
+
+
+def test_older_servers_fall_back_to_single_updates():
+    from pymongo.errors import InvalidOperation
+    from WriteBehind import _Write
+
+    queue = WriteBehindQueue(max_delay=60)
+    try:
+        client = _Client(InvalidOperation('MongoClient.bulk_write requires MongoDB server version 8.0+.'))
+        assert queue._bulk_write(collection_of(client), [_Write(1, 'enrollment', None, {}, False)]) is None
+        assert queue.client_bulk_write is False
+    finally:
+        queue.close()